@@ -2,8 +2,9 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
-from app.database import Base
-from app.config import settings
+from app.db.database import Base
+from app.core.config import settings
+import app.models  # noqa: F401  (registra los modelos en Base.metadata)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,92 @@
+"""Esquema inicial: users, persons y audit_logs
+
+Revision ID: 0001_initial_schema
+Revises: 
+Create Date: 2026-10-17 00:00:00
+
+Las bases de datos restauradas desde el dump ya tienen estas tablas; en ese
+caso la migración no hace nada y solo deja registrada la revisión.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'users' not in tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(254), nullable=False),
+            sa.Column('hashed_password', sa.String(255), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('is_admin', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('login_attempts', sa.Integer(), nullable=True),
+            sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('last_login', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+        op.create_index('idx_user_email_active', 'users', ['email', 'is_active'])
+        op.create_index('idx_user_created_at', 'users', ['created_at'])
+
+    if 'persons' not in tables:
+        op.create_table(
+            'persons',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('rut', sa.String(200), nullable=False),
+            sa.Column('rut_hash', sa.String(64), nullable=False),
+            sa.Column('nombre', sa.String(100), nullable=False),
+            sa.Column('apellido', sa.String(100), nullable=False),
+            sa.Column('religion_hash', sa.String(64), nullable=False),
+            sa.Column('religion_salt', sa.String(32), nullable=False),
+            sa.Column('email', sa.String(254), nullable=True),
+            sa.Column('telefono', sa.String(20), nullable=True),
+            sa.Column('direccion', sa.Text(), nullable=True),
+            sa.Column('fecha_nacimiento', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('created_by', sa.Integer(), nullable=False),
+        )
+        op.create_index('ix_persons_id', 'persons', ['id'])
+        op.create_index('ix_persons_rut', 'persons', ['rut'], unique=True)
+        op.create_index('idx_person_rut_hash', 'persons', ['rut_hash'])
+        op.create_index('idx_person_nombre_apellido', 'persons', ['nombre', 'apellido'])
+        op.create_index('idx_person_created_at', 'persons', ['created_at'])
+        op.create_index('idx_person_created_by', 'persons', ['created_by'])
+
+    if 'audit_logs' not in tables:
+        op.create_table(
+            'audit_logs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('action', sa.String(50), nullable=False),
+            sa.Column('resource', sa.String(50), nullable=False),
+            sa.Column('resource_id', sa.Integer(), nullable=True),
+            sa.Column('ip_address', sa.String(45), nullable=True),
+            sa.Column('user_agent', sa.String(500), nullable=True),
+            sa.Column('details', sa.Text(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index('ix_audit_logs_id', 'audit_logs', ['id'])
+        op.create_index('idx_audit_user_action', 'audit_logs', ['user_id', 'action'])
+        op.create_index('idx_audit_resource', 'audit_logs', ['resource', 'resource_id'])
+        op.create_index('idx_audit_timestamp', 'audit_logs', ['timestamp'])
+        op.create_index('idx_audit_ip_address', 'audit_logs', ['ip_address'])
+
+
+def downgrade() -> None:
+    op.drop_table('audit_logs')
+    op.drop_table('persons')
+    op.drop_table('users')
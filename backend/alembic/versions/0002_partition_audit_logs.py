@@ -0,0 +1,130 @@
+"""Particionar audit_logs por mes sobre timestamp
+
+Revision ID: 0002_partition_audit_logs
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:00:00
+
+Convierte audit_logs en una tabla particionada por rango mensual (solo
+PostgreSQL). La clave primaria pasa a ser (id, timestamp), requisito de
+PostgreSQL para tablas particionadas; la secuencia de id se conserva. Se crean
+particiones desde el mes del log más antiguo hasta AUDIT_PARTITION_PREMAKE_MONTHS
+meses adelante, más una partición DEFAULT para filas fuera de rango.
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_partition_audit_logs'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('id, user_id, action, resource, resource_id, ip_address, '
+           'user_agent, details, "timestamp"')
+
+INDEXES = {
+    'ix_audit_logs_id': '(id)',
+    'idx_audit_user_action': '(user_id, action)',
+    'idx_audit_resource': '(resource, resource_id)',
+    'idx_audit_timestamp': '("timestamp")',
+    'idx_audit_ip_address': '(ip_address)',
+}
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + (value.month - 1) + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def _rename_legacy(bind) -> None:
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_legacy')
+    op.execute('ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey')
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy')
+    op.execute('ALTER TABLE audit_logs_legacy ALTER COLUMN id DROP DEFAULT')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY NONE')
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    _rename_legacy(bind)
+
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id integer NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            user_id integer,
+            action varchar(50) NOT NULL,
+            resource varchar(50) NOT NULL,
+            resource_id integer,
+            ip_address varchar(45),
+            user_agent varchar(500),
+            details text,
+            "timestamp" timestamp with time zone NOT NULL DEFAULT now(),
+            CONSTRAINT audit_logs_pkey PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    # Particiones mensuales desde el log más antiguo hasta los próximos meses
+    oldest = bind.execute(sa.text('SELECT min("timestamp") FROM audit_logs_legacy')).scalar()
+    now = datetime.now(timezone.utc)
+    current = datetime((oldest or now).year, (oldest or now).month, 1, tzinfo=timezone.utc)
+    last = _add_months(datetime(now.year, now.month, 1, tzinfo=timezone.utc),
+                       settings.AUDIT_PARTITION_PREMAKE_MONTHS)
+    while current <= last:
+        upper = _add_months(current, 1)
+        op.execute(
+            f"CREATE TABLE audit_logs_p{current.year:04d}{current.month:02d} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{current.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        current = upper
+
+    for name, columns in INDEXES.items():
+        op.execute(f'CREATE INDEX {name} ON audit_logs {columns}')
+
+    op.execute(f"""
+        INSERT INTO audit_logs ({COLUMNS})
+        SELECT id, user_id, action, resource, resource_id, ip_address,
+               user_agent, details, COALESCE("timestamp", now())
+        FROM audit_logs_legacy
+    """)
+    op.execute('DROP TABLE audit_logs_legacy')
+    op.execute('ANALYZE audit_logs')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    _rename_legacy(bind)
+
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id integer NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            user_id integer,
+            action varchar(50) NOT NULL,
+            resource varchar(50) NOT NULL,
+            resource_id integer,
+            ip_address varchar(45),
+            user_agent varchar(500),
+            details text,
+            "timestamp" timestamp with time zone DEFAULT now(),
+            CONSTRAINT audit_logs_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    for name, columns in INDEXES.items():
+        op.execute(f'CREATE INDEX {name} ON audit_logs {columns}')
+
+    op.execute(f'INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_legacy')
+    op.execute('DROP TABLE audit_logs_legacy CASCADE')
@@ -0,0 +1,46 @@
+"""Índices compuestos (filtro, timestamp, id) para paginación keyset de audit_logs
+
+Revision ID: 0003_audit_keyset_indexes
+Revises: 0002_partition_audit_logs
+Create Date: 2026-10-17 00:00:00
+
+Cada listado de auditoría filtra por una columna y ordena por (timestamp, id)
+descendente. Con un índice (filtro, timestamp, id) el motor busca la posición del
+cursor y lee solo las filas de la página. Los índices (timestamp) y
+(resource, resource_id) quedan cubiertos por los nuevos y se eliminan.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_audit_keyset_indexes'
+down_revision = '0002_partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = {
+    'idx_audit_timestamp_id': ['timestamp', 'id'],
+    'idx_audit_user_timestamp_id': ['user_id', 'timestamp', 'id'],
+    'idx_audit_action_timestamp_id': ['action', 'timestamp', 'id'],
+    'idx_audit_resource_timestamp_id': ['resource', 'timestamp', 'id'],
+    'idx_audit_resource_item_timestamp_id': ['resource', 'resource_id', 'timestamp', 'id'],
+}
+
+SUPERSEDED_INDEXES = {
+    'idx_audit_timestamp': ['timestamp'],
+    'idx_audit_resource': ['resource', 'resource_id'],
+}
+
+
+def upgrade() -> None:
+    for name, columns in NEW_INDEXES.items():
+        op.create_index(name, 'audit_logs', columns, if_not_exists=True)
+    for name in SUPERSEDED_INDEXES:
+        op.drop_index(name, table_name='audit_logs', if_exists=True)
+
+
+def downgrade() -> None:
+    for name, columns in SUPERSEDED_INDEXES.items():
+        op.create_index(name, 'audit_logs', columns, if_not_exists=True)
+    for name in NEW_INDEXES:
+        op.drop_index(name, table_name='audit_logs', if_exists=True)
@@ -0,0 +1,46 @@
+"""Agregados horarios de auditoría y puntos de control de tareas
+
+Revision ID: 0004_audit_stats_rollup
+Revises: 0003_audit_keyset_indexes
+Create Date: 2026-10-17 00:00:00
+
+audit_stats_hourly guarda conteos por hora y por (acción, recurso, usuario, IP);
+job_checkpoints guarda hasta dónde llegó cada tarea periódica. La tabla de
+agregados se llena con `python -m app.db.audit_rollup compact` o con la
+compactación periódica de la aplicación.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_audit_stats_rollup'
+down_revision = '0003_audit_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job_checkpoints',
+        sa.Column('name', sa.String(100), primary_key=True),
+        sa.Column('position', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'audit_stats_hourly',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('action', sa.String(50), nullable=False),
+        sa.Column('resource', sa.String(50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('ip_address', sa.String(45), nullable=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+    )
+    op.create_index('idx_audit_stats_bucket', 'audit_stats_hourly', ['bucket'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_audit_stats_bucket', table_name='audit_stats_hourly')
+    op.drop_table('audit_stats_hourly')
+    op.drop_table('job_checkpoints')
@@ -0,0 +1,119 @@
+"""Índice ciego de RUT con HMAC y restricción única sobre persons.rut_hash
+
+Revision ID: 0005_rut_blind_index
+Revises: 0004_audit_stats_rollup
+Create Date: 2026-10-17 00:00:00
+
+rut_hash pasa de SHA-256 sin clave (con normalizaciones distintas según el
+llamador) a HMAC-SHA256 con RUT_BLIND_INDEX_KEY sobre la forma canónica del
+RUT. La migración recalcula el índice de todas las filas y reemplaza
+idx_person_rut_hash por el índice único uq_person_rut_hash. Si hay personas
+con el mismo RUT la migración se detiene y las informa.
+
+El recálculo es autocontenido: usa una instantánea de persons con las columnas
+que existen en esta revisión (id, rut en texto Fernet, rut_hash) y replica la
+derivación de claves y la forma canónica de esta revisión, sin importar
+modelos ni servicios de la aplicación, que siguen cambiando.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_rut_blind_index'
+down_revision = '0004_audit_stats_rollup'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger(f"alembic.{revision}")
+
+CHUNK_SIZE = 1000
+_RUT_CLEAN_RE = re.compile(r'[^0-9kK]')
+
+persons = sa.table(
+    'persons',
+    sa.column('id', sa.Integer),
+    sa.column('rut', sa.String),
+    sa.column('rut_hash', sa.String),
+)
+
+
+def _fernet_key(passphrase: str) -> bytes:
+    """Clave Fernet derivada con PBKDF2 (RUT_ENCRYPTION_SALT), como en esta revisión"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=settings.RUT_ENCRYPTION_SALT.encode(),
+        iterations=settings.RUT_ENCRYPTION_ITERATIONS,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(passphrase.encode()))
+
+
+def _blind_index(rut: str) -> str:
+    """HMAC-SHA256 con RUT_BLIND_INDEX_KEY sobre el RUT canónico (dígitos y K, sin ceros a la izquierda)"""
+    canonical = _RUT_CLEAN_RE.sub('', rut).upper().lstrip("0")
+    return hmac.new(settings.RUT_BLIND_INDEX_KEY.encode(), canonical.encode(), hashlib.sha256).hexdigest()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    passphrases = [settings.RUT_ENCRYPTION_KEY, *settings.rut_previous_keys_list]
+    fernet = MultiFernet([Fernet(_fernet_key(passphrase)) for passphrase in passphrases])
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(persons.c.id, persons.c.rut, persons.c.rut_hash)
+            .where(persons.c.id > last_id).order_by(persons.c.id).limit(CHUNK_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for person_id, stored, rut_hash in rows:
+            try:
+                rut = fernet.decrypt(base64.urlsafe_b64decode(stored)).decode()
+            except (InvalidToken, TypeError, ValueError):
+                logger.warning(f"RUT de persona {person_id} no se pudo descifrar; índice sin recalcular")
+                continue
+            blind_index = _blind_index(rut)
+            if blind_index != rut_hash:
+                updates.append({"_id": person_id, "_hash": blind_index})
+        if updates:
+            bind.execute(
+                persons.update().where(persons.c.id == sa.bindparam("_id"))
+                .values(rut_hash=sa.bindparam("_hash")),
+                updates,
+            )
+        last_id = rows[-1].id
+
+    duplicates = {}
+    for person_id, rut_hash in bind.execute(sa.text(
+        "SELECT id, rut_hash FROM persons WHERE rut_hash IN "
+        "(SELECT rut_hash FROM persons GROUP BY rut_hash HAVING COUNT(*) > 1) ORDER BY id"
+    )):
+        duplicates.setdefault(rut_hash, []).append(str(person_id))
+    if duplicates:
+        raise RuntimeError(
+            "Personas con el mismo RUT (ids por grupo): "
+            + "; ".join(", ".join(ids) for ids in duplicates.values())
+            + ". Resolver los duplicados antes de crear uq_person_rut_hash."
+        )
+
+    op.drop_index('idx_person_rut_hash', table_name='persons', if_exists=True)
+    op.create_index('uq_person_rut_hash', 'persons', ['rut_hash'], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_person_rut_hash', table_name='persons', if_exists=True)
+    op.create_index('idx_person_rut_hash', 'persons', ['rut_hash'], if_not_exists=True)
@@ -0,0 +1,51 @@
+"""Almacenamiento binario de RUT cifrados (persons.rut_data)
+
+Revision ID: 0006_rut_binary_storage
+Revises: 0005_rut_blind_index
+Create Date: 2026-10-17 00:00:00
+
+persons.rut_data guarda un byte de versión seguido del token Fernet sin
+base64 (bytea en PostgreSQL), con índice único. rut pasa a admitir NULL: las
+filas existentes se convierten en línea con `python -m app.db.rut_storage run`
+o con la migración en segundo plano de la aplicación, y mientras tanto se
+leen ambos formatos. La reversión vuelve a escribir rut en formato texto a
+partir del formato binario de esta revisión, sin importar código de la
+aplicación.
+"""
+import base64
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_rut_binary_storage'
+down_revision = '0005_rut_blind_index'
+branch_labels = None
+depends_on = None
+
+# Byte de versión de rut_data en esta revisión: seguido del token Fernet sin base64
+RUT_FORMAT_FERNET = 1
+
+
+def upgrade() -> None:
+    op.add_column('persons', sa.Column('rut_data', sa.LargeBinary(), nullable=True))
+    op.create_index('uq_person_rut_data', 'persons', ['rut_data'], unique=True, if_not_exists=True)
+    op.alter_column('persons', 'rut', existing_type=sa.String(200), nullable=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    persons = sa.table('persons', sa.column('id', sa.Integer), sa.column('rut', sa.String),
+                       sa.column('rut_data', sa.LargeBinary))
+    rows = bind.execute(sa.select(persons.c.id, persons.c.rut_data).where(persons.c.rut_data.isnot(None)))
+    for person_id, packed in rows.fetchall():
+        packed = bytes(packed)
+        if packed[:1] != bytes([RUT_FORMAT_FERNET]):
+            raise RuntimeError(f"rut_data de persona {person_id} no está en el formato binario de esta revisión")
+        text = base64.urlsafe_b64encode(packed[1:]).decode()
+        bind.execute(persons.update().where(persons.c.id == person_id).values(rut=text))
+
+    op.alter_column('persons', 'rut', existing_type=sa.String(200), nullable=False)
+    op.drop_index('uq_person_rut_data', table_name='persons', if_exists=True)
+    op.drop_column('persons', 'rut_data')
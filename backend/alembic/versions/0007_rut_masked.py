@@ -0,0 +1,29 @@
+"""RUT ofuscado almacenado (persons.rut_masked)
+
+Revision ID: 0007_rut_masked
+Revises: 0006_rut_binary_storage
+Create Date: 2026-10-17 00:00:00
+
+persons.rut_masked guarda el RUT ofuscado (RUT_MASK_LENGTH últimos
+caracteres visibles) calculado al escribir, para que los listados no
+desencripten. Las filas existentes se completan en línea con
+`python -m app.db.rut_masked run` o con la tarea en segundo plano de la
+aplicación; mientras tanto los listados desencriptan solo esas filas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_rut_masked'
+down_revision = '0006_rut_binary_storage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('persons', sa.Column('rut_masked', sa.String(20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('persons', 'rut_masked')
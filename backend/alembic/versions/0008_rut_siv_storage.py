@@ -0,0 +1,43 @@
+"""Formato determinista AES-SIV de RUT (rut_hash opcional)
+
+Revision ID: 0008_rut_siv_storage
+Revises: 0007_rut_masked
+Create Date: 2026-10-17 00:00:00
+
+Con RUT_STORAGE_FORMAT=siv persons.rut_data guarda el RUT canónico cifrado
+con AES-SIV, que es determinista y sirve de clave única de búsqueda en
+uq_person_rut_data, por lo que esas filas no llevan índice ciego: rut_hash
+pasa a admitir NULL y uq_person_rut_hash se vuelve un índice parcial sobre
+las filas que lo tienen. Las filas existentes se convierten en línea con
+`python -m app.db.rut_storage run` o con la migración en segundo plano de la
+aplicación. La reversión exige que no queden filas en formato siv (volver a
+RUT_STORAGE_FORMAT=binary y ejecutar la migración de formato).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_rut_siv_storage'
+down_revision = '0007_rut_masked'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('uq_person_rut_hash', table_name='persons', if_exists=True)
+    op.alter_column('persons', 'rut_hash', existing_type=sa.String(64), nullable=True)
+    op.create_index('uq_person_rut_hash', 'persons', ['rut_hash'], unique=True,
+                    postgresql_where=sa.text('rut_hash IS NOT NULL'), if_not_exists=True)
+
+
+def downgrade() -> None:
+    siv_rows = op.get_bind().execute(sa.text("SELECT COUNT(*) FROM persons WHERE rut_hash IS NULL")).scalar()
+    if siv_rows:
+        raise RuntimeError(
+            f"{siv_rows} personas sin rut_hash (formato siv). Migrar con RUT_STORAGE_FORMAT=binary "
+            "y `python -m app.db.rut_storage run` antes de revertir."
+        )
+    op.drop_index('uq_person_rut_hash', table_name='persons', if_exists=True)
+    op.alter_column('persons', 'rut_hash', existing_type=sa.String(64), nullable=False)
+    op.create_index('uq_person_rut_hash', 'persons', ['rut_hash'], unique=True, if_not_exists=True)
@@ -0,0 +1,33 @@
+"""Tokens JWT revocados
+
+Revision ID: 0009_revoked_tokens
+Revises: 0008_rut_siv_storage
+Create Date: 2026-10-17 00:00:00
+
+revoked_tokens guarda el jti de cada token revocado (logout) hasta su exp.
+Se usa con TOKEN_REVOCATION_BACKEND=sql; la compactación periódica de la
+aplicación elimina las filas vencidas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_revoked_tokens'
+down_revision = '0008_rut_siv_storage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('jti', sa.String(64), primary_key=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('idx_revoked_token_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_revoked_token_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
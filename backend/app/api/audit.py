@@ -3,20 +3,79 @@ Rutas de la API para auditoría.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
-from app.db.database import get_db
-from app.schemas.audit import AuditLogResponse, AuditLogStatsResponse
+from app.db.database import get_async_db, get_session_scope
+from app.schemas.audit import AuditLogResponse, AuditLogStatsResponse, AuditIngestResponse
 from app.schemas.common import ApiResponse, PaginatedResponse
 from app.services.audit import AuditService
+from app.services.audit_ingest import INGEST_FORMATS, ingest_stream
 from app.deps.auth import get_current_user, get_current_admin_user, get_client_ip
 from app.models.user import User
 from app.utils.responses import ResponseUtils
+from app.utils.cursor import decode_cursor
+from app.db.counting import CountResult, CountStrategy
 
 router = APIRouter()
 
 
+def get_cursor_params(
+    after: Optional[str] = Query(None, description="Cursor: logs más antiguos que este (página siguiente)"),
+    before: Optional[str] = Query(None, description="Cursor: logs más recientes que este (página anterior)")
+) -> Dict[str, Optional[str]]:
+    """
+    Validar los cursores de paginación keyset.
+
+    Con un cursor presente se ignora page (que queda como paginación por offset
+    heredada) y se usan next_cursor/prev_cursor de la respuesta anterior.
+    """
+    if after and before:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use solo uno de los parámetros after o before"
+        )
+    for cursor in (after, before):
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor de paginación inválido"
+                )
+    return {"after": after, "before": before}
+
+
+def count_query(default: CountStrategy):
+    """Parámetro count con la estrategia por defecto del endpoint"""
+    return Query(default, description="Estrategia del total: exact, estimate (estadísticas del planificador) o lookahead (cota inferior)")
+
+
+async def _page_total(db: AsyncSession, result: Dict, count: CountStrategy, skip: int,
+                      cursor: Dict[str, Optional[str]], **filters) -> CountResult:
+    """Total de una página de logs según la estrategia de conteo"""
+    from app.repositories.audit import AsyncAuditRepository
+    audit_repo = AsyncAuditRepository(db)
+    # Con cursor no hay offset: la cota inferior se cuenta desde el cursor
+    skip = 0 if any(cursor.values()) else skip
+    return await audit_repo.count_page_total(result, count, skip=skip, **filters)
+
+
+def _paginated_logs(result: Dict, total: CountResult, page: int, per_page: int) -> PaginatedResponse:
+    """Respuesta paginada de logs con cursores y el total calculado"""
+    return ResponseUtils.paginated_response(
+        items=[log.dict() for log in result['items']],
+        total=total.total,
+        page=page,
+        per_page=per_page,
+        next_cursor=result['next_cursor'],
+        prev_cursor=result['prev_cursor'],
+        total_is_exact=total.exact,
+        count_strategy=total.strategy
+    )
+
+
 @router.get(
     "/",
     response_model=PaginatedResponse,
@@ -28,27 +87,21 @@ async def get_audit_logs(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.ESTIMATE),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener logs de auditoría"""
     audit_service = AuditService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs(skip=skip, limit=limit, user_id=current_user.id, ip_address=ip_address)
+    result = await audit_service.get_audit_logs(skip=skip, limit=limit, user_id=current_user.id, ip_address=ip_address, **cursor)
     
-    # Contar total de logs
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total = audit_repo.count()
+    total = await _page_total(db, result, count, skip, cursor)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
@@ -62,8 +115,10 @@ async def get_audit_logs_alias(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.ESTIMATE),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Alias para obtener logs de auditoría"""
     # Este es un alias para mantener compatibilidad con el endpoint anterior
@@ -71,19 +126,11 @@ async def get_audit_logs_alias(
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs(skip=skip, limit=limit, user_id=current_user.id, ip_address=ip_address)
+    result = await audit_service.get_audit_logs(skip=skip, limit=limit, user_id=current_user.id, ip_address=ip_address, **cursor)
     
-    # Contar total de logs
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total = audit_repo.count()
+    total = await _page_total(db, result, count, skip, cursor)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
@@ -98,33 +145,28 @@ async def get_audit_logs_by_user(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.EXACT),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener logs de auditoría por usuario"""
     audit_service = AuditService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs_by_user(
+    result = await audit_service.get_audit_logs_by_user(
         target_user_id=user_id,
         skip=skip,
         limit=limit,
         user_id=current_user.id,
-        ip_address=ip_address
+        ip_address=ip_address,
+        **cursor
     )
     
-    # Contar total de logs por usuario
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total = audit_repo.count_by_user(user_id)
+    total = await _page_total(db, result, count, skip, cursor, user_id=user_id)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
@@ -139,33 +181,28 @@ async def get_audit_logs_by_action(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.EXACT),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener logs de auditoría por acción"""
     audit_service = AuditService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs_by_action(
+    result = await audit_service.get_audit_logs_by_action(
         action=action,
         skip=skip,
         limit=limit,
         user_id=current_user.id,
-        ip_address=ip_address
+        ip_address=ip_address,
+        **cursor
     )
     
-    # Contar total de logs por acción
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total = audit_repo.count_by_action(action)
+    total = await _page_total(db, result, count, skip, cursor, action=action)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
@@ -181,35 +218,29 @@ async def get_audit_logs_by_resource(
     resource_id: Optional[int] = Query(None, description="ID específico del recurso"),
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.LOOKAHEAD),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener logs de auditoría por recurso"""
     audit_service = AuditService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs_by_resource(
+    result = await audit_service.get_audit_logs_by_resource(
         resource=resource,
         resource_id=resource_id,
         skip=skip,
         limit=limit,
         user_id=current_user.id,
-        ip_address=ip_address
+        ip_address=ip_address,
+        **cursor
     )
     
-    # Para el total, necesitamos hacer consulta sin paginación
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total_logs = audit_repo.get_logs_by_resource(resource, resource_id, skip=0, limit=10000)
-    total = len(total_logs)
+    total = await _page_total(db, result, count, skip, cursor, resource=resource, resource_id=resource_id)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
@@ -225,8 +256,10 @@ async def get_audit_logs_by_period(
     end_date: datetime = Query(..., description="Fecha de fin (ISO format)"),
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.LOOKAHEAD),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener logs de auditoría por período"""
     if start_date >= end_date:
@@ -239,27 +272,19 @@ async def get_audit_logs_by_period(
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs_by_period(
+    result = await audit_service.get_audit_logs_by_period(
         start_date=start_date,
         end_date=end_date,
         skip=skip,
         limit=limit,
         user_id=current_user.id,
-        ip_address=ip_address
+        ip_address=ip_address,
+        **cursor
     )
     
-    # Para el total, necesitamos hacer consulta sin paginación
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total_logs = audit_repo.get_logs_by_period(start_date, end_date, skip=0, limit=10000)
-    total = len(total_logs)
+    total = await _page_total(db, result, count, skip, cursor, start_date=start_date, end_date=end_date)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
@@ -273,13 +298,13 @@ async def get_audit_stats(
     request: Request,
     days: int = Query(30, ge=1, le=365, description="Número de días para las estadísticas"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener estadísticas de auditoría"""
     audit_service = AuditService(db)
     ip_address = get_client_ip(request)
     
-    return audit_service.get_audit_stats(days=days, user_id=current_user.id, ip_address=ip_address)
+    return await audit_service.get_audit_stats(days=days, user_id=current_user.id, ip_address=ip_address)
 
 
 @router.get(
@@ -292,162 +317,132 @@ async def get_my_audit_logs(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    cursor: Dict[str, Optional[str]] = Depends(get_cursor_params),
+    count: CountStrategy = count_query(CountStrategy.EXACT),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener logs de auditoría del usuario actual"""
     audit_service = AuditService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    logs = audit_service.get_audit_logs_by_user(
+    result = await audit_service.get_audit_logs_by_user(
         target_user_id=current_user.id,
         skip=skip,
         limit=limit,
         user_id=current_user.id,
-        ip_address=ip_address
+        ip_address=ip_address,
+        **cursor
     )
     
-    # Contar total de logs del usuario
-    from app.repositories.audit import AuditRepository
-    audit_repo = AuditRepository(db)
-    total = audit_repo.count_by_user(current_user.id)
+    total = await _page_total(db, result, count, skip, cursor, user_id=current_user.id)
     
-    return ResponseUtils.paginated_response(
-        items=[log.dict() for log in logs],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return _paginated_logs(result, total, page, per_page)
 
 
 @router.get(
     "/export",
     summary="Exportar logs de auditoría",
-    description="Exportar logs de auditoría en formato CSV o JSON. Solo administradores.",
+    description="Exportar logs de auditoría en formato CSV, NDJSON, JSON, Arrow IPC o Parquet, transmitidos por bloques. Solo administradores.",
     dependencies=[Depends(get_current_admin_user)]
 )
 async def export_audit_logs(
     request: Request,
-    format: str = Query("csv", description="Formato de exportación: csv o json"),
+    format: str = Query("csv", description="Formato de exportación: csv, ndjson, json, arrow o parquet"),
     user_id: Optional[int] = Query(None, description="Filtrar por ID de usuario"),
     action: Optional[str] = Query(None, description="Filtrar por tipo de acción"),
     resource: Optional[str] = Query(None, description="Filtrar por recurso"),
     start_date: Optional[datetime] = Query(None, description="Fecha de inicio (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="Fecha de fin (ISO format)"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    session_scope: Callable = Depends(get_session_scope)
 ):
-    """Exportar logs de auditoría en formato CSV o JSON"""
+    """Exportar logs de auditoría en formato CSV, NDJSON, JSON, Arrow IPC o Parquet"""
     from app.repositories.audit import AuditRepository
-    from fastapi.responses import StreamingResponse
-    import csv
-    import io
-    import json
-    from datetime import datetime, timedelta
-    
-    audit_repo = AuditRepository(db)
-    ip_address = get_client_ip(request)
-    
-    # Configurar filtros
-    filters = {}
-    if user_id is not None:
-        filters["user_id"] = user_id
-    if action is not None:
-        filters["action"] = action
-    if resource is not None:
-        filters["resource"] = resource
+    from app.services.audit_export import (
+        COLUMNAR_FORMATS, EXPORT_MEDIA_TYPES, columnar_available, export_statement, export_response
+    )
     
-    # Manejar fechas - ampliamos el rango para obtener más resultados
-    # Para depuración, obtenemos todos los registros sin filtrar por fecha
-    start_date = None
-    end_date = None
+    format = format.lower()
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de exportación no válido. Opciones disponibles: csv, ndjson, json, arrow, parquet"
+        )
+    if format in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="La exportación columnar requiere el paquete pyarrow"
+        )
     
-    # Obtener logs (sin paginación, para exportación completa)
-    # Para depuración, primero verificamos la cantidad total de logs
-    total_logs = audit_repo.count()
-    print(f"Total de logs en la base de datos: {total_logs}")
+    ip_address = get_client_ip(request)
     
-    # Obtener todos los logs sin filtros para asegurar que recibimos datos
-    logs = audit_repo.get_logs(skip=0, limit=10000)
+    # Las filas se leen por bloques con un cursor del servidor: sin límite de filas
+    conditions = AuditRepository.filter_conditions(
+        start_date=start_date,
+        end_date=end_date,
+        user_id=user_id,
+        action=action,
+        resource=resource
+    )
     
     # Registrar la acción de exportación
     audit_service = AuditService(db)
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="EXPORT",
         resource="audit_logs",
         ip_address=ip_address,
-        details=f"Exportación de logs en formato {format}: {len(logs)} registros"
+        details=(f"Exportación de logs en formato {format} (usuario: {user_id}, acción: {action}, "
+                 f"recurso: {resource}, desde: {start_date}, hasta: {end_date})")
     )
     
-    # Formatear la salida según el formato solicitado
-    if format.lower() == "csv":
-        # Crear un buffer en memoria para el CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Escribir encabezados
-        headers = ["ID", "Usuario", "Acción", "Recurso", "ID Recurso", 
-                  "Dirección IP", "User Agent", "Detalles", "Fecha"]
-        writer.writerow(headers)
-        
-        # Información de depuración
-        print(f"Cantidad de logs a exportar: {len(logs)}")
-        
-        # Escribir datos y depuración
-        for log in logs:
-            print(f"Procesando log ID {log.id}: {log.action} - {log.resource}")
-            writer.writerow([
-                log.id,
-                log.user_id,
-                log.action,
-                log.resource,
-                log.resource_id if log.resource_id else "",
-                log.ip_address,
-                log.user_agent,
-                log.details,
-                log.timestamp.isoformat() if log.timestamp else ""
-            ])
-        
-        # Preparar respuesta
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment;filename=audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
-        )
-    
-    elif format.lower() == "json":
-        # Convertir logs a formato JSON
-        logs_data = [
-            {
-                "id": log.id,
-                "user_id": log.user_id,
-                "action": log.action,
-                "resource": log.resource,
-                "resource_id": log.resource_id,
-                "ip_address": log.ip_address,
-                "user_agent": log.user_agent,
-                "details": log.details,
-                "timestamp": log.timestamp.isoformat()
-            }
-            for log in logs
-        ]
-        
-        # Preparar respuesta
-        return StreamingResponse(
-            iter([json.dumps(logs_data, ensure_ascii=False)]),
-            media_type="application/json",
-            headers={
-                "Content-Disposition": f"attachment;filename=audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            }
-        )
-    
-    else:
+    headers = ["ID", "Usuario", "Acción", "Recurso", "ID Recurso",
+               "Dirección IP", "User Agent", "Detalles", "Fecha"]
+    return export_response(export_statement(conditions), format, headers, session_scope)
+
+
+@router.post(
+    "/ingest",
+    response_model=AuditIngestResponse,
+    summary="Ingesta masiva de logs de auditoría",
+    description=("Cargar eventos de auditoría en NDJSON o CSV (con encabezado) leídos en streaming. "
+                 "Los eventos se validan y cargan por lotes; se informan aceptados y rechazados por lote. "
+                 "Solo administradores."),
+    dependencies=[Depends(get_current_admin_user)]
+)
+async def ingest_audit_logs(
+    request: Request,
+    format: Optional[str] = Query(None, description="Formato del cuerpo: ndjson o csv (por defecto según Content-Type)"),
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+    session_scope: Callable = Depends(get_session_scope)
+):
+    """Ingerir eventos de auditoría en NDJSON o CSV"""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    format = format.lower()
+    if format not in INGEST_FORMATS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Formato de exportación no válido. Opciones disponibles: csv, json"
+            detail="Formato de ingesta no válido. Opciones disponibles: ndjson, csv"
         )
+    
+    ip_address = get_client_ip(request)
+    result = await ingest_stream(request.stream(), format, session_scope)
+    
+    # Registrar la ingesta
+    audit_service = AuditService(db)
+    await audit_service.create_audit_log(
+        user_id=current_user.id,
+        action="IMPORT",
+        resource="audit_logs",
+        ip_address=ip_address,
+        details=(f"Ingesta masiva en formato {format}: {result['accepted']} aceptados, "
+                 f"{result['rejected']} rechazados en {len(result['batches'])} lotes")
+    )
+    
+    return result
@@ -3,12 +3,14 @@ Rutas de la API para autenticación.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.schemas.user import Token, LoginRequest, UserCreate, UserResponse
 from app.schemas.common import ApiResponse
 from app.services.auth import AuthService
-from app.deps.auth import get_current_user, get_client_ip, get_user_agent
+from app.core.password_hasher import PasswordHashPoolSaturated, login_duration_histogram
+from fastapi.security import HTTPAuthorizationCredentials
+from app.deps.auth import security, get_current_user, get_client_ip, get_user_agent
 from app.models.user import User
 
 router = APIRouter()
@@ -46,7 +48,7 @@ router = APIRouter()
 async def login(
     request: Request,
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Iniciar sesión de usuario"""
     auth_service = AuthService(db)
@@ -55,13 +57,17 @@ async def login(
     user_agent = get_user_agent(request)
     
     try:
-        token = auth_service.login(
-            email=login_data.email,
-            password=login_data.password,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+        with login_duration_histogram.time():
+            token = await auth_service.login(
+                email=login_data.email,
+                password=login_data.password,
+                ip_address=ip_address,
+                user_agent=user_agent
+            )
         return token
+    except PasswordHashPoolSaturated:
+        # Pool bcrypt saturado: 503 + Retry-After, no credenciales inválidas
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -101,13 +107,13 @@ async def login(
 async def register(
     request: Request,
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Registrar nuevo usuario"""
     auth_service = AuthService(db)
     ip_address = get_client_ip(request)
     
-    return auth_service.register(user_data, ip_address)
+    return await auth_service.register(user_data, ip_address)
 
 
 @router.post(
@@ -119,14 +125,14 @@ async def register(
 async def verify_token(
     request: Request,
     token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Verificar validez de token"""
     auth_service = AuthService(db)
     ip_address = get_client_ip(request)
     user_agent = get_user_agent(request)
     
-    result = auth_service.verify_token(token, ip_address, user_agent)
+    result = await auth_service.verify_token(token, ip_address, user_agent)
     
     if result["valid"]:
         return ApiResponse(
@@ -149,7 +155,7 @@ async def verify_token(
 )
 async def refresh_token(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Renovar token de acceso"""
     auth_service = AuthService(db)    # Crear nuevo token para el usuario actual
@@ -169,18 +175,19 @@ async def refresh_token(
     "/logout",
     response_model=ApiResponse,
     summary="Cerrar sesión",
-    description="Cerrar sesión del usuario actual."
+    description="Cerrar sesión del usuario actual y revocar su token."
 )
 async def logout(
     request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Cerrar sesión"""
     auth_service = AuthService(db)
     ip_address = get_client_ip(request)
     
-    auth_service.logout(current_user.id, ip_address)
+    await auth_service.logout(current_user.id, ip_address, token=credentials.credentials)
     
     return ApiResponse(
         success=True,
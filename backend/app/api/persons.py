@@ -3,15 +3,22 @@ Rutas de la API para personas.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.db.database import get_db
-from app.schemas.person import PersonCreate, PersonUpdate, PersonResponse, PersonDetailResponse
+from app.db.database import get_async_db
+from app.schemas.person import PersonCreate, PersonUpdate, PersonResponse, PersonDetailResponse, RutMode
 from app.schemas.common import ApiResponse, PaginatedResponse
 from app.services.person import PersonService
 from app.deps.auth import get_current_user, get_client_ip
+from app.models.person import Person
 from app.models.user import User
 from app.utils.responses import ResponseUtils
+from app.db.counting import CountStrategy, count_total_async
+from app.repositories.person import PersonRepository
+from app.core.hash_executor import religion_hash_executor
+
+COUNT_DESCRIPTION = "Estrategia del total: exact, estimate (estadísticas del planificador) o lookahead (cota inferior)"
+RUT_MODE_DESCRIPTION = "RUT en el listado: masked (solo rut_masked, sin desencriptar) o full (RUT completo); por defecto PERSON_LIST_RUT_MODE"
 
 router = APIRouter()
 
@@ -20,26 +27,32 @@ router = APIRouter()
     "/",
     response_model=PaginatedResponse,
     summary="Listar personas",
-    description="Obtener lista paginada de personas con RUT desencriptado."
+    description="Obtener lista paginada de personas con RUT ofuscado (o completo con rut_mode=full)."
 )
 async def get_persons(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    count: CountStrategy = Query(CountStrategy.ESTIMATE, description=COUNT_DESCRIPTION),
+    rut_mode: Optional[RutMode] = Query(None, description=RUT_MODE_DESCRIPTION),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener lista de personas"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    persons = person_service.get_persons(skip=skip, limit=limit, user_id=current_user.id, ip_address=ip_address)
+    persons, _ = await person_service.get_persons(
+        skip=skip, limit=limit, user_id=current_user.id, ip_address=ip_address, include_total=False,
+        rut_mode=rut_mode
+    )
     
-    # Contar total de personas
-    from app.repositories.person import PersonRepository
-    person_repo = PersonRepository(db)
-    total = person_repo.count()
+    # Contar total de personas según la estrategia
+    total = await count_total_async(
+        db, lambda session: session.query(Person), count,
+        skip=skip, returned=len(persons), limit=limit, filtered=False
+    )
     
     # Convertir cada persona a diccionario de manera segura
     items = []
@@ -56,9 +69,11 @@ async def get_persons(
     
     return ResponseUtils.paginated_response(
         items=items,
-        total=total,
+        total=total.total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        total_is_exact=total.exact,
+        count_strategy=total.strategy
     )
 
 
@@ -73,13 +88,16 @@ async def create_person(
     request: Request,
     person_data: PersonCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nueva persona"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
-    return person_service.create_person(person_data, current_user.id, ip_address)
+    # Hash de religión en el executor acotado, fuera del event loop
+    religion_digest = await religion_hash_executor.hash(person_data.religion)
+    
+    return await person_service.create_person(person_data, current_user.id, ip_address, religion_digest)
 
 
 @router.get(
@@ -92,13 +110,13 @@ async def get_person(
     person_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener persona por ID"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
-    person = person_service.get_person_by_id(person_id, current_user.id, ip_address)
+    person = await person_service.get_person_by_id(person_id, current_user.id, ip_address)
     
     if not person:
         raise HTTPException(
@@ -120,13 +138,16 @@ async def update_person(
     request: Request,
     person_data: PersonUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar persona"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
-    return person_service.update_person(person_id, person_data, current_user.id, ip_address)
+    # Hash de religión en el executor acotado, fuera del event loop
+    religion_digest = await religion_hash_executor.hash(person_data.religion) if person_data.religion else None
+    
+    return await person_service.update_person(person_id, person_data, current_user.id, ip_address, religion_digest)
 
 
 @router.delete(
@@ -139,13 +160,13 @@ async def delete_person(
     person_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Eliminar persona"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
-    success = person_service.delete_person(person_id, current_user.id, ip_address)
+    success = await person_service.delete_person(person_id, current_user.id, ip_address)
     
     if success:
         return ResponseUtils.success_response("Persona eliminada exitosamente")
@@ -166,13 +187,13 @@ async def search_person_by_rut(
     rut: str = Query(..., description="RUT chileno a buscar"),
     request: Request = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Buscar persona por RUT"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
-    person = person_service.search_person_by_rut(rut, current_user.id, ip_address)
+    person = await person_service.search_person_by_rut(rut, current_user.id, ip_address)
     
     if not person:
         raise HTTPException(
@@ -187,7 +208,7 @@ async def search_person_by_rut(
     "/search/name",
     response_model=PaginatedResponse,
     summary="Buscar por nombre",
-    description="Buscar personas por nombre y/o apellido con RUT desencriptado."
+    description="Buscar personas por nombre y/o apellido con RUT ofuscado (o completo con rut_mode=full)."
 )
 async def search_persons_by_name(
     request: Request,
@@ -195,8 +216,10 @@ async def search_persons_by_name(
     apellido: Optional[str] = Query(None, description="Apellido a buscar"),
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    count: CountStrategy = Query(CountStrategy.LOOKAHEAD, description=COUNT_DESCRIPTION),
+    rut_mode: Optional[RutMode] = Query(None, description=RUT_MODE_DESCRIPTION),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Buscar personas por nombre y/o apellido"""
     if not nombre and not apellido:
@@ -209,26 +232,29 @@ async def search_persons_by_name(
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    persons = person_service.search_persons_by_name(
+    persons = await person_service.search_persons_by_name(
         nombre=nombre, 
         apellido=apellido, 
         skip=skip, 
         limit=limit, 
         user_id=current_user.id, 
-        ip_address=ip_address
+        ip_address=ip_address,
+        rut_mode=rut_mode
     )
     
-    # Para el total, necesitamos hacer la consulta sin paginación
-    from app.repositories.person import PersonRepository
-    person_repo = PersonRepository(db)
-    total_persons = person_repo.search_by_name(nombre, apellido, skip=0, limit=10000)
-    total = len(total_persons)
+    # Total según la estrategia, sobre la misma consulta sin paginar
+    total = await count_total_async(
+        db, lambda session: PersonRepository(session).search_by_name_query(nombre, apellido), count,
+        skip=skip, returned=len(persons), limit=limit
+    )
     
     return ResponseUtils.paginated_response(
         items=[person.dict() for person in persons],
-        total=total,
+        total=total.total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        total_is_exact=total.exact,
+        count_strategy=total.strategy
     )
 
 
@@ -242,30 +268,36 @@ async def get_my_persons(
     request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    count: CountStrategy = Query(CountStrategy.EXACT, description=COUNT_DESCRIPTION),
+    rut_mode: Optional[RutMode] = Query(None, description=RUT_MODE_DESCRIPTION),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener personas creadas por el usuario actual"""
     person_service = PersonService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    persons = person_service.get_persons_by_user(
+    persons = await person_service.get_persons_by_user(
         created_by=current_user.id,
         skip=skip,
         limit=limit,
         user_id=current_user.id,
-        ip_address=ip_address
+        ip_address=ip_address,
+        rut_mode=rut_mode
     )
     
     # Contar total de personas creadas por el usuario
-    from app.repositories.person import PersonRepository
-    person_repo = PersonRepository(db)
-    total = person_repo.count_by_created_by(current_user.id)
+    total = await count_total_async(
+        db, lambda session: PersonRepository(session).created_by_query(current_user.id), count,
+        skip=skip, returned=len(persons), limit=limit
+    )
     
     return ResponseUtils.paginated_response(
         items=[person.dict() for person in persons],
-        total=total,
+        total=total.total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        total_is_exact=total.exact,
+        count_strategy=total.strategy
     )
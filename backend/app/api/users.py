@@ -3,9 +3,9 @@ Rutas de la API para usuarios.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.schemas.common import ApiResponse, PaginatedResponse
 from app.services.user import UserService
@@ -28,19 +28,19 @@ async def get_users(
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener lista de usuarios"""
     user_service = UserService(db)
     ip_address = get_client_ip(request)
     
     skip, limit = ResponseUtils.calculate_pagination(page, per_page)
-    users = user_service.get_users(skip=skip, limit=limit)
+    users = await user_service.get_users(skip=skip, limit=limit)
     
     # Contar total de usuarios
-    from app.repositories.user import UserRepository
-    user_repo = UserRepository(db)
-    total = user_repo.count()
+    from app.repositories.user import AsyncUserRepository
+    user_repo = AsyncUserRepository(db)
+    total = await user_repo.count()
     
     return ResponseUtils.paginated_response(
         items=[user.dict() for user in users],
@@ -62,13 +62,13 @@ async def create_user(
     request: Request,
     user_data: UserCreate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nuevo usuario"""
     user_service = UserService(db)
     ip_address = get_client_ip(request)
     
-    return user_service.create_user(user_data, current_user.id, ip_address)
+    return await user_service.create_user(user_data, current_user.id, ip_address)
 
 
 @router.get(
@@ -80,7 +80,7 @@ async def create_user(
 async def get_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener usuario por ID"""
     # Verificar permisos
@@ -91,7 +91,7 @@ async def get_user(
         )
     
     user_service = UserService(db)
-    user = user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id)
     
     if not user:
         raise HTTPException(
@@ -113,7 +113,7 @@ async def update_user(
     request: Request,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar usuario"""
     # Verificar permisos
@@ -133,7 +133,7 @@ async def update_user(
     user_service = UserService(db)
     ip_address = get_client_ip(request)
     
-    return user_service.update_user(user_id, user_data, current_user.id, ip_address)
+    return await user_service.update_user(user_id, user_data, current_user.id, ip_address)
 
 
 @router.delete(
@@ -147,7 +147,7 @@ async def delete_user(
     user_id: int,
     request: Request,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Eliminar usuario"""
     # No permitir auto-eliminación
@@ -160,7 +160,7 @@ async def delete_user(
     user_service = UserService(db)
     ip_address = get_client_ip(request)
     
-    success = user_service.delete_user(user_id, current_user.id, ip_address)
+    success = await user_service.delete_user(user_id, current_user.id, ip_address)
     
     if success:
         return ResponseUtils.success_response("Usuario eliminado exitosamente")
@@ -0,0 +1,126 @@
+"""
+Calibración de los parámetros de hash en el host.
+
+Mide la derivación PBKDF2 de la clave de RUT (RUT_ENCRYPTION_ITERATIONS) y
+SecurityService.hash_religion con la configuración actual, y recomienda
+ARGON2_TIME_COST y ARGON2_MEMORY_COST para una latencia objetivo por hash y
+un presupuesto de concurrencia: la memoria por hash se limita a
+RELIGION_HASH_MEMORY_BUDGET_MB / concurrencia (potencia de dos, mínimo
+ARGON2_MIN_MEMORY_KB) y se elige el mayor time_cost que cumple la latencia;
+si ni time_cost=1 la cumple, se reduce la memoria.
+
+Uso como script:
+    python -m app.core.calibration
+    python -m app.core.calibration --target-ms 150 --concurrency 16
+"""
+
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.security_service import SecurityService, derive_rut_key
+
+# Memoria mínima por hash que se recomienda (19 MiB, mínimo recomendado por OWASP para Argon2id)
+ARGON2_MIN_MEMORY_KB = 19 * 1024
+ARGON2_MAX_TIME_COST = 10
+
+
+def measure(function: Callable[[], object], repeat: int = 3) -> float:
+    """Mediana en segundos de repeat ejecuciones"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def argon2_latency(time_cost: int, memory_kb: int, parallelism: int, repeat: int = 3) -> float:
+    """Latencia mediana de un hash Argon2 con los parámetros dados"""
+    import argon2
+
+    hasher = argon2.PasswordHasher(
+        time_cost=time_cost, memory_cost=memory_kb, parallelism=parallelism, hash_len=32, salt_len=16
+    )
+    return measure(lambda: hasher.hash("calibracion"), repeat)
+
+
+def recommend_argon2(target_seconds: float, concurrency: int, memory_budget_mb: int,
+                     parallelism: Optional[int] = None, repeat: int = 3) -> Dict:
+    """
+    Parámetros Argon2 que cumplen la latencia objetivo con concurrency hashes
+    simultáneos dentro de memory_budget_mb.
+
+    Retorna los parámetros elegidos, su latencia y las mediciones hechas.
+    """
+    parallelism = parallelism or settings.ARGON2_PARALLELISM
+    ceiling = max(memory_budget_mb * 1024 // max(concurrency, 1), ARGON2_MIN_MEMORY_KB)
+    memory_kb = 1 << (ceiling.bit_length() - 1)
+    memory_kb = max(memory_kb, ARGON2_MIN_MEMORY_KB)
+    trials: List[Dict] = []
+
+    while True:
+        chosen = None
+        for time_cost in range(1, ARGON2_MAX_TIME_COST + 1):
+            latency = argon2_latency(time_cost, memory_kb, parallelism, repeat)
+            trials.append({"time_cost": time_cost, "memory_kb": memory_kb, "seconds": latency})
+            if latency > target_seconds:
+                break
+            chosen = {"time_cost": time_cost, "memory_kb": memory_kb, "seconds": latency}
+        if chosen is not None or memory_kb <= ARGON2_MIN_MEMORY_KB:
+            break
+        memory_kb = max(memory_kb // 2, ARGON2_MIN_MEMORY_KB)
+
+    if chosen is None:
+        # Ni con la memoria mínima y time_cost=1 se cumple el objetivo
+        chosen = dict(trials[-1] if trials[-1]["time_cost"] == 1 else trials[0])
+        chosen["meets_target"] = False
+    else:
+        chosen["meets_target"] = True
+    chosen["parallelism"] = parallelism
+    chosen["concurrent_hashes"] = memory_budget_mb * 1024 // chosen["memory_kb"]
+    return {"recommended": chosen, "trials": trials}
+
+
+def calibrate(target_ms: float, concurrency: int, memory_budget_mb: int, repeat: int = 3) -> Dict:
+    """Medir la configuración actual y recomendar parámetros Argon2"""
+    current = {
+        "pbkdf2_iterations": settings.RUT_ENCRYPTION_ITERATIONS,
+        "pbkdf2_seconds": measure(lambda: derive_rut_key(settings.RUT_ENCRYPTION_KEY), repeat),
+        "religion_algorithm": settings.RELIGION_HASH_ALGORITHM,
+        "religion_seconds": measure(lambda: SecurityService.hash_religion("calibracion"), repeat),
+        "argon2_time_cost": settings.ARGON2_TIME_COST,
+        "argon2_memory_kb": settings.ARGON2_MEMORY_COST,
+    }
+    result = recommend_argon2(target_ms / 1000, concurrency, memory_budget_mb, repeat=repeat)
+    return {"current": current, **result}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibración de Argon2 y PBKDF2 en este host")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Latencia objetivo por hash")
+    parser.add_argument("--concurrency", type=int, default=8, help="Hashes simultáneos a sostener")
+    parser.add_argument("--memory-budget-mb", type=int, default=settings.RELIGION_HASH_MEMORY_BUDGET_MB)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = calibrate(args.target_ms, args.concurrency, args.memory_budget_mb, args.repeat)
+    current = report["current"]
+    print(f"PBKDF2 ({current['pbkdf2_iterations']} iteraciones): {current['pbkdf2_seconds'] * 1000:.0f} ms")
+    print(f"hash_religion actual ({current['religion_algorithm']}, t={current['argon2_time_cost']}, "
+          f"m={current['argon2_memory_kb']} KB): {current['religion_seconds'] * 1000:.0f} ms")
+    print("\nMediciones Argon2:")
+    for trial in report["trials"]:
+        print(f"  t={trial['time_cost']:>2} m={trial['memory_kb']:>7} KB  {trial['seconds'] * 1000:>7.0f} ms")
+    recommended = report["recommended"]
+    if not recommended["meets_target"]:
+        print(f"\n⚠️  Ningún parámetro cumple {args.target_ms:.0f} ms; se recomienda el más barato medido")
+    print(f"\nRecomendado para {args.target_ms:.0f} ms y {args.concurrency} hashes simultáneos "
+          f"en {args.memory_budget_mb} MB ({recommended['seconds'] * 1000:.0f} ms por hash, "
+          f"{recommended['concurrent_hashes']} simultáneos):")
+    print(f"ARGON2_TIME_COST={recommended['time_cost']}")
+    print(f"ARGON2_MEMORY_COST={recommended['memory_kb']}")
+    print(f"ARGON2_PARALLELISM={recommended['parallelism']}")
@@ -0,0 +1,119 @@
+"""
+Ejecución acotada del hash de religión.
+
+Con RELIGION_HASH_ALGORITHM=ARGON2 cada hash reserva ARGON2_MEMORY_COST KB y
+ocupa un núcleo. Las rutas async no calculan el hash en el event loop: lo
+envían a un ThreadPoolExecutor dedicado con religion_hash_executor.hash() (el
+binding de argon2 libera el GIL). Además, todo hash Argon2, venga del
+executor o de código síncrono, pasa por un semáforo con tantos permisos como
+hashes simultáneos caben en RELIGION_HASH_MEMORY_BUDGET_MB, de modo que la
+memoria del worker queda acotada aunque lleguen muchas altas a la vez.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from prometheus_client import Gauge, Histogram
+
+from app.core.config import settings
+
+# Métricas de Prometheus
+religion_hash_queue_wait_histogram = Histogram(
+    'religion_hash_queue_wait_seconds', 'Espera del hash de religión antes de ejecutarse', ['stage'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+religion_hash_duration_histogram = Histogram(
+    'religion_hash_duration_seconds', 'Duración de cada hash Argon2 de religión',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+religion_hash_in_flight_gauge = Gauge(
+    'religion_hash_in_flight', 'Hashes Argon2 de religión en ejecución'
+)
+
+
+def argon2_permits() -> int:
+    """
+    Hashes Argon2 simultáneos permitidos: los que caben en el presupuesto de
+    memoria, sin superar los workers del executor (mínimo 1)
+    """
+    per_hash_kb = max(settings.ARGON2_MEMORY_COST, 1)
+    by_memory = settings.RELIGION_HASH_MEMORY_BUDGET_MB * 1024 // per_hash_kb
+    return max(1, min(executor_workers(), by_memory))
+
+
+def executor_workers() -> int:
+    """Hilos del executor de hash (RELIGION_HASH_MAX_WORKERS o núcleos disponibles)"""
+    return settings.RELIGION_HASH_MAX_WORKERS or os.cpu_count() or 1
+
+
+class ReligionHashExecutor:
+    """Executor acotado y semáforo de memoria para el hash de religión"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[threading.BoundedSemaphore] = None
+        self.permits = 0
+
+    def _get_semaphore(self) -> threading.BoundedSemaphore:
+        if self._semaphore is None:
+            with self._lock:
+                if self._semaphore is None:
+                    self.permits = argon2_permits()
+                    self._semaphore = threading.BoundedSemaphore(self.permits)
+        return self._semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=executor_workers(), thread_name_prefix="religion-hash"
+                    )
+        return self._executor
+
+    @contextmanager
+    def admission(self) -> Iterator[None]:
+        """Reservar memoria para un hash Argon2 y medir espera y duración"""
+        semaphore = self._get_semaphore()
+        queued = time.perf_counter()
+        semaphore.acquire()
+        started = time.perf_counter()
+        religion_hash_queue_wait_histogram.labels(stage="memory").observe(started - queued)
+        religion_hash_in_flight_gauge.inc()
+        try:
+            yield
+        finally:
+            religion_hash_in_flight_gauge.dec()
+            religion_hash_duration_histogram.observe(time.perf_counter() - started)
+            semaphore.release()
+
+    async def hash(self, religion: str, salt: str = None) -> Tuple[str, str]:
+        """SecurityService.hash_religion ejecutado en el executor; retorna (hash, salt)"""
+        from app.core.security_service import SecurityService
+
+        queued = time.perf_counter()
+
+        def run() -> Tuple[str, str]:
+            religion_hash_queue_wait_histogram.labels(stage="executor").observe(time.perf_counter() - queued)
+            return SecurityService.hash_religion(religion, salt)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), run)
+
+    def shutdown(self) -> None:
+        """Cerrar el executor (los hashes en curso terminan)"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            self._semaphore = None
+
+
+# Instancia global
+religion_hash_executor = ReligionHashExecutor()
@@ -0,0 +1,159 @@
+"""
+Ejecución acotada de bcrypt para contraseñas.
+
+Cada hash o verificación bcrypt (~250 ms con 12 rondas) ejecutado dentro de un
+handler async congelaba el event loop del worker durante todo ese tiempo. Las
+rutas async envían estas operaciones a un ThreadPoolExecutor dedicado de
+PASSWORD_HASH_MAX_WORKERS hilos (bcrypt libera el GIL) con password_hasher.hash()
+y password_hasher.verify(). Como mucho PASSWORD_HASH_QUEUE_SIZE operaciones
+esperan detrás de las que están en ejecución; con el pool saturado la petición
+se rechaza de inmediato con 503 y Retry-After en lugar de acumular esperas.
+SecurityUtils.get_password_hash / verify_password siguen disponibles para
+scripts y código síncrono.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import settings
+from app.core.security_utils import SecurityUtils
+
+# Métricas de Prometheus
+password_hash_queue_wait_histogram = Histogram(
+    'password_hash_queue_wait_seconds', 'Espera de la operación bcrypt antes de ejecutarse',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+password_hash_duration_histogram = Histogram(
+    'password_hash_duration_seconds', 'Duración de cada operación bcrypt', ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+password_hash_pending_gauge = Gauge(
+    'password_hash_pending', 'Operaciones bcrypt en ejecución o en cola'
+)
+password_hash_saturation_gauge = Gauge(
+    'password_hash_pool_saturation_ratio', 'Ocupación del pool bcrypt (pendientes / capacidad)'
+)
+password_hash_rejected_counter = Counter(
+    'password_hash_rejected_total', 'Operaciones bcrypt rechazadas con 503 por pool saturado'
+)
+login_duration_histogram = Histogram(
+    'login_duration_seconds', 'Duración de la autenticación en login (incluye la espera del pool bcrypt)',
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+)
+
+
+class PasswordHashPoolSaturated(HTTPException):
+    """503 con Retry-After cuando el pool bcrypt no admite más operaciones"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servicio de autenticación saturado, reintente en unos segundos",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def executor_workers() -> int:
+    """Hilos del pool bcrypt (PASSWORD_HASH_MAX_WORKERS o núcleos disponibles)"""
+    return settings.PASSWORD_HASH_MAX_WORKERS or os.cpu_count() or 1
+
+
+class PasswordHashPool:
+    """Executor bcrypt acotado: workers en ejecución + PASSWORD_HASH_QUEUE_SIZE en cola"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.workers = 0
+        self.pending = 0
+        # Duración media reciente de una operación, para estimar Retry-After
+        self.average_duration = 0.25
+
+    @property
+    def capacity(self) -> int:
+        return executor_workers() + settings.PASSWORD_HASH_QUEUE_SIZE
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self.workers = executor_workers()
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+        return self._executor
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se vacíe la cola actual"""
+        workers = self.workers or executor_workers()
+        return max(1, math.ceil(self.pending / workers * self.average_duration))
+
+    def _admit(self) -> None:
+        capacity = self.capacity
+        with self._lock:
+            if self.pending >= capacity:
+                password_hash_rejected_counter.inc()
+                raise PasswordHashPoolSaturated(self.retry_after())
+            self.pending += 1
+            pending = self.pending
+        password_hash_pending_gauge.set(pending)
+        password_hash_saturation_gauge.set(pending / capacity)
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self.pending -= 1
+            pending = self.pending
+        password_hash_pending_gauge.set(pending)
+        password_hash_saturation_gauge.set(pending / self.capacity)
+
+    async def _run(self, operation: str, function: Callable, *args):
+        executor = self._get_executor()
+        self._admit()
+        queued = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            password_hash_queue_wait_histogram.observe(started - queued)
+            try:
+                return function(*args)
+            finally:
+                duration = time.perf_counter() - started
+                password_hash_duration_histogram.labels(operation=operation).observe(duration)
+                self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+
+        try:
+            future = executor.submit(run)
+        except Exception:
+            self._release()
+            raise
+        # Se libera al terminar el hilo (o al cancelarse antes de empezar), no al
+        # abandonar la espera: una petición cancelada no libera capacidad en uso
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """SecurityUtils.get_password_hash en el pool"""
+        return await self._run("hash", SecurityUtils.get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """SecurityUtils.verify_password en el pool"""
+        return await self._run("verify", SecurityUtils.verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        """Cerrar el executor (las operaciones en curso terminan)"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# Instancia global
+password_hasher = PasswordHashPool()
@@ -0,0 +1,208 @@
+"""
+Motor único de RUT chileno: limpieza, dígito verificador, validación y formato.
+
+Las funciones escalares (clean_rut, check_digit, validate_rut, format_rut) son
+las que usan SecurityService, RutValidator y los esquemas Pydantic. Las
+funciones por lotes (clean_ruts, check_digits, validate_ruts, format_ruts,
+generate_ruts) procesan listas completas con NumPy: los RUT se convierten en
+una matriz de códigos de carácter (una fila por RUT) y el módulo 11 se calcula
+con aritmética sobre toda la matriz, sin bucles por carácter en Python. Son
+para cargas masivas; para un solo RUT la versión escalar es más rápida.
+
+Reglas comunes:
+- Limpiar deja solo dígitos y K (la k minúscula pasa a K).
+- El dígito verificador usa los pesos 2..7 desde la derecha:
+  11 - suma % 11, con 11 -> "0" y 10 -> "K".
+- Un RUT válido tiene entre min_digits y max_digits dígitos de cuerpo
+  (por defecto 1 a 8) seguidos del dígito verificador correcto.
+
+Benchmark: python -m benchmarks.rut_engine
+"""
+
+import re
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+RUT_CLEAN_RE = re.compile(r'[^0-9kK]')
+# Dígito verificador según suma % 11 (0 -> "0", 1 -> "K", 2 -> "9", ...)
+CHECK_DIGIT_CHARS = "0K987654321"
+MAX_BODY_DIGITS = 8
+
+_CHECK_DIGIT_CODES = np.array([ord(char) for char in CHECK_DIGIT_CHARS], dtype=np.uint32)
+_ZERO, _NINE, _K, _K_LOWER = ord("0"), ord("9"), ord("K"), ord("k")
+_DOT, _DASH = ord("."), ord("-")
+
+
+# Funciones escalares
+
+def clean_rut(rut: str) -> str:
+    """Dejar solo dígitos y K ("12.345.678-k" -> "12345678K")"""
+    if not rut:
+        return ""
+    return RUT_CLEAN_RE.sub('', rut).upper()
+
+
+def check_digit(body: str) -> str:
+    """Dígito verificador del cuerpo numérico de un RUT (ValueError si no es numérico)"""
+    total = 0
+    for position, digit in enumerate(reversed(body)):
+        total += int(digit) * (2 + position % 6)
+    return CHECK_DIGIT_CHARS[total % 11]
+
+
+def has_valid_check_digit(clean: str) -> bool:
+    """Verificar el último carácter de un RUT limpio contra su cuerpo"""
+    if len(clean) < 2 or not clean[:-1].isdigit():
+        return False
+    return check_digit(clean[:-1]) == clean[-1].upper()
+
+
+def validate_rut(rut: str, min_digits: int = 1, max_digits: int = MAX_BODY_DIGITS) -> bool:
+    """Validar largo del cuerpo y dígito verificador de un RUT"""
+    clean = clean_rut(rut)
+    if not min_digits + 1 <= len(clean) <= max_digits + 1:
+        return False
+    return has_valid_check_digit(clean)
+
+
+def format_rut(rut: str) -> str:
+    """Formato XX.XXX.XXX-Y de un RUT (sin validar)"""
+    clean = clean_rut(rut)
+    if len(clean) <= 1:
+        return clean
+    body = clean[:-1]
+    # Puntos cada 3 caracteres desde la derecha, conservando ceros a la izquierda
+    head = len(body) % 3 or 3
+    groups = [body[:head]] + [body[i:i + 3] for i in range(head, len(body), 3)]
+    return ".".join(groups) + f"-{clean[-1]}"
+
+
+# Funciones por lotes (NumPy)
+
+def _code_matrix(ruts: Sequence[str]) -> np.ndarray:
+    """Matriz (n, ancho) de códigos Unicode, rellena con 0 a la derecha"""
+    array = np.asarray([rut or "" for rut in ruts], dtype=str)
+    width = max(array.itemsize // 4, 1)
+    array = array.astype(f"<U{width}")
+    return array.view(np.uint32).reshape(len(array), width)
+
+
+def _strings(codes: np.ndarray) -> List[str]:
+    """Inversa de _code_matrix: filas de códigos a str (los 0 finales se descartan)"""
+    codes = np.ascontiguousarray(codes, dtype=np.uint32)
+    return codes.view(f"<U{codes.shape[1]}").ravel().tolist()
+
+
+def _clean_matrix(ruts: Sequence[str]):
+    """
+    RUT limpios alineados a la izquierda: retorna (códigos, largos). Los
+    caracteres que no son dígitos ni K se descartan y la k pasa a K; como lo
+    que queda es ASCII, los códigos se guardan en uint8.
+    """
+    codes = _code_matrix(ruts)
+    is_k = (codes == _K) | (codes == _K_LOWER)
+    keep = ((codes >= _ZERO) & (codes <= _NINE)) | is_k
+    # Orden estable que lleva los caracteres conservados al inicio de cada fila
+    order = np.argsort(~keep, axis=1, kind="stable")
+    ascii_codes = np.where(keep, np.where(is_k, _K, codes), 0).astype(np.uint8)
+    packed = np.take_along_axis(ascii_codes, order, axis=1)
+    lengths = keep.sum(axis=1)
+    packed[np.arange(codes.shape[1]) >= lengths[:, None]] = 0
+    return packed, lengths
+
+
+def _body_totals(codes: np.ndarray, lengths: np.ndarray):
+    """
+    Suma ponderada del módulo 11 y si el cuerpo es numérico, por fila, para
+    RUT limpios alineados a la izquierda (el último carácter es el dígito
+    verificador).
+    """
+    columns = np.arange(codes.shape[1])
+    body_lengths = lengths - 1
+    in_body = columns < body_lengths[:, None]
+    is_digit = (codes >= _ZERO) & (codes <= _NINE)
+    # Posición de cada carácter contada desde la derecha del cuerpo
+    position = body_lengths[:, None] - 1 - columns
+    weights = np.where(in_body, 2 + np.mod(position, 6), 0)
+    values = np.where(in_body & is_digit, codes.astype(np.int32) - _ZERO, 0)
+    totals = (values * weights).sum(axis=1)
+    numeric = ~(in_body & ~is_digit).any(axis=1)
+    return totals, numeric
+
+
+def clean_ruts(ruts: Sequence[str]) -> List[str]:
+    """clean_rut sobre una lista de RUT"""
+    if not len(ruts):
+        return []
+    packed, _ = _clean_matrix(ruts)
+    return _strings(packed)
+
+
+def check_digits(numbers: Iterable[int]) -> np.ndarray:
+    """Dígitos verificadores (arreglo de str de largo 1) de cuerpos numéricos"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if numbers.size and (numbers.min() < 0 or numbers.max() >= 10 ** MAX_BODY_DIGITS):
+        raise ValueError(f"Los cuerpos de RUT deben tener a lo más {MAX_BODY_DIGITS} dígitos")
+    positions = np.arange(MAX_BODY_DIGITS)
+    digits = (numbers[:, None] // 10 ** positions) % 10
+    totals = (digits * (2 + positions % 6)).sum(axis=1)
+    return _CHECK_DIGIT_CODES[totals % 11].view("<U1")
+
+
+def validate_ruts(ruts: Sequence[str], min_digits: int = 1,
+                  max_digits: int = MAX_BODY_DIGITS) -> np.ndarray:
+    """validate_rut sobre una lista de RUT; retorna un arreglo de bool"""
+    if not len(ruts):
+        return np.zeros(0, dtype=bool)
+    packed, lengths = _clean_matrix(ruts)
+    totals, numeric = _body_totals(packed, lengths)
+    last = packed[np.arange(len(packed)), np.maximum(lengths - 1, 0)]
+    return (
+        (lengths >= min_digits + 1) & (lengths <= max_digits + 1)
+        & numeric & (last == _CHECK_DIGIT_CODES[totals % 11])
+    )
+
+
+def format_ruts(ruts: Sequence[str]) -> List[str]:
+    """format_rut sobre una lista de RUT"""
+    if not len(ruts):
+        return []
+    packed, lengths = _clean_matrix(ruts)
+    rows = np.arange(len(packed))[:, None]
+    body_lengths = np.maximum(lengths - 1, 0)
+    width = packed.shape[1] + 1 + max(packed.shape[1] - 2, 0) // 3
+
+    # Salida alineada a la derecha: posición p contada desde el final
+    p = np.arange(width)[::-1][None, :]
+    q = p - 2
+    is_dot = (q >= 0) & (q % 4 == 3)
+    digit = q - q // 4
+    source = np.clip(lengths[:, None] - 2 - digit, 0, packed.shape[1] - 1)
+    output = np.where(is_dot, _DOT, packed[rows, source])
+    output = np.where((q >= 0) & ~is_dot & (digit >= body_lengths[:, None]), 0, output)
+    output = np.where(is_dot & (body_lengths[:, None] <= 3 * (q // 4 + 1)), 0, output)
+    output[:, -1] = packed[rows[:, 0], np.maximum(lengths - 1, 0)]
+    output[:, -2] = _DASH
+
+    # Alinear a la izquierda desplazando cada fila según su largo
+    out_lengths = lengths + 1 + np.maximum(body_lengths - 1, 0) // 3
+    index = np.arange(width)[None, :] + (width - out_lengths)[:, None]
+    output = np.take_along_axis(output, np.clip(index, 0, width - 1), axis=1)
+    output[index >= width] = 0
+
+    formatted = _strings(output)
+    # RUT de largo 0 o 1 se retornan limpios, como format_rut
+    for i in np.flatnonzero(lengths <= 1):
+        formatted[i] = _strings(packed[i:i + 1])[0]
+    return formatted
+
+
+def generate_ruts(numbers: Iterable[int], formatted: bool = False) -> List[str]:
+    """RUT válidos ("12345678-5" o "12.345.678-5") a partir de sus cuerpos numéricos"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    digits = check_digits(numbers)
+    bodies = numbers.astype(str)
+    if formatted:
+        return format_ruts(np.char.add(bodies, digits).tolist())
+    return np.char.add(np.char.add(bodies, "-"), digits).tolist()
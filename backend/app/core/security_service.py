@@ -2,27 +2,177 @@
 Servicio de seguridad para operaciones criptográficas y de protección de datos.
 """
 
+import asyncio
 import base64
+import multiprocessing
 import os
-from cryptography.fernet import Fernet
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESSIV
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from app.core.config import settings
+from app.core.hash_executor import religion_hash_executor
+from app.core import rut_engine
 import logging
-import re
 import hashlib
+import hmac
 import secrets
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Formato binario de persons.rut_data: byte de versión + token Fernet sin base64
+RUT_FORMAT_FERNET = 1
+# Formato determinista: byte de versión + AES-SIV (vector sintético de 16 bytes + texto cifrado)
+# del RUT canónico; el mismo RUT produce el mismo valor, que sirve de clave de búsqueda
+RUT_FORMAT_SIV = 2
+# Token Fernet: versión (1) + timestamp (8) + IV (16) + texto cifrado (16*n) + HMAC (32)
+_FERNET_MIN_LENGTH = 1 + 8 + 16 + 16 + 32
+
+
+def pack_rut_token(token: bytes) -> bytes:
+    """Token Fernet (base64) -> valor binario de rut_data"""
+    return bytes([RUT_FORMAT_FERNET]) + base64.urlsafe_b64decode(token)
+
+
+def unpack_rut_token(packed: bytes) -> bytes:
+    """Valor binario de rut_data -> token Fernet (base64); lanza InvalidToken si la versión no es conocida"""
+    if not packed or packed[0] != RUT_FORMAT_FERNET:
+        raise InvalidToken
+    return base64.urlsafe_b64encode(packed[1:])
+
+
+def text_to_packed_rut(encrypted_rut: str) -> bytes:
+    """RUT cifrado en formato texto (token Fernet en base64) -> valor binario de rut_data"""
+    packed = pack_rut_token(base64.urlsafe_b64decode(encrypted_rut))
+    if len(packed) < _FERNET_MIN_LENGTH or packed[1] != 0x80:
+        raise InvalidToken
+    return packed
+
+
+def derive_siv_key(fernet_key: bytes) -> bytes:
+    """Clave AES-SIV de 512 bits derivada con HKDF de una clave Fernet del anillo"""
+    return HKDF(
+        algorithm=hashes.SHA256(), length=64, salt=None, info=b"rut-aes-siv"
+    ).derive(base64.urlsafe_b64decode(fernet_key))
+
+
+def derive_rut_key(passphrase: str) -> bytes:
+    """Derivar una clave Fernet desde una frase con PBKDF2 (RUT_ENCRYPTION_SALT)"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=settings.RUT_ENCRYPTION_SALT.encode(),
+        iterations=settings.RUT_ENCRYPTION_ITERATIONS,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(passphrase.encode()))
+
+
+class RutKeyRing:
+    """
+    Anillo de claves del cifrado de RUT: la clave actual cifra y descifra y las
+    anteriores solo descifran. Los objetos Fernet se construyen una sola vez.
+    """
+    
+    def __init__(self, current_key: bytes, previous_keys: Sequence[bytes] = ()):
+        self.current = Fernet(current_key)
+        self.previous = [Fernet(key) for key in previous_keys]
+        self.multi = MultiFernet([self.current, *self.previous])
+        # Cifradores AES-SIV del formato determinista, en el mismo orden
+        self.siv = [AESSIV(derive_siv_key(key)) for key in (current_key, *previous_keys)]
+        # Identificador no reversible de la clave actual (puntos de control de rotación)
+        self.fingerprint = hashlib.sha256(current_key).hexdigest()[:16]
+    
+    def encrypt(self, data: bytes) -> bytes:
+        """Cifrar con la clave actual"""
+        return self.current.encrypt(data)
+    
+    def decrypt(self, token: bytes) -> bytes:
+        """Descifrar con la clave actual o cualquiera de las anteriores"""
+        return self.multi.decrypt(token)
+    
+    def encrypt_siv(self, data: bytes) -> bytes:
+        """Cifrar de forma determinista con la clave actual (valor de rut_data)"""
+        return bytes([RUT_FORMAT_SIV]) + self.siv[0].encrypt(data, None)
+    
+    def siv_lookup_values(self, data: bytes) -> List[bytes]:
+        """Valores de rut_data de data con cada clave del anillo (búsquedas durante una rotación)"""
+        return [bytes([RUT_FORMAT_SIV]) + siv.encrypt(data, None) for siv in self.siv]
+    
+    def decrypt_siv(self, packed: bytes) -> bytes:
+        """Descifrar un valor AES-SIV de rut_data con la clave actual o una anterior"""
+        if len(packed) < 18 or packed[0] != RUT_FORMAT_SIV:
+            raise InvalidToken
+        for siv in self.siv:
+            try:
+                return siv.decrypt(packed[1:], None)
+            except InvalidTag:
+                continue
+        raise InvalidToken
+    
+    def rotate_siv(self, packed: bytes) -> Optional[bytes]:
+        """
+        Re-cifrar un valor AES-SIV con la clave actual.
+
+        Retorna None si ya está cifrado con la clave actual; lanza InvalidToken si
+        ninguna clave del anillo lo descifra.
+        """
+        try:
+            self.siv[0].decrypt(packed[1:], None)
+            return None
+        except InvalidTag:
+            return self.encrypt_siv(self.decrypt_siv(packed))
+    
+    def decrypt_packed(self, packed: bytes) -> bytes:
+        """
+        Descifrar un valor binario de rut_data: reconstruye el token Fernet en
+        base64 y lo descifra con el anillo (o descifra AES-SIV si el byte de
+        versión es RUT_FORMAT_SIV)
+        """
+        if packed[:1] == bytes([RUT_FORMAT_SIV]):
+            return self.decrypt_siv(packed)
+        return self.multi.decrypt(unpack_rut_token(packed))
+    
+    def decrypt_stored(self, stored: Union[str, bytes]) -> bytes:
+        """Descifrar un RUT almacenado en formato binario (rut_data) o texto (rut)"""
+        if isinstance(stored, (bytes, bytearray, memoryview)):
+            return self.decrypt_packed(bytes(stored))
+        return self.multi.decrypt(base64.urlsafe_b64decode(stored))
+    
+    def rotate(self, token: bytes) -> Optional[bytes]:
+        """
+        Re-cifrar un token con la clave actual.
+
+        Retorna None si ya está cifrado con la clave actual; lanza InvalidToken si
+        ninguna clave del anillo lo descifra.
+        """
+        try:
+            self.current.decrypt(token)
+            return None
+        except InvalidToken:
+            return self.multi.rotate(token)
+
+
 class SecurityService:
     """
     Servicio para operaciones de seguridad como encriptación y desencriptación
     """
     
-    # Clave derivada para operaciones de cifrado
+    # Clave derivada y anillo de claves para operaciones de cifrado (uno por proceso)
     __key = None
+    __key_ring = None
+    __key_ring_lock = threading.Lock()
+    # Hasher Argon2 de religión (se construye una vez)
+    __religion_hasher = None
+    # Pool de procesos para lotes grandes de desencriptación
+    __decrypt_pool = None
+    __decrypt_pool_workers = 1
     
     @classmethod
     def __get_key(cls):
@@ -31,17 +181,84 @@ class SecurityService:
         """
         if cls.__key is None:
             # Derivamos una clave a partir del RUT_ENCRYPTION_KEY
-            salt = settings.RUT_ENCRYPTION_SALT.encode()
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=settings.RUT_ENCRYPTION_ITERATIONS,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(settings.RUT_ENCRYPTION_KEY.encode()))
-            cls.__key = key
+            cls.__key = derive_rut_key(settings.RUT_ENCRYPTION_KEY)
         return cls.__key
     
+    @classmethod
+    def key_ring(cls) -> RutKeyRing:
+        """
+        Anillo de claves de RUT: RUT_ENCRYPTION_KEY como clave actual y
+        RUT_ENCRYPTION_PREVIOUS_KEYS solo para descifrar
+        """
+        if cls.__key_ring is None:
+            with cls.__key_ring_lock:
+                if cls.__key_ring is None:
+                    previous = [derive_rut_key(key) for key in settings.rut_previous_keys_list]
+                    cls.__key_ring = RutKeyRing(cls.__get_key(), previous)
+        return cls.__key_ring
+    
+    @classmethod
+    def reset_key_ring(cls) -> None:
+        """Descartar las claves derivadas (p. ej. tras cambiar la configuración)"""
+        with cls.__key_ring_lock:
+            cls.__key = None
+            cls.__key_ring = None
+            cls.__religion_hasher = None
+        # Los procesos del pool conservan el anillo anterior
+        cls.shutdown_decrypt_pool()
+    
+    @classmethod
+    def religion_hasher(cls):
+        """
+        PasswordHasher de Argon2 con los parámetros de Settings (se construye
+        una vez). Lanza ImportError si argon2-cffi no está instalado.
+        """
+        if cls.__religion_hasher is None:
+            import argon2
+            with cls.__key_ring_lock:
+                if cls.__religion_hasher is None:
+                    cls.__religion_hasher = argon2.PasswordHasher(
+                        time_cost=settings.ARGON2_TIME_COST,
+                        memory_cost=settings.ARGON2_MEMORY_COST,
+                        parallelism=settings.ARGON2_PARALLELISM,
+                        hash_len=32,
+                        salt_len=16
+                    )
+        return cls.__religion_hasher
+    
+    @classmethod
+    def warm_up(cls) -> Dict[str, float]:
+        """
+        Derivar las claves y construir los hashers antes de atender peticiones,
+        para que ninguna pague el arranque en frío (PBKDF2 de
+        RUT_ENCRYPTION_ITERATIONS iteraciones, carga de argon2 y bcrypt).
+
+        Retorna la duración en segundos de cada paso.
+        """
+        from app.core.security_utils import pwd_context
+        
+        timings = {}
+        started = time.perf_counter()
+        cls.key_ring().decrypt_stored(cls.encrypt_rut_packed("11111111-1"))
+        timings["rut_key_ring"] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        cls.hash_rut("11111111-1")
+        timings["rut_blind_index"] = time.perf_counter() - started
+        
+        if settings.RELIGION_HASH_ALGORITHM == "ARGON2":
+            started = time.perf_counter()
+            try:
+                cls.hash_religion("warm-up")
+            except Exception as e:
+                logger.warning(f"No se pudo precalentar Argon2: {str(e)}")
+            timings["religion_hasher"] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        pwd_context.handler("bcrypt").get_backend()
+        timings["bcrypt_backend"] = time.perf_counter() - started
+        return timings
+    
     @classmethod
     def encrypt_rut(cls, rut: str) -> str:
         """
@@ -51,28 +268,46 @@ class SecurityService:
             return ""
             
         try:
-            key = cls.__get_key()
-            f = Fernet(key)
-            encrypted_data = f.encrypt(rut.encode())
+            encrypted_data = cls.key_ring().encrypt(rut.encode())
             return base64.urlsafe_b64encode(encrypted_data).decode()
         except Exception as e:
             logger.error(f"Error al encriptar RUT: {str(e)}")
             return ""
     
     @classmethod
-    def decrypt_rut(cls, encrypted_rut: str) -> str:
+    def encrypt_rut_packed(cls, rut: str) -> bytes:
         """
-        Desencripta un RUT utilizando Fernet (AES-256)
+        Encripta un RUT en el formato binario de rut_data (byte de versión +
+        token Fernet sin base64)
+        """
+        return pack_rut_token(cls.key_ring().encrypt(rut.encode()))
+    
+    @classmethod
+    def encrypt_rut_siv(cls, rut: str) -> bytes:
+        """
+        Encripta de forma determinista (AES-SIV) la forma canónica del RUT en
+        el formato binario de rut_data: el valor es a la vez RUT cifrado y
+        clave única de búsqueda, sin índice ciego aparte
+        """
+        return cls.key_ring().encrypt_siv(cls.canonical_rut(rut).encode())
+    
+    @classmethod
+    def rut_lookup_values(cls, rut: str) -> List[bytes]:
+        """Valores AES-SIV de rut_data con los que puede estar guardado un RUT (una por clave)"""
+        return cls.key_ring().siv_lookup_values(cls.canonical_rut(rut).encode())
+    
+    @classmethod
+    def decrypt_rut(cls, encrypted_rut: Union[str, bytes]) -> str:
+        """
+        Desencripta un RUT utilizando Fernet (AES-256) con el anillo de claves.
+        Acepta el formato texto (rut) y el binario (rut_data).
         """
         if not encrypted_rut:
             return ""
             
         try:
-            key = cls.__get_key()
-            f = Fernet(key)
-            # Convertir de base64 y desencriptar
-            encrypted_data = base64.urlsafe_b64decode(encrypted_rut)
-            decrypted_data = f.decrypt(encrypted_data)
+            # Desencriptar según el formato (clave actual o anteriores)
+            decrypted_data = cls.key_ring().decrypt_stored(encrypted_rut)
             decrypted_rut = decrypted_data.decode()
             
             # Validar que el RUT desencriptado tiene sentido
@@ -85,79 +320,93 @@ class SecurityService:
             logger.error(f"Error al desencriptar RUT: {str(e)}")
             return "RUT_DECRYPT_ERROR"  # Devolver un valor claro en lugar del encriptado
     
+    @classmethod
+    def decrypt_ruts_batch(cls, encrypted_ruts: Sequence[Union[str, bytes]]) -> List[str]:
+        """
+        Desencripta una lista de RUT con el mismo resultado por elemento que
+        decrypt_rut ("" si está vacío, RUT_DECRYPT_ERROR o RUT_CORRUPTED).
+
+        Obtiene el anillo de claves una vez y registra los errores una vez por
+        lote. Se ejecuta en el proceso actual: es la variante de los listados,
+        cuyas páginas no superan unos cientos de RUT.
+        """
+        return _decrypt_ruts_chunk(list(encrypted_ruts))
+    
+    @classmethod
+    def decrypt_ruts_bulk(cls, encrypted_ruts: Sequence[Union[str, bytes]]) -> List[str]:
+        """
+        decrypt_ruts_batch para tareas masivas (completado de rut_masked, scripts).
+
+        Los lotes de al menos RUT_DECRYPT_POOL_THRESHOLD elementos se reparten
+        en un pool de procesos si hay más de un worker. Bloquea hasta terminar:
+        se llama desde hilos de tareas o scripts; desde código async se usa
+        decrypt_ruts_bulk_async.
+        """
+        encrypted_ruts = list(encrypted_ruts)
+        threshold = settings.RUT_DECRYPT_POOL_THRESHOLD
+        workers = settings.RUT_DECRYPT_POOL_WORKERS or os.cpu_count() or 1
+        if threshold and workers > 1 and len(encrypted_ruts) >= threshold:
+            pool = cls._decrypt_pool()
+            size = -(-len(encrypted_ruts) // cls.__decrypt_pool_workers)
+            chunks = [encrypted_ruts[i:i + size] for i in range(0, len(encrypted_ruts), size)]
+            results: List[str] = []
+            for chunk in pool.map(_decrypt_ruts_chunk, chunks):
+                results.extend(chunk)
+            return results
+        return _decrypt_ruts_chunk(encrypted_ruts)
+    
+    @classmethod
+    async def decrypt_ruts_bulk_async(cls, encrypted_ruts: Sequence[Union[str, bytes]]) -> List[str]:
+        """decrypt_ruts_bulk en el executor por defecto, sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, cls.decrypt_ruts_bulk, list(encrypted_ruts))
+    
+    @classmethod
+    def _decrypt_pool(cls) -> ProcessPoolExecutor:
+        """
+        Pool de procesos para desencriptar lotes grandes (se crea al primer uso).
+
+        Usa el contexto spawn: hacer fork de un worker de uvicorn con hilos
+        puede copiar locks tomados por otros hilos y bloquear a los hijos.
+        """
+        if cls.__decrypt_pool is None:
+            with cls.__key_ring_lock:
+                if cls.__decrypt_pool is None:
+                    cls.__decrypt_pool_workers = settings.RUT_DECRYPT_POOL_WORKERS or os.cpu_count() or 1
+                    cls.__decrypt_pool = ProcessPoolExecutor(
+                        max_workers=cls.__decrypt_pool_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return cls.__decrypt_pool
+    
+    @classmethod
+    def shutdown_decrypt_pool(cls) -> None:
+        """Cerrar el pool de procesos de desencriptación"""
+        with cls.__key_ring_lock:
+            if cls.__decrypt_pool is not None:
+                cls.__decrypt_pool.shutdown(wait=True)
+                cls.__decrypt_pool = None
+    
     @classmethod
     def clean_rut(cls, rut: str) -> str:
         """
         Limpia un RUT de puntos y guiones
         """
-        if not rut:
-            return ""
-        return re.sub(r'[^0-9kK]', '', rut)
+        return rut_engine.clean_rut(rut)
     
     @classmethod
     def format_rut(cls, rut: str) -> str:
         """
         Formatea un RUT en formato XX.XXX.XXX-Y
         """
-        if not rut:
-            return ""
-            
-        clean = cls.clean_rut(rut)
-        if len(clean) <= 1:
-            return clean
-            
-        dv = clean[-1]
-        num = clean[:-1]
-        
-        # Formatear con puntos y guión
-        formatted = ""
-        for i in range(len(num), 0, -3):
-            if i >= 3:
-                formatted = "." + num[max(i-3, 0):i] + formatted
-            else:
-                formatted = num[0:i] + formatted
-                
-        if formatted.startswith("."):
-            formatted = formatted[1:]
-            
-        return f"{formatted}-{dv}"
+        return rut_engine.format_rut(rut)
     
     @classmethod
     def validate_rut(cls, rut: str) -> bool:
         """
         Valida un RUT chileno
         """
-        if not rut:
-            return False
-            
-        clean = cls.clean_rut(rut)
-        
-        # Validar formato
-        pattern = re.compile(r'^[0-9]{1,8}[0-9kK]$')
-        if not pattern.match(clean):
-            return False
-            
-        # Separar número de dígito verificador
-        rut_number = clean[:-1]
-        dv = clean[-1].upper()
-        
-        # Cálculo del dígito verificador
-        serie = [2, 3, 4, 5, 6, 7]
-        sum = 0
-        
-        for i in range(len(rut_number)):
-            sum += int(rut_number[-(i+1)]) * serie[i % len(serie)]
-            
-        calculated_dv = 11 - (sum % 11)
-        
-        if calculated_dv == 11:
-            calculated_dv = '0'
-        elif calculated_dv == 10:
-            calculated_dv = 'K'
-        else:
-            calculated_dv = str(calculated_dv)
-            
-        return calculated_dv == dv
+        return rut_engine.validate_rut(rut)
     
     @classmethod
     def mask_rut(cls, rut: str) -> str:
@@ -194,17 +443,12 @@ class SecurityService:
         # Usar el algoritmo configurado
         if settings.RELIGION_HASH_ALGORITHM == "ARGON2":
             try:
-                import argon2
-                ph = argon2.PasswordHasher(
-                    time_cost=settings.ARGON2_TIME_COST,
-                    memory_cost=settings.ARGON2_MEMORY_COST,
-                    parallelism=settings.ARGON2_PARALLELISM,
-                    hash_len=32,
-                    salt_len=16
-                )
+                ph = cls.religion_hasher()
                 # Combinar religión con salt personalizado
                 religion_with_salt = f"{religion_normalized}{salt}"
-                religion_hash = ph.hash(religion_with_salt)
+                # Limitar los hashes simultáneos al presupuesto de memoria
+                with religion_hash_executor.admission():
+                    religion_hash = ph.hash(religion_with_salt)
                 # Extraer solo el hash sin metadatos de argon2
                 hash_parts = religion_hash.split('$')
                 if len(hash_parts) >= 6:
@@ -233,13 +477,57 @@ class SecurityService:
         # Usar los primeros caracteres como identificador anónimo
         return f"hash_{religion_hash[:8]}"
     
+    @classmethod
+    def canonical_rut(cls, rut: str) -> str:
+        """
+        Forma canónica del RUT para el índice ciego: solo dígitos y K, dígito
+        verificador en mayúscula y sin ceros a la izquierda
+        ("01.234.567-k" -> "1234567K")
+        """
+        return cls.clean_rut(rut).upper().lstrip("0")
+    
     @classmethod
     def hash_rut(cls, rut: str) -> str:
         """
-        Genera hash de RUT para búsquedas
+        Índice ciego del RUT para búsquedas: HMAC-SHA256 con RUT_BLIND_INDEX_KEY
+        sobre la forma canónica. Es la única función con la que se escribe y se
+        busca persons.rut_hash.
         """
         if not rut:
             return ""
             
-        clean_rut = cls.clean_rut(rut)
-        return hashlib.sha256(clean_rut.encode()).hexdigest()
+        canonical = cls.canonical_rut(rut)
+        return hmac.new(
+            settings.RUT_BLIND_INDEX_KEY.encode(), canonical.encode(), hashlib.sha256
+        ).hexdigest()
+    
+    @classmethod
+    def rut_blind_index_fingerprint(cls) -> str:
+        """Identificador no reversible de RUT_BLIND_INDEX_KEY (puntos de control del recálculo)"""
+        return hashlib.sha256(settings.RUT_BLIND_INDEX_KEY.encode()).hexdigest()[:16]
+
+
+def _decrypt_ruts_chunk(encrypted_ruts: Sequence[Union[str, bytes]]) -> List[str]:
+    """Desencriptar un bloque de RUT (también se ejecuta en los procesos del pool)"""
+    decrypt = SecurityService.key_ring().decrypt_stored
+    results = []
+    errors = corrupted = 0
+    for encrypted_rut in encrypted_ruts:
+        if not encrypted_rut:
+            results.append("")
+            continue
+        try:
+            decrypted_rut = decrypt(encrypted_rut).decode()
+        except Exception:
+            errors += 1
+            results.append("RUT_DECRYPT_ERROR")
+            continue
+        if len(decrypted_rut) > 50 or not any(c.isdigit() for c in decrypted_rut):
+            corrupted += 1
+            results.append("RUT_CORRUPTED")
+        else:
+            results.append(decrypted_rut)
+    if errors or corrupted:
+        logger.error(f"Lote de RUT: {errors} no se pudieron desencriptar y {corrupted} parecen inválidos "
+                     f"(de {len(results)})")
+    return results
@@ -67,23 +67,45 @@ class SecurityUtils:
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
         
-        to_encode.update({"exp": expire})
+        # jti identifica al token para poder revocarlo (logout)
+        to_encode.update({"exp": expire, "jti": to_encode.get("jti") or secrets.token_urlsafe(16)})
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         return encoded_jwt
     
     @staticmethod
     def verify_token(token: str) -> dict:
-        """Verificar y decodificar token JWT"""
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            return payload
-        except JWTError as e:
-            logger.warning(f"Token verification failed: {e}")
+        """
+        Verificar y decodificar token JWT (los tokens repetidos salen de la caché
+        de verificados) y rechazar los revocados
+        """
+        from app.core import token_cache
+        from app.core.token_revocation import token_revocation
+        
+        payload = None
+        if settings.TOKEN_CACHE_ENABLED:
+            digest = token_cache.token_digest(token)
+            payload = token_cache.get_claims(digest)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            except JWTError as e:
+                logger.warning(f"Token verification failed: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token inválido",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            if settings.TOKEN_CACHE_ENABLED:
+                token_cache.put_claims(digest, payload)
+        
+        # La revocación se comprueba en cada llamada, también con claims en caché
+        if token_revocation.is_revoked(payload.get("jti")):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido",
+                detail="Token revocado",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        return payload
     
     @staticmethod
     def generate_salt(length: int = 32) -> str:
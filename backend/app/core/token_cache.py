@@ -0,0 +1,65 @@
+"""
+Caché de tokens JWT ya verificados: digest del token -> claims decodificados.
+
+El frontend envía ráfagas de peticiones con el mismo token y cada una volvía a
+parsearlo y a verificar su firma HMAC. Con TOKEN_CACHE_ENABLED los claims de un
+token válido se guardan por el SHA-256 del token (el token en sí no queda en
+memoria), en una caché LRU de TOKEN_CACHE_SIZE entradas. Cada entrada vence
+en el exp del token o a los TOKEN_CACHE_TTL segundos, lo que ocurra antes: un
+token vencido nunca se acepta desde la caché. La revocación
+(app.core.token_revocation) se comprueba en cada petición, también en los
+aciertos; discard_token descarta la entrada de un token revocado.
+"""
+
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+# Métricas de Prometheus
+token_cache_requests_counter = Counter(
+    'token_cache_requests_total', 'Consultas a la caché de tokens JWT verificados', ['result']
+)
+_hit_counter = token_cache_requests_counter.labels(result="hit")
+_miss_counter = token_cache_requests_counter.labels(result="miss")
+
+# Caché de proceso digest del token -> (exp, claims)
+token_cache = TTLCache(max_size=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def token_digest(token: str) -> bytes:
+    """Clave de caché de un token"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+def get_claims(digest: bytes) -> Optional[Dict[str, Any]]:
+    """Claims en caché de un token aún vigente (copia), o None"""
+    entry = token_cache.get(digest)
+    if entry is not None:
+        exp, claims = entry
+        if exp is None or exp > time.time():
+            _hit_counter.inc()
+            return dict(claims)
+        token_cache.invalidate(digest)
+    _miss_counter.inc()
+    return None
+
+
+def put_claims(digest: bytes, claims: Dict[str, Any]) -> None:
+    """Guardar los claims de un token recién verificado, sin superar su exp"""
+    exp = claims.get("exp")
+    ttl = settings.TOKEN_CACHE_TTL
+    if exp is not None:
+        ttl = min(ttl, float(exp) - time.time())
+        if ttl <= 0:
+            return
+    token_cache.set(digest, (exp, dict(claims)), ttl=ttl)
+
+
+def discard_token(token: str) -> None:
+    """Descartar los claims en caché de un token (al revocarlo)"""
+    token_cache.invalidate(token_digest(token))
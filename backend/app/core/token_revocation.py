@@ -0,0 +1,400 @@
+"""
+Revocación de tokens JWT en el servidor (logout).
+
+Cada token lleva un claim jti. Al revocarlo, el jti se guarda con su exp en el
+almacén de TOKEN_REVOCATION_BACKEND:
+
+- memory: diccionario del proceso (un solo worker, pruebas)
+- sql: tabla revoked_tokens de la base de la aplicación
+- redis: claves con expiración en Redis (TOKEN_REVOCATION_REDIS_URL)
+- redis-fake: el mismo código sobre FakeRedis, sin servidor
+
+Consultar el almacén en cada petición costaría un viaje más por request, así
+que delante hay un filtro de Bloom por proceso con los jti vigentes: el caso
+común (token no revocado) es un negativo del filtro y no sale del proceso; solo
+los positivos (revocados o falsos positivos, ~TOKEN_REVOCATION_FILTER_FP_RATE)
+se confirman en el almacén. Las revocaciones de otros workers llegan por el
+pub/sub de TOKEN_REVOCATION_PUBSUB_BACKEND, y el compactador periódico elimina
+del almacén las entradas vencidas y reconstruye el filtro desde cero.
+
+Con más de un worker (WEB_CONCURRENCY > 1) un almacén del proceso (memory o
+redis-fake) dejaría la revocación invisible para los demás, por lo que el
+arranque se rechaza; con un pub/sub del proceso solo se advierte, ya que las
+revocaciones ajenas llegan igualmente al filtro en la siguiente compactación.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from prometheus_client import Counter, Gauge
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.revoked_token import RevokedToken
+from app.utils.bloom import BloomFilter
+from app.utils.fake_redis import FakeRedis
+from app.utils.pubsub import PubSubBackend, create_pubsub
+
+logger = logging.getLogger(__name__)
+
+# Métricas de Prometheus
+token_revocation_checks_counter = Counter(
+    'token_revocation_checks_total', 'Verificaciones de revocación de tokens', ['result']
+)
+token_revocations_counter = Counter(
+    'token_revocations_total', 'Tokens revocados en este proceso'
+)
+token_revocation_compacted_counter = Counter(
+    'token_revocation_compacted_total', 'Revocaciones vencidas eliminadas por la compactación'
+)
+token_revocation_filter_entries_gauge = Gauge(
+    'token_revocation_filter_entries', 'jti en el filtro de revocación del proceso'
+)
+# El negativo del filtro está en el camino de cada petición: la etiqueta se resuelve una vez
+_filter_negative_counter = token_revocation_checks_counter.labels(result="filter_negative")
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class RevocationStore:
+    """Almacén de jti revocados con su exp (segundos epoch)"""
+
+    def add(self, jti: str, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def contains(self, jti: str) -> bool:
+        """Indica si el jti está revocado y su token aún no vence"""
+        raise NotImplementedError
+
+    def active(self) -> Iterable[str]:
+        """jti revocados cuyo token aún no vence"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Eliminar las entradas vencidas; devuelve cuántas se eliminaron"""
+        raise NotImplementedError
+
+
+class MemoryRevocationStore(RevocationStore):
+    """Revocaciones en un diccionario del proceso"""
+
+    def __init__(self):
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[jti] = expires_at
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def active(self) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [jti for jti, expires_at in self._entries.items() if expires_at > now]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, expires_at in self._entries.items() if expires_at <= now]
+            for jti in expired:
+                del self._entries[jti]
+        return len(expired)
+
+
+class SqlRevocationStore(RevocationStore):
+    """Revocaciones en la tabla revoked_tokens"""
+
+    def __init__(self, session_factory: Callable = SessionLocal):
+        self.session_factory = session_factory
+
+    def add(self, jti: str, expires_at: float) -> None:
+        db = self.session_factory()
+        try:
+            db.merge(RevokedToken(jti=jti, expires_at=_utc(expires_at)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def contains(self, jti: str) -> bool:
+        db = self.session_factory()
+        try:
+            return db.query(RevokedToken.jti).filter(
+                RevokedToken.jti == jti, RevokedToken.expires_at > _utc(time.time())
+            ).first() is not None
+        finally:
+            db.close()
+
+    def active(self) -> List[str]:
+        db = self.session_factory()
+        try:
+            rows = db.query(RevokedToken.jti).filter(RevokedToken.expires_at > _utc(time.time()))
+            return [jti for jti, in rows.yield_per(10000)]
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        db = self.session_factory()
+        try:
+            removed = db.query(RevokedToken).filter(
+                RevokedToken.expires_at <= _utc(time.time())
+            ).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class RedisRevocationStore(RevocationStore):
+    """Revocaciones como claves de Redis que vencen con el token (EXPIREAT)"""
+
+    PREFIX = "revoked-token:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self.client.set(self.PREFIX + jti, 1, exat=int(expires_at) + 1)
+
+    def contains(self, jti: str) -> bool:
+        return bool(self.client.exists(self.PREFIX + jti))
+
+    def active(self) -> Iterable[str]:
+        for key in self.client.scan_iter(match=self.PREFIX + "*", count=1000):
+            key = key.decode() if isinstance(key, bytes) else key
+            yield key[len(self.PREFIX):]
+
+    def purge_expired(self) -> int:
+        # Redis elimina las claves vencidas por sí mismo
+        return 0
+
+
+def create_revocation_store(backend: str, url: Optional[str] = None) -> RevocationStore:
+    """Crear el almacén configurado (memory, sql, redis o redis-fake)"""
+    if backend == "memory":
+        return MemoryRevocationStore()
+    if backend == "sql":
+        return SqlRevocationStore()
+    if backend == "redis":
+        import redis
+
+        return RedisRevocationStore(redis.Redis.from_url(url))
+    if backend == "redis-fake":
+        return RedisRevocationStore(FakeRedis())
+    raise ValueError(f"Almacén de revocación no soportado: {backend}")
+
+
+class TokenRevocation:
+    """
+    Almacén de revocaciones con un filtro de Bloom por proceso delante.
+
+    Hasta que start() carga el filtro desde el almacén, las verificaciones van
+    directo al almacén. Sin start() (scripts, pruebas) el filtro solo contiene
+    las revocaciones de este proceso y de los avisos de pub/sub.
+    """
+
+    def __init__(self, store: RevocationStore, capacity: int, false_positive_rate: float, channel: str):
+        self.store = store
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.channel = channel
+        self._filter = BloomFilter(capacity, false_positive_rate)
+        self._filter_ready = True
+        # jti agregados mientras se reconstruye el filtro (no deben perderse en el cambio)
+        self._pending: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        self._pubsub: Optional[PubSubBackend] = None
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Revocar un jti hasta expires_at (segundos epoch) en todos los workers"""
+        if expires_at <= time.time():
+            return
+        self.store.add(jti, expires_at)
+        self._add_to_filter(jti)
+        token_revocations_counter.inc()
+        if self._pubsub is not None:
+            self._pubsub.publish(self.channel, jti)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Indica si el token del jti fue revocado (tokens sin jti no son revocables)"""
+        if not jti:
+            return False
+        if self._filter_ready and jti not in self._filter:
+            _filter_negative_counter.inc()
+            return False
+        try:
+            revoked = self.store.contains(jti)
+        except Exception as e:
+            # Positivo del filtro sin poder confirmarlo: se rechaza el token
+            logger.error(f"Error consultando revocación de token: {str(e)}")
+            revoked = True
+        token_revocation_checks_counter.labels(result="revoked" if revoked else "false_positive").inc()
+        return revoked
+
+    def rebuild_filter(self) -> int:
+        """Reconstruir el filtro con los jti vigentes del almacén; devuelve cuántos tiene"""
+        with self._lock:
+            self._pending = []
+        try:
+            active = list(self.store.active())
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        bloom = BloomFilter(max(self.capacity, 2 * len(active)), self.false_positive_rate)
+        bloom.update(active)
+        with self._lock:
+            bloom.update(self._pending)
+            self._pending = None
+            self._filter = bloom
+            self._filter_ready = True
+        token_revocation_filter_entries_gauge.set(len(bloom))
+        return len(bloom)
+
+    def compact(self) -> int:
+        """Eliminar revocaciones vencidas y reconstruir el filtro; devuelve cuántas se eliminaron"""
+        removed = self.store.purge_expired()
+        token_revocation_compacted_counter.inc(removed)
+        self.rebuild_filter()
+        return removed
+
+    def start(self, pubsub: PubSubBackend) -> None:
+        """Suscribirse a las revocaciones de otros workers; el filtro queda pendiente de carga"""
+        self._filter_ready = False
+        self._pubsub = pubsub
+        pubsub.subscribe(self.channel, self._add_to_filter)
+
+    def stop(self) -> None:
+        """Cerrar el backend de pub/sub"""
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _add_to_filter(self, jti: str) -> None:
+        with self._lock:
+            self._filter.add(jti)
+            if self._pending is not None:
+                self._pending.append(jti)
+        token_revocation_filter_entries_gauge.set(len(self._filter))
+
+
+class RevocationCompactor:
+    """Hilo que compacta periódicamente las revocaciones y reconstruye el filtro"""
+
+    def __init__(self, revocation: TokenRevocation, interval_seconds: int = None):
+        self.revocation = revocation
+        self.interval_seconds = interval_seconds or settings.TOKEN_REVOCATION_COMPACT_INTERVAL
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Ejecutar una compactación"""
+        return self.revocation.compact()
+
+    def start(self) -> None:
+        """Iniciar la compactación periódica en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="token-revocation-compactor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener la compactación periódica"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error compactando revocaciones de tokens: {str(e)}")
+            if self._stop_event.wait(self.interval_seconds):
+                break
+
+
+# Revocaciones del proceso (almacén configurado + filtro)
+token_revocation = TokenRevocation(
+    create_revocation_store(settings.TOKEN_REVOCATION_BACKEND, settings.TOKEN_REVOCATION_REDIS_URL),
+    capacity=settings.TOKEN_REVOCATION_FILTER_CAPACITY,
+    false_positive_rate=settings.TOKEN_REVOCATION_FILTER_FP_RATE,
+    channel=settings.TOKEN_REVOCATION_PUBSUB_CHANNEL,
+)
+revocation_compactor = RevocationCompactor(token_revocation)
+
+
+async def revoke_token(token: str) -> bool:
+    """
+    Revocar un token válido (logout). Devuelve False si el token no tiene jti
+    (emitido antes de la revocación; vence por su exp).
+    """
+    from app.core import token_cache
+    from app.core.security_utils import SecurityUtils
+
+    payload = SecurityUtils.verify_token(token)
+    if not payload.get("jti") or payload.get("exp") is None:
+        return False
+    # El almacén sql o redis hace E/S bloqueante
+    await run_in_threadpool(token_revocation.revoke, payload["jti"], float(payload["exp"]))
+    token_cache.discard_token(token)
+    return True
+
+
+# Backends que no comparten estado entre procesos
+PROCESS_LOCAL_BACKENDS = ("memory", "redis-fake")
+
+
+def check_revocation_backends(workers: int) -> None:
+    """
+    Validar los backends de revocación para el número de workers.
+
+    Lanza RuntimeError si el almacén es del proceso y hay varios workers: un
+    logout en un worker no revocaría el token en los otros.
+    """
+    if workers <= 1:
+        return
+    if settings.TOKEN_REVOCATION_BACKEND in PROCESS_LOCAL_BACKENDS:
+        raise RuntimeError(
+            f"TOKEN_REVOCATION_BACKEND={settings.TOKEN_REVOCATION_BACKEND} no se comparte entre "
+            f"los {workers} workers (WEB_CONCURRENCY); use sql o redis"
+        )
+    if settings.TOKEN_REVOCATION_PUBSUB_BACKEND in PROCESS_LOCAL_BACKENDS:
+        logger.warning(
+            f"TOKEN_REVOCATION_PUBSUB_BACKEND={settings.TOKEN_REVOCATION_PUBSUB_BACKEND} con {workers} "
+            f"workers: las revocaciones de otros workers llegan al filtro hasta "
+            f"{settings.TOKEN_REVOCATION_COMPACT_INTERVAL}s después (compactación); use redis"
+        )
+
+
+def start_token_revocation() -> None:
+    """Conectar el filtro al pub/sub configurado e iniciar la compactación (que lo carga)"""
+    check_revocation_backends(settings.WEB_CONCURRENCY)
+    token_revocation.start(create_pubsub(
+        settings.TOKEN_REVOCATION_PUBSUB_BACKEND, settings.TOKEN_REVOCATION_PUBSUB_URL
+    ))
+    revocation_compactor.start()
+
+
+def stop_token_revocation() -> None:
+    """Detener la compactación y desconectar el pub/sub"""
+    revocation_compactor.stop()
+    token_revocation.stop()
@@ -0,0 +1,107 @@
+"""
+Contexto de auditoría por petición.
+
+Durante una petición HTTP, AuditRepository.create_log no escribe los eventos
+no durables: los agrega al contexto activo. Al terminar la respuesta,
+AuditContextMiddleware consolida los hechos recogidos por servicios y rutas
+(acciones, recursos, conteos, motivos de error) en un único registro, lo que
+evita el doble registro servicio + ruta y su commit adicional. Las acciones
+durables (AUDIT_DURABLE_ACTIONS) no pasan por el contexto: se escriben y
+confirman en línea al registrarse, antes de que empiece la respuesta.
+
+Reglas de consolidación:
+- acción: la primera acción *_FAILED si la hay; si no, la primera registrada.
+- user_id, resource_id, ip_address y user_agent: el primer valor no nulo.
+- details: detalles distintos en orden, unidos con " | ", más las acciones e
+  ids de recurso adicionales y los motivos de error no mencionados.
+"""
+
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter
+
+# Métricas de Prometheus
+audit_facts_merged_counter = Counter(
+    'audit_facts_merged_total', 'Eventos de auditoría consolidados en el registro de su petición'
+)
+
+_current: ContextVar[Optional["AuditContext"]] = ContextVar("audit_context", default=None)
+
+
+class AuditContext:
+    """Hechos de auditoría recogidos durante una petición"""
+
+    def __init__(self, ip_address: Optional[str] = None, user_agent: Optional[str] = None):
+        self.ip_address = ip_address
+        self.user_agent = user_agent
+        self.events: List[Dict] = []
+        self.failures: List[str] = []
+
+    def record(self, event: Dict) -> None:
+        """Agregar un evento no durable (mismas claves que AuditLog)"""
+        self.events.append(event)
+
+    def fail(self, reason: str) -> None:
+        """Registrar el motivo de un error de la petición"""
+        if reason and reason not in self.failures:
+            self.failures.append(reason)
+
+    def consolidate(self, status_code: Optional[int] = None) -> Optional[Dict]:
+        """
+        Evento único de la petición, o None si no se registró ningún hecho.
+
+        Retorna las claves de AuditRepository.create_log (sin timestamp: el
+        registro toma la hora de la respuesta).
+        """
+        if not self.events:
+            return None
+
+        actions = list(dict.fromkeys(event["action"] for event in self.events))
+        failed = [action for action in actions if action.endswith("_FAILED")]
+        action = failed[0] if failed else actions[0]
+        primary = next(event for event in self.events if event["action"] == action)
+
+        def first(field: str, default=None):
+            return next((event[field] for event in self.events if event.get(field) is not None), default)
+
+        resource_ids = list(dict.fromkeys(
+            event["resource_id"] for event in self.events if event.get("resource_id") is not None
+        ))
+        parts = list(dict.fromkeys(event["details"] for event in self.events if event.get("details")))
+        if len(actions) > 1:
+            parts.append(f"acciones: {', '.join(actions)}")
+        if len(resource_ids) > 1:
+            parts.append(f"recursos: {', '.join(str(resource_id) for resource_id in resource_ids)}")
+        for reason in self.failures:
+            if not any(reason in part for part in parts):
+                parts.append(f"error {status_code}: {reason}" if status_code else f"error: {reason}")
+        if status_code and status_code >= 400 and not self.failures:
+            parts.append(f"estado HTTP {status_code}")
+
+        audit_facts_merged_counter.inc(len(self.events) - 1)
+        return {
+            "user_id": first("user_id"),
+            "action": action,
+            "resource": primary["resource"],
+            "resource_id": primary.get("resource_id") if primary.get("resource_id") is not None
+            else (resource_ids[0] if resource_ids else None),
+            "ip_address": first("ip_address", self.ip_address),
+            "user_agent": first("user_agent", self.user_agent),
+            "details": " | ".join(parts) or None,
+        }
+
+
+def current_audit_context() -> Optional[AuditContext]:
+    """Contexto de auditoría de la petición en curso, si lo hay"""
+    return _current.get()
+
+
+def activate_audit_context(context: AuditContext):
+    """Activar un contexto; retorna el token para deactivate_audit_context"""
+    return _current.set(context)
+
+
+def deactivate_audit_context(token) -> None:
+    """Restaurar el contexto previo a activate_audit_context"""
+    _current.reset(token)
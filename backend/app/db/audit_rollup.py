@@ -0,0 +1,276 @@
+"""
+Agregados horarios de auditoría (tabla audit_stats_hourly).
+
+Una tarea periódica recalcula cada hora cerrada de audit_logs en filas
+(hora, acción, recurso, usuario, IP, conteo) y avanza un punto de control en
+job_checkpoints. El recálculo de una hora es idempotente (DELETE + INSERT ...
+SELECT de esa hora), por lo que en cada pasada se repiten las últimas
+AUDIT_ROLLUP_REROLL_HOURS horas para incluir eventos que llegaron tarde desde
+la cola de escritura diferida.
+
+Las estadísticas suman en la base (GROUP BY por dimensión) los agregados hasta
+el punto de control y agregan en línea solo los logs posteriores, con el mismo
+corte horario UTC, de modo que son exactas aunque la tarea esté atrasada o
+deshabilitada.
+
+Uso como script (p. ej. para la carga inicial):
+    python -m app.db.audit_rollup compact
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.checkpoints import acquire_job_lock, get_checkpoint, set_checkpoint
+from app.db.database import SessionLocal
+from app.models.audit_log import AuditLog
+from app.models.audit_stats import AuditStatsHourly
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "audit_stats_hourly"
+# Clave del advisory lock de PostgreSQL que evita compactaciones concurrentes entre workers
+ADVISORY_LOCK_KEY = 42_000_001
+
+# Métricas de Prometheus
+audit_rollup_duration_histogram = Histogram(
+    'audit_rollup_duration_seconds', 'Duración de cada compactación de agregados de auditoría'
+)
+audit_rollup_lag_gauge = Gauge(
+    'audit_rollup_lag_seconds', 'Segundos entre el último punto compactado y el momento actual'
+)
+
+# Columnas de audit_stats_hourly (y de audit_logs) con desglose en las estadísticas
+STATS_DIMENSIONS = ("action", "resource", "user_id", "ip_address")
+
+
+def hour_start(value: datetime) -> datetime:
+    """Inicio de la hora (UTC) que contiene la fecha dada"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def get_rolled_until(session: Session) -> Optional[datetime]:
+    """Fin (exclusivo) del rango ya compactado en audit_stats_hourly"""
+    position = get_checkpoint(session, CHECKPOINT_NAME)
+    return datetime.fromisoformat(position) if position else None
+
+
+def rollup_hour(session: Session, bucket: datetime) -> None:
+    """Recalcular los agregados de la hora que comienza en bucket"""
+    end = bucket + timedelta(hours=1)
+    session.execute(delete(AuditStatsHourly).where(AuditStatsHourly.bucket == bucket))
+    counts = select(
+        literal(bucket, DateTime(timezone=True)),
+        AuditLog.action,
+        AuditLog.resource,
+        AuditLog.user_id,
+        AuditLog.ip_address,
+        func.count(),
+    ).where(
+        AuditLog.timestamp >= bucket, AuditLog.timestamp < end
+    ).group_by(
+        AuditLog.action, AuditLog.resource, AuditLog.user_id, AuditLog.ip_address
+    )
+    session.execute(insert(AuditStatsHourly).from_select(
+        ['bucket', 'action', 'resource', 'user_id', 'ip_address', 'count'], counts
+    ))
+
+
+def _acquire_lock(session: Session, wait: bool = False) -> bool:
+    """Advisory lock de la compactación (evita pasadas concurrentes entre workers)"""
+    return acquire_job_lock(session, ADVISORY_LOCK_KEY, wait=wait)
+
+
+def rewind_checkpoint(session: Session, since: datetime) -> None:
+    """
+    Retroceder el punto de control hasta la hora de since.
+
+    Se usa al cargar eventos con timestamps de horas ya compactadas (p. ej. la
+    ingesta masiva): las estadísticas los agregan en línea hasta que la
+    compactación vuelve a recalcular esas horas. Espera a que termine una
+    compactación en curso. El llamador confirma.
+    """
+    bucket = hour_start(since)
+    rolled_until = get_rolled_until(session)
+    if rolled_until is None or bucket >= rolled_until:
+        return
+    _acquire_lock(session, wait=True)
+    # Releer tras el lock: una compactación concurrente pudo avanzarlo
+    rolled_until = get_rolled_until(session)
+    if rolled_until is not None and bucket < rolled_until:
+        set_checkpoint(session, CHECKPOINT_NAME, bucket.isoformat())
+
+
+def compact_rollups(session: Session, now: Optional[datetime] = None,
+                    max_hours: Optional[int] = None) -> int:
+    """
+    Compactar las horas cerradas pendientes y avanzar el punto de control.
+
+    Procesa como máximo max_hours horas (AUDIT_ROLLUP_MAX_HOURS_PER_RUN por
+    defecto) en una sola transacción, que confirma el llamador. Retorna el
+    número de horas recalculadas.
+    """
+    if max_hours is None:
+        max_hours = settings.AUDIT_ROLLUP_MAX_HOURS_PER_RUN
+    now = now or datetime.now(timezone.utc)
+    # Solo horas cerradas hace al menos AUDIT_ROLLUP_LAG segundos
+    end = hour_start(now - timedelta(seconds=settings.AUDIT_ROLLUP_LAG))
+
+    if not _acquire_lock(session):
+        return 0
+
+    rolled_until = get_rolled_until(session)
+    if rolled_until is None:
+        oldest = session.query(func.min(AuditLog.timestamp)).scalar()
+        start = hour_start(oldest) if oldest else end
+    else:
+        start = rolled_until - timedelta(hours=settings.AUDIT_ROLLUP_REROLL_HOURS)
+    end = min(end, start + timedelta(hours=max_hours))
+
+    hours = 0
+    current = start
+    while current < end:
+        rollup_hour(session, current)
+        current += timedelta(hours=1)
+        hours += 1
+
+    # El punto de control nunca retrocede (las horas repetidas ya estaban compactadas)
+    position = max(end, rolled_until) if rolled_until else end
+    set_checkpoint(session, CHECKPOINT_NAME, position.isoformat())
+    audit_rollup_lag_gauge.set(max((now - position).total_seconds(), 0))
+    return hours
+
+
+def utc_hour(session: Session, column):
+    """
+    Inicio de la hora UTC de column, con el mismo corte que los buckets de
+    audit_stats_hourly (independiente de la zona horaria de la sesión)
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc('hour', func.timezone('UTC', column))
+    return func.strftime('%Y-%m-%d %H:00:00', column)
+
+
+def _as_hour(value) -> datetime:
+    """Bucket horario leído de la base (datetime con o sin zona, o texto en SQLite) en UTC"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return hour_start(value)
+
+
+def stats_counts(session: Session, start: datetime) -> Dict[str, Counter]:
+    """
+    Conteos por dimensión (STATS_DIMENSIONS y "hour") desde start hasta ahora.
+
+    Cada desglose es un SUM(count) ... GROUP BY sobre audit_stats_hourly hasta
+    el punto de control más un COUNT ... GROUP BY de los logs posteriores,
+    agrupados por hora UTC como los agregados. Las claves de "hour" son el
+    inicio de cada hora (UTC).
+    """
+    rolled_until = get_rolled_until(session)
+    counts: Dict[str, Counter] = {dimension: Counter() for dimension in (*STATS_DIMENSIONS, "hour")}
+
+    tail_start = start
+    if rolled_until and rolled_until > start:
+        in_range = (AuditStatsHourly.bucket >= start, AuditStatsHourly.bucket < rolled_until)
+        total = func.sum(AuditStatsHourly.count)
+        for dimension in STATS_DIMENSIONS:
+            column = getattr(AuditStatsHourly, dimension)
+            for key, count in session.query(column, total).filter(*in_range).group_by(column):
+                counts[dimension][key] += int(count)
+        for bucket, count in session.query(AuditStatsHourly.bucket, total).filter(
+            *in_range
+        ).group_by(AuditStatsHourly.bucket):
+            counts["hour"][_as_hour(bucket)] += int(count)
+        tail_start = rolled_until
+
+    in_tail = AuditLog.timestamp >= tail_start
+    for dimension in STATS_DIMENSIONS:
+        column = getattr(AuditLog, dimension)
+        for key, count in session.query(column, func.count(AuditLog.id)).filter(in_tail).group_by(column):
+            counts[dimension][key] += count
+    hour = utc_hour(session, AuditLog.timestamp)
+    for bucket, count in session.query(hour, func.count(AuditLog.id)).filter(in_tail).group_by(hour):
+        counts["hour"][_as_hour(bucket)] += count
+
+    return counts
+
+
+class RollupCompactor:
+    """Hilo que compacta periódicamente los agregados horarios de auditoría"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, interval_seconds: int = None):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds or settings.AUDIT_ROLLUP_INTERVAL
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Ejecutar una compactación y confirmarla"""
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            hours = compact_rollups(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        audit_rollup_duration_histogram.observe(time.perf_counter() - started)
+        return hours
+
+    def start(self) -> None:
+        """Iniciar la compactación periódica en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="audit-rollup", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener la compactación periódica"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error compactando agregados de auditoría: {str(e)}")
+            if self._stop_event.wait(self.interval_seconds):
+                break
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Agregados horarios de audit_logs")
+    parser.add_argument("command", choices=["compact"])
+    parser.parse_args()
+
+    compactor = RollupCompactor()
+    total_hours = 0
+    while True:
+        processed = compactor.run_once()
+        total_hours += processed
+        # Cada pasada repite AUDIT_ROLLUP_REROLL_HOURS; se termina al no avanzar más
+        if processed <= settings.AUDIT_ROLLUP_REROLL_HOURS:
+            break
+    print(f"✅ {total_hours} horas compactadas")
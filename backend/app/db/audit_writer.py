@@ -0,0 +1,217 @@
+"""
+Escritor diferido (write-behind) de logs de auditoría.
+
+Los llamadores encolan eventos y un hilo en segundo plano los inserta en lotes
+multi-fila, ya sea al alcanzar AUDIT_BATCH_SIZE o al cumplirse AUDIT_FLUSH_INTERVAL.
+La cola es acotada y encolar nunca espera: si está llena, el llamador escribe de
+forma síncrona (desborde), de modo que la memoria queda acotada. Un lote que no
+puede escribirse tras MAX_FLUSH_RETRIES intentos se descarta, se cuenta en
+audit_events_failed_total y sus eventos quedan en el log de errores.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.audit_log import AuditLog
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Métricas de Prometheus (se exponen en /metrics junto a las del Instrumentator)
+audit_queue_depth_gauge = Gauge(
+    'audit_queue_depth', 'Eventos de auditoría pendientes de escritura'
+)
+audit_flush_duration_histogram = Histogram(
+    'audit_flush_duration_seconds', 'Duración de cada escritura por lotes de auditoría',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+audit_flush_batch_size_histogram = Histogram(
+    'audit_flush_batch_size', 'Eventos de auditoría escritos por lote',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+audit_events_written_counter = Counter(
+    'audit_events_written_total', 'Eventos de auditoría escritos', ['mode']
+)
+audit_events_failed_counter = Counter(
+    'audit_events_failed_total', 'Eventos de auditoría descartados tras agotar los reintentos'
+)
+audit_queue_overflow_counter = Counter(
+    'audit_queue_overflow_total', 'Eventos escritos en línea por cola de auditoría llena'
+)
+
+
+def is_durable_action(action: str) -> bool:
+    """
+    Indica si una acción debe escribirse de forma síncrona.
+
+    Coincide por prefijo: con "LOGIN" configurado, LOGIN_SUCCESS y LOGIN_FAILED
+    también son durables.
+    """
+    if not action:
+        return False
+    action = action.upper()
+    for durable in settings.audit_durable_actions_list:
+        if action == durable or action.startswith(f"{durable}_"):
+            return True
+    return False
+
+
+class AuditWriter:
+    """Cola acotada de eventos de auditoría con vaciado por lotes en segundo plano"""
+
+    MAX_FLUSH_RETRIES = 3
+
+    def __init__(self, session_factory: Callable = SessionLocal,
+                 max_queue_size: int = None, batch_size: int = None,
+                 flush_interval: float = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.AUDIT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_FLUSH_INTERVAL
+        self._queue: "queue.Queue[Dict]" = queue.Queue(
+            maxsize=max_queue_size or settings.AUDIT_QUEUE_MAX_SIZE
+        )
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    @property
+    def is_running(self) -> bool:
+        """Indica si el hilo de escritura está activo"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        """Eventos pendientes en la cola"""
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """Iniciar el hilo de escritura"""
+        with self._lock:
+            if self.is_running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-writer", daemon=True
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+            logger.info("Escritor diferido de auditoría iniciado")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Detener el hilo y escribir todos los eventos pendientes"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stop_event.set()
+            thread.join(timeout)
+            self._thread = None
+        # Lo que quede (p. ej. encolado durante el apagado) se escribe aquí mismo
+        self._drain()
+        logger.info("Escritor diferido de auditoría detenido")
+
+    def enqueue(self, event: Dict) -> bool:
+        """
+        Encolar un evento sin esperar. Retorna False si el escritor no está
+        activo o la cola está llena; en ese caso el llamador debe escribir en línea.
+        """
+        if not self.is_running:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            audit_queue_overflow_counter.inc()
+            return False
+        audit_queue_depth_gauge.set(self._queue.qsize())
+        return True
+
+    def write_batch(self, session, events: List[Dict]) -> None:
+        """Insertar eventos con un único INSERT multi-fila en la sesión dada"""
+        if not events:
+            return
+        session.execute(insert(AuditLog), events)
+
+    def _run(self) -> None:
+        """Bucle principal: acumula eventos hasta completar un lote o vencer el intervalo"""
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+        self._drain()
+
+    def _collect_batch(self) -> List[Dict]:
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self) -> None:
+        """Escribir de inmediato todo lo que quede en la cola"""
+        while True:
+            batch: List[Dict] = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._flush(batch)
+
+    def _flush(self, batch: List[Dict]) -> None:
+        for attempt in range(1, self.MAX_FLUSH_RETRIES + 1):
+            started = time.perf_counter()
+            db = self.session_factory()
+            try:
+                self.write_batch(db, batch)
+                db.commit()
+                audit_flush_duration_histogram.observe(time.perf_counter() - started)
+                audit_flush_batch_size_histogram.observe(len(batch))
+                audit_events_written_counter.labels(mode="batch").inc(len(batch))
+                break
+            except Exception as e:
+                db.rollback()
+                logger.error(
+                    f"Error escribiendo lote de auditoría ({len(batch)} eventos, "
+                    f"intento {attempt}/{self.MAX_FLUSH_RETRIES}): {str(e)}"
+                )
+                if attempt == self.MAX_FLUSH_RETRIES:
+                    self._discard(batch)
+                else:
+                    time.sleep(0.1 * attempt)
+            finally:
+                db.close()
+        audit_queue_depth_gauge.set(self._queue.qsize())
+
+    def _discard(self, batch: List[Dict]) -> None:
+        """Contar y dejar en el log de errores los eventos de un lote que no pudo escribirse"""
+        audit_events_failed_counter.inc(len(batch))
+        logger.error(
+            f"Lote de auditoría descartado tras {self.MAX_FLUSH_RETRIES} intentos: "
+            f"{len(batch)} eventos perdidos"
+        )
+        for event in batch:
+            logger.error(f"Evento de auditoría descartado: {event}")
+
+
+# Instancia global usada por AuditRepository (se inicia en el arranque de la aplicación)
+audit_writer = AuditWriter()
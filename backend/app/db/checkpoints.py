@@ -0,0 +1,43 @@
+"""
+Lectura y escritura de puntos de control de tareas (tabla job_checkpoints) y
+exclusión entre workers con advisory locks de PostgreSQL.
+"""
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.job_checkpoint import JobCheckpoint
+
+
+def get_checkpoint(session: Session, name: str) -> Optional[str]:
+    """Obtener la última posición registrada de una tarea"""
+    checkpoint = session.get(JobCheckpoint, name)
+    return checkpoint.position if checkpoint else None
+
+
+def set_checkpoint(session: Session, name: str, position: Optional[str]) -> None:
+    """Registrar la posición de una tarea (se confirma con la transacción del llamador)"""
+    checkpoint = session.get(JobCheckpoint, name)
+    if checkpoint is None:
+        session.add(JobCheckpoint(name=name, position=position))
+    else:
+        checkpoint.position = position
+    session.flush()
+
+
+def acquire_job_lock(session: Session, key: int, wait: bool = False) -> bool:
+    """
+    Advisory lock de transacción en PostgreSQL; en otros motores siempre True.
+
+    Con wait=False retorna False si otro worker tiene el lock.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return True
+    if wait:
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+        return True
+    return bool(session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}
+    ).scalar())
@@ -0,0 +1,124 @@
+"""
+Estrategias para calcular el total de los listados paginados.
+
+- exact: COUNT(*) de la consulta, guardado COUNT_CACHE_TTL segundos por
+  consulta y parámetros.
+- estimate: filas estimadas por el planificador (pg_class.reltuples) para
+  listados sin filtros; en otros motores o con filtros se usa exact.
+- lookahead: sin total; se comprueba si existe al menos una fila después de la
+  página y se reporta una cota inferior (skip + filas + 1 si hay más).
+
+Cada endpoint elige su estrategia por defecto y el cliente puede cambiarla con
+el parámetro count. PaginatedResponse indica si el total es exacto.
+"""
+
+from enum import Enum
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+
+class CountStrategy(str, Enum):
+    """Estrategia de conteo del total de un listado"""
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    LOOKAHEAD = "lookahead"
+
+
+class CountResult(NamedTuple):
+    """Total de un listado y cómo se obtuvo"""
+    total: int
+    exact: bool
+    strategy: str
+
+
+# Caché de conteos exactos por (SQL, parámetros)
+count_cache = TTLCache(max_size=1024, ttl=settings.COUNT_CACHE_TTL)
+
+
+def invalidate_counts() -> None:
+    """Descartar los conteos exactos en caché (p. ej. tras crear o eliminar filas)"""
+    count_cache.clear()
+
+
+def exact_count(query: Query) -> int:
+    """COUNT(*) de la consulta, con caché de corta duración"""
+    query = query.order_by(None)
+    compiled = query.statement.compile(dialect=query.session.get_bind().dialect)
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    total = count_cache.get(key)
+    if total is None:
+        total = query.count()
+        count_cache.set(key, total)
+    return total
+
+
+def estimated_row_count(session: Session, table: str) -> Optional[int]:
+    """
+    Filas estimadas de una tabla según las estadísticas de PostgreSQL.
+
+    En tablas particionadas suma las estimaciones de cada partición. Retorna
+    None si el motor no es PostgreSQL o la tabla nunca fue analizada.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    row = session.execute(text(
+        "SELECT reltuples, relkind FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {"table": table}).first()
+    if row is None:
+        return None
+    reltuples, relkind = row
+    if relkind == "p":
+        reltuples = session.execute(text(
+            "SELECT SUM(c.reltuples) FILTER (WHERE c.reltuples >= 0) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": table}).scalar()
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+def count_total(query: Query, strategy: CountStrategy = CountStrategy.EXACT, *,
+                skip: int = 0, returned: int = 0, limit: Optional[int] = None,
+                has_more: Optional[bool] = None, filtered: bool = True) -> CountResult:
+    """
+    Calcular el total de un listado según la estrategia.
+
+    query es la consulta filtrada sin paginar; skip/returned/limit describen la
+    página ya obtenida. Si el llamador ya leyó limit + 1 filas puede indicar
+    has_more y se evita la consulta de comprobación.
+    """
+    strategy = CountStrategy(strategy)
+    lower_bound = skip + returned
+
+    if strategy == CountStrategy.LOOKAHEAD:
+        if has_more is None:
+            has_more = (limit is None or returned >= limit) and \
+                query.offset(lower_bound).limit(1).first() is not None
+        return CountResult(lower_bound + int(has_more), not has_more, strategy.value)
+
+    if strategy == CountStrategy.ESTIMATE and not filtered:
+        table = query.column_descriptions[0]["entity"].__table__.name
+        estimate = estimated_row_count(query.session, table)
+        if estimate is not None:
+            return CountResult(max(estimate, lower_bound + int(bool(has_more))), False, strategy.value)
+
+    return CountResult(exact_count(query), True, CountStrategy.EXACT.value)
+
+
+async def count_total_async(db: AsyncSession, build_query: Callable[[Session], Query],
+                            strategy: CountStrategy = CountStrategy.EXACT, **kwargs) -> CountResult:
+    """
+    count_total sobre una sesión async.
+
+    build_query recibe la sesión síncrona subyacente y retorna la consulta
+    filtrada sin paginar; la consulta y el conteo corren con run_sync sobre la
+    conexión async, sin bloquear el event loop.
+    """
+    return await db.run_sync(lambda session: count_total(build_query(session), strategy, **kwargs))
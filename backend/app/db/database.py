@@ -1,10 +1,22 @@
 """
 Configuración de la base de datos SQLAlchemy.
+
+Las rutas HTTP usan el engine async (get_async_db, asyncpg en PostgreSQL y
+aiosqlite en SQLite) para no bloquear el event loop durante las consultas. Las
+tareas en segundo plano, los scripts y el escritor de auditoría siguen usando
+el engine síncrono (SessionLocal) desde sus propios hilos.
 """
 
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Optional
+
+from starlette.requests import Request
+
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
 # Crear engine de base de datos
@@ -18,12 +30,61 @@ engine = create_engine(
 # Crear sesión
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sesión async de las rutas. Sin expirar al confirmar: un atributo expirado se
+# recargaría con una consulta implícita, que no está permitida fuera de await.
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base para los modelos
 Base = declarative_base()
 
 # Metadata para migraciones
 metadata = MetaData()
 
+# Drivers async equivalentes a los drivers síncronos de DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_async_engine: Optional[AsyncEngine] = None
+
+
+def async_database_url(url: str) -> str:
+    """URL con el driver async equivalente (postgresql -> asyncpg, sqlite -> aiosqlite)"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.get_driver_name() in ("asyncpg", "aiosqlite"):
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Engine async de las rutas, creado en el primer uso para que los scripts y
+    tareas síncronas no requieran el driver async
+    """
+    global _async_engine
+    if _async_engine is None:
+        url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+        options = {"echo": settings.DATABASE_ECHO, "pool_pre_ping": True}
+        if make_url(url).get_backend_name() != "sqlite":
+            options.update(
+                pool_size=settings.ASYNC_DB_POOL_SIZE,
+                max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+                pool_recycle=300,
+            )
+        _async_engine = create_async_engine(url, **options)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    """Cerrar las conexiones del engine async (al apagar la aplicación)"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
 
 def get_db():
     """Dependencia para obtener sesión de base de datos"""
@@ -32,3 +93,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependencia para obtener sesión async de base de datos"""
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_session_scope(request: Request) -> Callable[[], ContextManager[Session]]:
+    """
+    Dependencia: fábrica de sesiones síncronas para trabajo que sigue después
+    del manejador (p. ej. una exportación en streaming). Cada sesión se abre
+    con get_db, o con su reemplazo en app.dependency_overrides, y se cierra al
+    salir del bloque with.
+    """
+    return contextmanager(request.app.dependency_overrides.get(get_db, get_db))
@@ -0,0 +1,303 @@
+"""
+Gestión de particiones mensuales de audit_logs (PostgreSQL).
+
+La tabla audit_logs se particiona por rango mensual sobre timestamp (ver la
+migración 0002_partition_audit_logs). Cada partición se llama audit_logs_pYYYYMM
+y cubre [YYYY-MM-01, mes siguiente); las filas fuera de rango caen en
+audit_logs_default. La retención elimina particiones completas (DETACH + DROP)
+en lugar de borrar filas, y los conteos de simulación salen de pg_class; en
+audit_logs_default, que no tiene rango, borra las filas anteriores al corte.
+
+PostgreSQL no deja crear la partición de un mes si audit_logs_default ya tiene
+filas de ese mes, así que al crearla se desacopla la partición DEFAULT, se
+mueven esas filas a la partición nueva y se vuelve a acoplar. La ingesta
+masiva crea las particiones de los meses que carga antes del COPY para que las
+filas no caigan en DEFAULT.
+
+Uso como script (p. ej. desde cron):
+    python -m app.db.partitions ensure
+    python -m app.db.partitions list
+    python -m app.db.partitions drop --days 90
+"""
+
+import logging
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_logs"
+DEFAULT_PARTITION = "audit_logs_default"
+PARTITION_NAME_RE = re.compile(r"^audit_logs_p(\d{4})(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    """Primer instante del mes de la fecha dada (UTC)"""
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Sumar meses a una fecha que ya está al inicio de mes"""
+    month_index = value.year * 12 + (value.month - 1) + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def partition_name(start: datetime) -> str:
+    """Nombre de la partición mensual que comienza en start"""
+    return f"{PARENT_TABLE}_p{start.year:04d}{start.month:02d}"
+
+
+def is_partitioned(bind) -> bool:
+    """Indica si audit_logs es una tabla particionada en esta base de datos"""
+    if bind.dialect.name != "postgresql":
+        return False
+    query = text(
+        "SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    )
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            return conn.execute(query, {"table": PARENT_TABLE}).first() is not None
+    return bind.execute(query, {"table": PARENT_TABLE}).first() is not None
+
+
+def list_audit_partitions(conn: Connection) -> List[Dict]:
+    """
+    Listar particiones mensuales con sus límites y filas estimadas.
+
+    Las filas provienen de pg_class.reltuples (estadísticas de ANALYZE/autovacuum),
+    por lo que no recorren la tabla. Un valor negativo (nunca analizada) se
+    reporta como 0.
+    """
+    rows = conn.execute(text(
+        "SELECT c.relname, c.reltuples "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table "
+        "ORDER BY c.relname"
+    ), {"table": PARENT_TABLE}).all()
+
+    partitions = []
+    for name, reltuples in rows:
+        match = PARTITION_NAME_RE.match(name)
+        if not match:
+            continue
+        start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        partitions.append({
+            "name": name,
+            "start": start,
+            "end": add_months(start, 1),
+            "estimated_rows": max(int(reltuples or 0), 0),
+        })
+    return partitions
+
+
+def _default_rows_exist(conn: Connection, start: datetime, end: datetime) -> bool:
+    """Indica si audit_logs_default tiene filas en [start, end)"""
+    return conn.execute(text(
+        f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end LIMIT 1'
+    ), {"start": start, "end": end}).first() is not None
+
+
+def default_partition_months(conn: Connection) -> List[datetime]:
+    """Meses (UTC) que tienen filas en audit_logs_default"""
+    rows = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"
+    )).scalars()
+    return sorted(month.replace(tzinfo=timezone.utc) for month in rows)
+
+
+def create_audit_partition(conn: Connection, start: datetime) -> str:
+    """
+    Crear la partición del mes que comienza en start.
+
+    Si audit_logs_default tiene filas de ese mes, la desacopla, crea la
+    partición, mueve esas filas y la vuelve a acoplar, todo en la transacción
+    de conn (las escrituras concurrentes esperan el bloqueo de audit_logs).
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    create = text(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    if not _default_rows_exist(conn, start, end):
+        conn.execute(create)
+        return name
+
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(create)
+    moved = conn.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE "timestamp" >= :start AND "timestamp" < :end RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ), {"start": start, "end": end}).rowcount
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.info(f"{moved} logs movidos de {DEFAULT_PARTITION} a {name}")
+    return name
+
+
+def ensure_partitions_for(conn: Connection, months: Iterable[datetime]) -> List[str]:
+    """
+    Crear las particiones que falten para los meses de las fechas dadas.
+
+    Retorna los nombres de las particiones creadas. Es idempotente.
+    """
+    existing = {p["name"] for p in list_audit_partitions(conn)}
+    created = []
+    for start in sorted({month_start(month) for month in months}):
+        if partition_name(start) not in existing:
+            created.append(create_audit_partition(conn, start))
+    if created:
+        logger.info(f"Particiones de auditoría creadas: {', '.join(created)}")
+    return created
+
+
+def ensure_audit_partitions(conn: Connection, months_ahead: Optional[int] = None,
+                            start: Optional[datetime] = None) -> List[str]:
+    """
+    Crear las particiones del mes actual (o desde start), de los próximos
+    meses y de los meses que tengan filas en audit_logs_default.
+
+    Retorna los nombres de las particiones creadas. Es idempotente.
+    """
+    if months_ahead is None:
+        months_ahead = settings.AUDIT_PARTITION_PREMAKE_MONTHS
+
+    current = month_start(start or datetime.now(timezone.utc))
+    last = add_months(month_start(datetime.now(timezone.utc)), months_ahead)
+    months = default_partition_months(conn)
+    while current <= last:
+        months.append(current)
+        current = add_months(current, 1)
+    return ensure_partitions_for(conn, months)
+
+
+def partitions_before(conn: Connection, cutoff: datetime) -> List[Dict]:
+    """Particiones cuyo rango completo es anterior a cutoff"""
+    if cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    return [p for p in list_audit_partitions(conn) if p["end"] <= cutoff]
+
+
+def count_default_before(conn: Connection, cutoff: datetime) -> int:
+    """Filas de audit_logs_default anteriores a cutoff"""
+    if cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    return conn.execute(text(
+        f'SELECT count(*) FROM {DEFAULT_PARTITION} WHERE "timestamp" < :cutoff'
+    ), {"cutoff": cutoff}).scalar()
+
+
+def delete_default_before(conn: Connection, cutoff: datetime) -> int:
+    """
+    Borrar las filas de audit_logs_default anteriores a cutoff.
+
+    La partición DEFAULT no tiene rango y no se puede eliminar completa; se
+    borran sus filas con el corte exacto. Retorna las filas borradas.
+    """
+    if cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    deleted = conn.execute(text(
+        f'DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" < :cutoff'
+    ), {"cutoff": cutoff}).rowcount
+    if deleted:
+        logger.info(f"{deleted} logs eliminados de {DEFAULT_PARTITION}")
+    return deleted
+
+
+def drop_audit_partitions_before(conn: Connection, cutoff: datetime) -> List[Dict]:
+    """
+    Desacoplar y eliminar las particiones completamente anteriores a cutoff.
+
+    Las filas del mes que contiene cutoff se conservan hasta que todo ese mes
+    quede fuera de la retención. Las de audit_logs_default se borran aparte
+    con delete_default_before.
+    """
+    dropped = []
+    for partition in partitions_before(conn, cutoff):
+        conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{partition["name"]}"'))
+        conn.execute(text(f'DROP TABLE "{partition["name"]}"'))
+        dropped.append(partition)
+        logger.info(f"Partición de auditoría eliminada: {partition['name']}")
+    return dropped
+
+
+class PartitionMaintenance:
+    """Hilo que crea periódicamente las particiones de los próximos meses"""
+
+    def __init__(self, engine: Engine, interval_seconds: int = 24 * 3600):
+        self.engine = engine
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> List[str]:
+        """Crear particiones pendientes si la tabla está particionada"""
+        if not is_partitioned(self.engine):
+            return []
+        with self.engine.begin() as conn:
+            return ensure_audit_partitions(conn)
+
+    def start(self) -> None:
+        """Iniciar el mantenimiento periódico en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="audit-partitions", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el mantenimiento periódico"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error creando particiones de auditoría: {str(e)}")
+            if self._stop_event.wait(self.interval_seconds):
+                break
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones de audit_logs")
+    parser.add_argument("command", choices=["ensure", "list", "drop"])
+    parser.add_argument("--days", type=int, default=90, help="Días de logs a mantener (drop)")
+    args = parser.parse_args()
+
+    if not is_partitioned(engine):
+        raise SystemExit("audit_logs no está particionada (ejecute 'alembic upgrade head')")
+
+    with engine.begin() as connection:
+        if args.command == "ensure":
+            names = ensure_audit_partitions(connection)
+            print(f"✅ {len(names)} particiones creadas")
+        elif args.command == "list":
+            for p in list_audit_partitions(connection):
+                print(f"{p['name']}: {p['start']:%Y-%m-%d} -> {p['end']:%Y-%m-%d} (~{p['estimated_rows']} filas)")
+        else:
+            limit = datetime.now(timezone.utc) - timedelta(days=args.days)
+            removed = drop_audit_partitions_before(connection, limit)
+            deleted = delete_default_before(connection, limit)
+            print(f"✅ {len(removed)} particiones eliminadas (~{sum(p['estimated_rows'] for p in removed)} filas), "
+                  f"{deleted} filas de {DEFAULT_PARTITION}")
@@ -0,0 +1,238 @@
+"""
+Recálculo en línea del índice ciego de RUT (persons.rut_hash).
+
+rut_hash es un HMAC-SHA256 con RUT_BLIND_INDEX_KEY sobre la forma canónica del
+RUT (SecurityService.hash_rut). Las filas escritas con otra normalización o con
+otra clave no se encuentran al buscar, por lo que esta tarea recorre persons
+por id en lotes de RUT_BLIND_INDEX_CHUNK_SIZE, descifra cada RUT, recalcula el
+índice y confirma cada lote junto con su punto de control en job_checkpoints.
+Se reanuda donde quedó y vuelve a empezar si cambia la clave del índice. Cada
+fila se actualiza solo si su rut_hash no cambió desde que se leyó, por lo que
+no pisa una actualización concurrente del RUT.
+
+Las filas en formato siv (rut_data AES-SIV, rut_hash NULL) no tienen índice
+ciego y se cuentan como current.
+
+Como rut_hash es único, una fila cuyo índice recalculado ya pertenece a otra
+persona (RUT duplicado) no se actualiza: se cuenta como duplicate y se registra
+para resolverla a mano.
+
+Uso como script:
+    python -m app.db.rut_blind_index run
+    python -m app.db.rut_blind_index status
+"""
+
+import binascii
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from cryptography.fernet import InvalidToken
+from prometheus_client import Counter, Gauge
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security_service import RUT_FORMAT_SIV, SecurityService
+from app.db.checkpoints import acquire_job_lock, get_checkpoint, set_checkpoint
+from app.db.database import SessionLocal
+from app.models.person import Person
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "rut_blind_index"
+# Clave del advisory lock de PostgreSQL que evita lotes concurrentes entre workers
+ADVISORY_LOCK_KEY = 42_000_003
+
+# Métricas de Prometheus
+rut_blind_index_rows_counter = Counter(
+    'rut_blind_index_rows_total', 'Personas procesadas por el recálculo del índice ciego de RUT', ['result']
+)
+rut_blind_index_progress_gauge = Gauge(
+    'rut_blind_index_progress_ratio', 'Fracción de personas recorridas por el recálculo del índice ciego (por id)'
+)
+
+_persons = Person.__table__
+_reindex_statement = update(_persons).where(
+    _persons.c.id == bindparam("_id"), _persons.c.rut_hash == bindparam("_old")
+).values(rut_hash=bindparam("_hash"))
+
+
+def _read_position(session: Session, fingerprint: str) -> int:
+    """Último id procesado con la clave actual del índice (0 si el recálculo es nuevo)"""
+    position = get_checkpoint(session, CHECKPOINT_NAME)
+    if position:
+        stored_fingerprint, _, last_id = position.partition(":")
+        if stored_fingerprint == fingerprint:
+            return int(last_id)
+    return 0
+
+
+def reindex_chunk(session: Session, chunk_size: Optional[int] = None) -> Optional[Dict]:
+    """
+    Recalcular el índice ciego del siguiente lote de personas y avanzar el
+    punto de control.
+
+    Retorna los conteos del lote (updated, current, duplicate, failed, last_id,
+    done) o None si otro worker está procesando. El llamador confirma.
+    """
+    chunk_size = chunk_size or settings.RUT_BLIND_INDEX_CHUNK_SIZE
+    fingerprint = SecurityService.rut_blind_index_fingerprint()
+    key_ring = SecurityService.key_ring()
+
+    if not acquire_job_lock(session, ADVISORY_LOCK_KEY):
+        return None
+
+    last_id = _read_position(session, fingerprint)
+    rows = session.query(Person.id, Person.rut, Person.rut_data, Person.rut_hash).filter(
+        Person.id > last_id
+    ).order_by(Person.id).limit(chunk_size).all()
+
+    counts = {"updated": 0, "current": 0, "duplicate": 0, "failed": 0}
+    pending: Dict[str, Dict] = {}
+    for person_id, stored, packed, rut_hash in rows:
+        if packed is not None and packed[:1] == bytes([RUT_FORMAT_SIV]):
+            # Formato siv: rut_data ya es la clave de búsqueda, sin índice ciego
+            counts["current"] += 1
+            continue
+        try:
+            rut = key_ring.decrypt_stored(packed if packed is not None else stored).decode()
+        except (InvalidToken, binascii.Error, TypeError, ValueError):
+            counts["failed"] += 1
+            logger.warning(f"RUT de persona {person_id} no se pudo descifrar; índice sin recalcular")
+            continue
+        blind_index = SecurityService.hash_rut(rut)
+        if blind_index == rut_hash:
+            counts["current"] += 1
+        elif blind_index in pending:
+            counts["duplicate"] += 1
+            logger.warning(f"RUT de persona {person_id} duplicado en la persona {pending[blind_index]['_id']}")
+        else:
+            pending[blind_index] = {"_id": person_id, "_old": rut_hash, "_hash": blind_index}
+
+    # Índices que ya pertenecen a otra persona (la restricción única rechazaría el lote)
+    if pending:
+        taken = session.query(Person.id, Person.rut_hash).filter(
+            Person.rut_hash.in_(list(pending))
+        ).all()
+        for owner_id, blind_index in taken:
+            update_row = pending.pop(blind_index)
+            counts["duplicate"] += 1
+            logger.warning(f"RUT de persona {update_row['_id']} duplicado en la persona {owner_id}")
+
+    if pending:
+        session.execute(_reindex_statement, list(pending.values()))
+    counts["updated"] = len(pending)
+
+    if rows:
+        last_id = rows[-1].id
+        set_checkpoint(session, CHECKPOINT_NAME, f"{fingerprint}:{last_id}")
+
+    for result, count in counts.items():
+        rut_blind_index_rows_counter.labels(result=result).inc(count)
+    return {**counts, "last_id": last_id, "done": len(rows) < chunk_size}
+
+
+def reindex_status(session: Session) -> Dict:
+    """Posición y progreso del recálculo con la clave actual del índice"""
+    fingerprint = SecurityService.rut_blind_index_fingerprint()
+    last_id = _read_position(session, fingerprint)
+    max_id = session.query(func.max(Person.id)).scalar() or 0
+    remaining = session.query(func.count(Person.id)).filter(Person.id > last_id).scalar()
+    return {
+        "key_fingerprint": fingerprint,
+        "last_id": last_id,
+        "max_id": max_id,
+        "remaining": remaining,
+        "progress": min(last_id / max_id, 1.0) if max_id else 1.0,
+    }
+
+
+class RutBlindIndexJob:
+    """Hilo que recalcula el índice ciego de RUT hasta recorrer la tabla"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, chunk_size: int = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.RUT_BLIND_INDEX_CHUNK_SIZE
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[Dict]:
+        """Procesar un lote y confirmarlo"""
+        db = self.session_factory()
+        try:
+            result = reindex_chunk(db, chunk_size=self.chunk_size)
+            db.commit()
+            if result is not None:
+                max_id = db.query(func.max(Person.id)).scalar() or 0
+                rut_blind_index_progress_gauge.set(
+                    1.0 if result["done"] or not max_id else result["last_id"] / max_id
+                )
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return result
+
+    def run(self) -> Tuple[int, int]:
+        """Procesar lotes hasta terminar o detenerse; retorna (actualizados, duplicados)"""
+        updated = duplicate = 0
+        while not self._stop_event.is_set():
+            result = self.run_once()
+            if result is None:
+                # Otro worker tiene el lote en curso
+                if self._stop_event.wait(1.0):
+                    break
+                continue
+            updated += result["updated"]
+            duplicate += result["duplicate"]
+            if result["done"]:
+                break
+        return updated, duplicate
+
+    def start(self) -> None:
+        """Iniciar el recálculo en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rut-blind-index", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el recálculo (se reanuda desde el punto de control)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            updated, duplicate = self.run()
+            logger.info(f"Índice ciego de RUT: {updated} recalculados, {duplicate} duplicados")
+        except Exception as e:
+            logger.error(f"Error recalculando el índice ciego de RUT: {str(e)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recálculo del índice ciego de RUT")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        db = SessionLocal()
+        try:
+            print(reindex_status(db))
+        finally:
+            db.close()
+    else:
+        started = time.perf_counter()
+        updated, duplicate = RutBlindIndexJob(chunk_size=args.chunk_size).run()
+        print(f"✅ {updated} índices recalculados, {duplicate} duplicados en {time.perf_counter() - started:.1f}s")
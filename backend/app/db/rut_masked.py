@@ -0,0 +1,218 @@
+"""
+Completado en línea del RUT ofuscado almacenado (persons.rut_masked).
+
+rut_masked se calcula al escribir el RUT (Person.set_rut) para que los
+listados no desencripten. Esta tarea completa las filas escritas antes de la
+columna: recorre persons por id en lotes de RUT_MASKED_BACKFILL_CHUNK_SIZE,
+desencripta el lote, calcula el RUT ofuscado y confirma cada lote junto con su
+punto de control en job_checkpoints. Se reanuda donde quedó y vuelve a empezar
+si cambia RUT_MASK_LENGTH. Cada fila se actualiza solo si su RUT cifrado no
+cambió desde que se leyó, por lo que no pisa una actualización concurrente
+del RUT.
+
+Uso como script:
+    python -m app.db.rut_masked run
+    python -m app.db.rut_masked status
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security_service import SecurityService
+from app.db.checkpoints import acquire_job_lock, get_checkpoint, set_checkpoint
+from app.db.database import SessionLocal
+from app.models.person import Person
+from app.services.rut_display import DECRYPT_ERRORS
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "rut_masked"
+# Clave del advisory lock de PostgreSQL que evita lotes concurrentes entre workers
+ADVISORY_LOCK_KEY = 42_000_005
+
+# Métricas de Prometheus
+rut_masked_backfill_rows_counter = Counter(
+    'rut_masked_backfill_rows_total', 'Personas procesadas por el completado de rut_masked', ['result']
+)
+rut_masked_backfill_progress_gauge = Gauge(
+    'rut_masked_backfill_progress_ratio', 'Fracción de personas recorridas por el completado de rut_masked (por id)'
+)
+
+_persons = Person.__table__
+_mask_statement = update(_persons).where(
+    _persons.c.id == bindparam("_id"),
+    _persons.c.rut.is_not_distinct_from(bindparam("_rut")),
+    _persons.c.rut_data.is_not_distinct_from(bindparam("_data")),
+).values(rut_masked=bindparam("_masked"))
+
+
+def _read_position(session: Session) -> int:
+    """Último id procesado con el RUT_MASK_LENGTH actual (0 si el completado es nuevo)"""
+    position = get_checkpoint(session, CHECKPOINT_NAME)
+    if position:
+        mask_length, _, last_id = position.partition(":")
+        if mask_length == str(settings.RUT_MASK_LENGTH):
+            return int(last_id)
+    return 0
+
+
+def backfill_chunk(session: Session, chunk_size: Optional[int] = None) -> Optional[Dict]:
+    """
+    Completar rut_masked del siguiente lote de personas y avanzar el punto de
+    control.
+
+    Retorna los conteos del lote (updated, current, skipped, failed, last_id,
+    done) o None si otro worker está procesando. El llamador confirma.
+    """
+    chunk_size = chunk_size or settings.RUT_MASKED_BACKFILL_CHUNK_SIZE
+
+    if not acquire_job_lock(session, ADVISORY_LOCK_KEY):
+        return None
+
+    last_id = _read_position(session)
+    rows = session.query(
+        Person.id, Person.rut, Person.rut_data, Person.rut_masked
+    ).filter(Person.id > last_id).order_by(Person.id).limit(chunk_size).all()
+
+    counts = {"updated": 0, "current": 0, "skipped": 0, "failed": 0}
+    stored = [row for row in rows if row.rut_data is not None or row.rut]
+    counts["skipped"] = len(rows) - len(stored)
+    decrypted = SecurityService.decrypt_ruts_bulk(
+        [row.rut_data if row.rut_data is not None else row.rut for row in stored]
+    )
+
+    updates = []
+    for row, rut in zip(stored, decrypted):
+        if rut in DECRYPT_ERRORS:
+            counts["failed"] += 1
+            logger.warning(f"RUT de persona {row.id} no se pudo descifrar; rut_masked sin completar")
+            continue
+        masked = SecurityService.mask_rut(rut)
+        if masked == row.rut_masked:
+            counts["current"] += 1
+        else:
+            updates.append({"_id": row.id, "_rut": row.rut, "_data": row.rut_data, "_masked": masked})
+
+    if updates:
+        session.execute(_mask_statement, updates)
+    counts["updated"] = len(updates)
+
+    if rows:
+        last_id = rows[-1].id
+        set_checkpoint(session, CHECKPOINT_NAME, f"{settings.RUT_MASK_LENGTH}:{last_id}")
+
+    for result, count in counts.items():
+        rut_masked_backfill_rows_counter.labels(result=result).inc(count)
+    return {**counts, "last_id": last_id, "done": len(rows) < chunk_size}
+
+
+def backfill_status(session: Session) -> Dict:
+    """Posición y progreso del completado con el RUT_MASK_LENGTH actual"""
+    last_id = _read_position(session)
+    max_id = session.query(func.max(Person.id)).scalar() or 0
+    remaining = session.query(func.count(Person.id)).filter(Person.id > last_id).scalar()
+    missing = session.query(func.count(Person.id)).filter(Person.rut_masked.is_(None)).scalar()
+    return {
+        "mask_length": settings.RUT_MASK_LENGTH,
+        "last_id": last_id,
+        "max_id": max_id,
+        "remaining": remaining,
+        "missing": missing,
+        "progress": min(last_id / max_id, 1.0) if max_id else 1.0,
+    }
+
+
+class RutMaskedBackfillJob:
+    """Hilo que completa rut_masked hasta recorrer la tabla"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, chunk_size: int = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.RUT_MASKED_BACKFILL_CHUNK_SIZE
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[Dict]:
+        """Procesar un lote y confirmarlo"""
+        db = self.session_factory()
+        try:
+            result = backfill_chunk(db, chunk_size=self.chunk_size)
+            db.commit()
+            if result is not None:
+                max_id = db.query(func.max(Person.id)).scalar() or 0
+                rut_masked_backfill_progress_gauge.set(
+                    1.0 if result["done"] or not max_id else result["last_id"] / max_id
+                )
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return result
+
+    def run(self) -> Tuple[int, int]:
+        """Procesar lotes hasta terminar o detenerse; retorna (completados, fallidos)"""
+        updated = failed = 0
+        while not self._stop_event.is_set():
+            result = self.run_once()
+            if result is None:
+                # Otro worker tiene el lote en curso
+                if self._stop_event.wait(1.0):
+                    break
+                continue
+            updated += result["updated"]
+            failed += result["failed"]
+            if result["done"]:
+                break
+        return updated, failed
+
+    def start(self) -> None:
+        """Iniciar el completado en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rut-masked-backfill", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el completado (se reanuda desde el punto de control)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            updated, failed = self.run()
+            logger.info(f"RUT ofuscado almacenado: {updated} completados, {failed} fallidos")
+        except Exception as e:
+            logger.error(f"Error completando rut_masked: {str(e)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Completado de persons.rut_masked")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        db = SessionLocal()
+        try:
+            print(backfill_status(db))
+        finally:
+            db.close()
+    else:
+        started = time.perf_counter()
+        updated, failed = RutMaskedBackfillJob(chunk_size=args.chunk_size).run()
+        print(f"✅ {updated} RUT ofuscados completados, {failed} fallidos en {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,252 @@
+"""
+Re-cifrado en línea de RUT tras rotar RUT_ENCRYPTION_KEY.
+
+Para rotar la clave se configura la nueva en RUT_ENCRYPTION_KEY y la anterior
+en RUT_ENCRYPTION_PREVIOUS_KEYS: la aplicación descifra con ambas mientras una
+tarea recorre persons por id en lotes de RUT_REENCRYPTION_CHUNK_SIZE, re-cifra
+con la clave actual y confirma cada lote junto con su punto de control en
+job_checkpoints. La tarea se reanuda donde quedó y vuelve a empezar si cambia
+la clave actual (los valores AES-SIV del formato siv se re-cifran con la clave
+AES-SIV derivada de la actual). Cada fila se actualiza solo si su RUT no cambió
+desde que se leyó, por lo que no bloquea ni pisa escrituras concurrentes. Terminada la
+rotación, la clave anterior puede retirarse de la configuración.
+
+Uso como script:
+    python -m app.db.rut_reencryption run
+    python -m app.db.rut_reencryption status
+"""
+
+import base64
+import binascii
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from cryptography.fernet import InvalidToken
+from prometheus_client import Counter, Gauge
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security_service import (
+    RUT_FORMAT_SIV, RutKeyRing, SecurityService, pack_rut_token, unpack_rut_token
+)
+from app.db.checkpoints import acquire_job_lock, get_checkpoint, set_checkpoint
+from app.db.database import SessionLocal
+from app.models.person import Person
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "rut_reencryption"
+# Clave del advisory lock de PostgreSQL que evita lotes concurrentes entre workers
+ADVISORY_LOCK_KEY = 42_000_002
+
+# Métricas de Prometheus
+rut_reencryption_rows_counter = Counter(
+    'rut_reencryption_rows_total', 'RUT procesados por el re-cifrado', ['result']
+)
+rut_reencryption_progress_gauge = Gauge(
+    'rut_reencryption_progress_ratio', 'Fracción de personas recorridas por el re-cifrado (por id)'
+)
+rut_reencryption_throughput_gauge = Gauge(
+    'rut_reencryption_rows_per_second', 'Filas por segundo del último lote de re-cifrado'
+)
+
+_persons = Person.__table__
+_rotate_statement = update(_persons).where(
+    _persons.c.id == bindparam("_id"), _persons.c.rut == bindparam("_old")
+).values(rut=bindparam("_new"))
+_rotate_packed_statement = update(_persons).where(
+    _persons.c.id == bindparam("_id"), _persons.c.rut_data == bindparam("_old")
+).values(rut_data=bindparam("_new"))
+
+
+def _read_position(session: Session, key_ring: RutKeyRing) -> int:
+    """Último id procesado con la clave actual (0 si la rotación es nueva)"""
+    position = get_checkpoint(session, CHECKPOINT_NAME)
+    if position:
+        fingerprint, _, last_id = position.partition(":")
+        if fingerprint == key_ring.fingerprint:
+            return int(last_id)
+    return 0
+
+
+def reencrypt_chunk(session: Session, key_ring: Optional[RutKeyRing] = None,
+                    chunk_size: Optional[int] = None) -> Optional[Dict]:
+    """
+    Re-cifrar el siguiente lote de personas y avanzar el punto de control.
+
+    Retorna los conteos del lote (rotated, current, skipped, failed, last_id,
+    done) o None si otro worker está procesando. El llamador confirma.
+    """
+    key_ring = key_ring or SecurityService.key_ring()
+    chunk_size = chunk_size or settings.RUT_REENCRYPTION_CHUNK_SIZE
+
+    if not acquire_job_lock(session, ADVISORY_LOCK_KEY):
+        return None
+
+    last_id = _read_position(session, key_ring)
+    rows = session.query(Person.id, Person.rut, Person.rut_data).filter(
+        Person.id > last_id
+    ).order_by(Person.id).limit(chunk_size).all()
+
+    counts = {"rotated": 0, "current": 0, "skipped": 0, "failed": 0}
+    updates, packed_updates = [], []
+    for person_id, stored, packed in rows:
+        if packed is None and not stored:
+            counts["skipped"] += 1
+            continue
+        try:
+            if packed is not None and packed[:1] == bytes([RUT_FORMAT_SIV]):
+                rotated = key_ring.rotate_siv(bytes(packed))
+                if rotated is None:
+                    counts["current"] += 1
+                else:
+                    packed_updates.append({"_id": person_id, "_old": packed, "_new": rotated})
+                continue
+            if packed is not None:
+                token = key_ring.rotate(unpack_rut_token(packed))
+            else:
+                token = key_ring.rotate(base64.urlsafe_b64decode(stored))
+        except (InvalidToken, binascii.Error, ValueError):
+            counts["failed"] += 1
+            logger.warning(f"RUT de persona {person_id} no se pudo descifrar con ninguna clave")
+            continue
+        if token is None:
+            counts["current"] += 1
+        elif packed is not None:
+            packed_updates.append({"_id": person_id, "_old": packed, "_new": pack_rut_token(token)})
+        else:
+            updates.append({
+                "_id": person_id,
+                "_old": stored,
+                "_new": base64.urlsafe_b64encode(token).decode(),
+            })
+
+    if updates:
+        session.execute(_rotate_statement, updates)
+    if packed_updates:
+        session.execute(_rotate_packed_statement, packed_updates)
+    counts["rotated"] = len(updates) + len(packed_updates)
+
+    if rows:
+        last_id = rows[-1].id
+        set_checkpoint(session, CHECKPOINT_NAME, f"{key_ring.fingerprint}:{last_id}")
+
+    for result, count in counts.items():
+        rut_reencryption_rows_counter.labels(result=result).inc(count)
+    return {**counts, "last_id": last_id, "done": len(rows) < chunk_size}
+
+
+def reencryption_status(session: Session, key_ring: Optional[RutKeyRing] = None) -> Dict:
+    """Posición y progreso de la rotación con la clave actual"""
+    key_ring = key_ring or SecurityService.key_ring()
+    last_id = _read_position(session, key_ring)
+    max_id = session.query(func.max(Person.id)).scalar() or 0
+    remaining = session.query(func.count(Person.id)).filter(Person.id > last_id).scalar()
+    return {
+        "key_fingerprint": key_ring.fingerprint,
+        "last_id": last_id,
+        "max_id": max_id,
+        "remaining": remaining,
+        "progress": min(last_id / max_id, 1.0) if max_id else 1.0,
+    }
+
+
+class RutReencryptionJob:
+    """Hilo que re-cifra los RUT con la clave actual hasta recorrer la tabla"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, chunk_size: int = None,
+                 pause_seconds: float = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.RUT_REENCRYPTION_CHUNK_SIZE
+        self.pause_seconds = settings.RUT_REENCRYPTION_PAUSE if pause_seconds is None else pause_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[Dict]:
+        """Procesar un lote y confirmarlo"""
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            result = reencrypt_chunk(db, chunk_size=self.chunk_size)
+            db.commit()
+            if result is not None:
+                processed = sum(result[key] for key in ("rotated", "current", "skipped", "failed"))
+                elapsed = time.perf_counter() - started
+                if processed and elapsed > 0:
+                    rut_reencryption_throughput_gauge.set(processed / elapsed)
+                max_id = db.query(func.max(Person.id)).scalar() or 0
+                rut_reencryption_progress_gauge.set(
+                    1.0 if result["done"] or not max_id else result["last_id"] / max_id
+                )
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return result
+
+    def run(self) -> Tuple[int, int]:
+        """Procesar lotes hasta terminar o detenerse; retorna (re-cifrados, fallidos)"""
+        rotated = failed = 0
+        while not self._stop_event.is_set():
+            result = self.run_once()
+            if result is None:
+                # Otro worker tiene el lote en curso
+                if self._stop_event.wait(max(self.pause_seconds, 1.0)):
+                    break
+                continue
+            rotated += result["rotated"]
+            failed += result["failed"]
+            if result["done"]:
+                break
+            if self.pause_seconds and self._stop_event.wait(self.pause_seconds):
+                break
+        return rotated, failed
+
+    def start(self) -> None:
+        """Iniciar el re-cifrado en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rut-reencryption", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el re-cifrado (se reanuda desde el punto de control)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            rotated, failed = self.run()
+            logger.info(f"Re-cifrado de RUT: {rotated} re-cifrados, {failed} fallidos")
+        except Exception as e:
+            logger.error(f"Error en el re-cifrado de RUT: {str(e)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-cifrado de RUT con la clave actual")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        db = SessionLocal()
+        try:
+            print(reencryption_status(db))
+        finally:
+            db.close()
+    else:
+        started = time.perf_counter()
+        rotated, failed = RutReencryptionJob(chunk_size=args.chunk_size).run()
+        print(f"✅ {rotated} RUT re-cifrados, {failed} fallidos en {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,275 @@
+"""
+Migración en línea de los RUT cifrados al formato de RUT_STORAGE_FORMAT.
+
+- binary: el formato texto (persons.rut) guarda en base64 un token Fernet que
+  ya está en base64, lo que agranda la columna y su índice único y agrega una
+  decodificación en cada lectura. rut_data guarda un byte de versión seguido
+  del token sin base64 (RutKeyRing.decrypt_packed lo vuelve a codificar y lo
+  descifra con MultiFernet). La conversión desde texto no descifra: solo
+  re-empaqueta el mismo token.
+- siv: rut_data guarda el RUT canónico cifrado con AES-SIV (determinista), que
+  es a la vez la clave única de búsqueda; rut_hash queda en NULL y sale del
+  índice parcial uq_person_rut_hash. La conversión descifra cada RUT.
+
+La tarea recorre persons por id en lotes de RUT_STORAGE_MIGRATION_CHUNK_SIZE,
+convierte las filas que no están en el formato configurado (también de siv a
+binary, para volver atrás) y confirma cada lote junto con su punto de control
+en job_checkpoints; vuelve a empezar si cambia el formato. Cada fila se
+actualiza solo si su RUT cifrado no cambió desde que se leyó. Mientras dura,
+SecurityService.decrypt_rut lee todos los formatos y PersonRepository.get_by_rut
+busca por rut_hash y por rut_data.
+
+Uso como script:
+    python -m app.db.rut_storage run
+    python -m app.db.rut_storage status
+"""
+
+import binascii
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from cryptography.fernet import InvalidToken
+from prometheus_client import Counter, Gauge
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security_service import RUT_FORMAT_FERNET, RUT_FORMAT_SIV, SecurityService, text_to_packed_rut
+from app.db.checkpoints import acquire_job_lock, get_checkpoint, set_checkpoint
+from app.db.database import SessionLocal
+from app.models.person import Person
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "rut_storage"
+# Clave del advisory lock de PostgreSQL que evita lotes concurrentes entre workers
+ADVISORY_LOCK_KEY = 42_000_004
+
+# Métricas de Prometheus
+rut_storage_rows_counter = Counter(
+    'rut_storage_rows_total', 'Personas procesadas por la migración de formato de RUT', ['result']
+)
+rut_storage_progress_gauge = Gauge(
+    'rut_storage_progress_ratio', 'Fracción de personas recorridas por la migración de formato de RUT'
+)
+
+_persons = Person.__table__
+_convert_text_statement = update(_persons).where(
+    _persons.c.id == bindparam("_id"), _persons.c.rut == bindparam("_old")
+).values(rut_data=bindparam("_packed"), rut=None, rut_hash=bindparam("_hash"))
+_convert_packed_statement = update(_persons).where(
+    _persons.c.id == bindparam("_id"), _persons.c.rut_data == bindparam("_old")
+).values(rut_data=bindparam("_packed"), rut_hash=bindparam("_hash"))
+
+
+def _target_format() -> str:
+    """Formato al que converge la migración (con text la aplicación no la inicia; el script migra a binary)"""
+    return "siv" if settings.RUT_STORAGE_FORMAT == "siv" else "binary"
+
+
+def _read_position(session: Session, target: str) -> int:
+    """Último id procesado hacia el formato target (0 si la migración es nueva)"""
+    position = get_checkpoint(session, CHECKPOINT_NAME)
+    if position:
+        # Los puntos de control sin formato son de la migración a binary
+        stored_target, _, last_id = position.rpartition(":")
+        if (stored_target or "binary") == target:
+            return int(last_id)
+    return 0
+
+
+def _convert(person_id: int, stored: Optional[str], packed: Optional[bytes], rut_hash: Optional[str],
+             target: str) -> Optional[Dict]:
+    """Parámetros del UPDATE que lleva la fila al formato target, o None si ya está en él"""
+    version = packed[0] if packed else None
+    if target == "siv":
+        if version == RUT_FORMAT_SIV:
+            return None
+        rut = SecurityService.key_ring().decrypt_stored(packed if packed is not None else stored).decode()
+        return {"_id": person_id, "_old": packed if packed is not None else stored,
+                "_packed": SecurityService.encrypt_rut_siv(rut), "_hash": None}
+    if version == RUT_FORMAT_FERNET:
+        return None
+    if packed is not None:
+        # siv -> binary: re-cifrar con Fernet y recuperar el índice ciego
+        rut = SecurityService.key_ring().decrypt_siv(bytes(packed)).decode()
+        return {"_id": person_id, "_old": packed, "_packed": SecurityService.encrypt_rut_packed(rut),
+                "_hash": SecurityService.hash_rut(rut)}
+    # texto -> binary: mismo token sin descifrar
+    return {"_id": person_id, "_old": stored, "_packed": text_to_packed_rut(stored), "_hash": rut_hash}
+
+
+def migrate_chunk(session: Session, chunk_size: Optional[int] = None) -> Optional[Dict]:
+    """
+    Convertir al formato configurado el siguiente lote de personas y avanzar
+    el punto de control.
+
+    Retorna los conteos del lote (converted, current, duplicate, failed,
+    last_id, done) o None si otro worker está procesando. El llamador confirma.
+    """
+    chunk_size = chunk_size or settings.RUT_STORAGE_MIGRATION_CHUNK_SIZE
+    target = _target_format()
+
+    if not acquire_job_lock(session, ADVISORY_LOCK_KEY):
+        return None
+
+    last_id = _read_position(session, target)
+    rows = session.query(Person.id, Person.rut, Person.rut_data, Person.rut_hash).filter(
+        Person.id > last_id
+    ).order_by(Person.id).limit(chunk_size).all()
+
+    counts = {"converted": 0, "current": 0, "duplicate": 0, "failed": 0}
+    pending: Dict[bytes, Dict] = {}
+    for person_id, stored, packed, rut_hash in rows:
+        if packed is None and not stored:
+            counts["current"] += 1
+            continue
+        try:
+            update_row = _convert(person_id, stored, bytes(packed) if packed is not None else None,
+                                  rut_hash, target)
+        except (InvalidToken, binascii.Error, ValueError):
+            counts["failed"] += 1
+            logger.warning(f"RUT de persona {person_id} no se pudo convertir a formato {target}")
+            continue
+        if update_row is None:
+            counts["current"] += 1
+        elif update_row["_packed"] in pending:
+            counts["duplicate"] += 1
+            logger.warning(f"RUT de persona {person_id} duplicado en la persona {pending[update_row['_packed']]['_id']}")
+        else:
+            pending[update_row["_packed"]] = update_row
+
+    # Valores AES-SIV que ya pertenecen a otra persona (la restricción única rechazaría el lote)
+    if pending and target == "siv":
+        taken = session.query(Person.id, Person.rut_data).filter(Person.rut_data.in_(list(pending))).all()
+        for owner_id, packed in taken:
+            update_row = pending.pop(bytes(packed))
+            counts["duplicate"] += 1
+            logger.warning(f"RUT de persona {update_row['_id']} duplicado en la persona {owner_id}")
+
+    text_updates = [row for row in pending.values() if isinstance(row["_old"], str)]
+    packed_updates = [row for row in pending.values() if not isinstance(row["_old"], str)]
+    if text_updates:
+        session.execute(_convert_text_statement, text_updates)
+    if packed_updates:
+        session.execute(_convert_packed_statement, packed_updates)
+    counts["converted"] = len(pending)
+
+    if rows:
+        last_id = rows[-1].id
+        set_checkpoint(session, CHECKPOINT_NAME, f"{target}:{last_id}")
+
+    for result, count in counts.items():
+        rut_storage_rows_counter.labels(result=result).inc(count)
+    return {**counts, "last_id": last_id, "done": len(rows) < chunk_size}
+
+
+def storage_status(session: Session) -> Dict:
+    """Posición de la migración y filas en cada formato"""
+    target = _target_format()
+    last_id = _read_position(session, target)
+    max_id = session.query(func.max(Person.id)).scalar() or 0
+    return {
+        "target": target,
+        "last_id": last_id,
+        "max_id": max_id,
+        "text_rows": session.query(func.count(Person.id)).filter(Person.rut.isnot(None)).scalar(),
+        "binary_rows": session.query(func.count(Person.id)).filter(
+            Person.rut_data.isnot(None), Person.rut_hash.isnot(None)
+        ).scalar(),
+        "siv_rows": session.query(func.count(Person.id)).filter(
+            Person.rut_data.isnot(None), Person.rut_hash.is_(None)
+        ).scalar(),
+        "progress": min(last_id / max_id, 1.0) if max_id else 1.0,
+    }
+
+
+class RutStorageMigrationJob:
+    """Hilo que convierte los RUT al formato configurado hasta recorrer la tabla"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, chunk_size: int = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.RUT_STORAGE_MIGRATION_CHUNK_SIZE
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[Dict]:
+        """Procesar un lote y confirmarlo"""
+        db = self.session_factory()
+        try:
+            result = migrate_chunk(db, chunk_size=self.chunk_size)
+            db.commit()
+            if result is not None:
+                max_id = db.query(func.max(Person.id)).scalar() or 0
+                rut_storage_progress_gauge.set(
+                    1.0 if result["done"] or not max_id else result["last_id"] / max_id
+                )
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return result
+
+    def run(self) -> Tuple[int, int]:
+        """Procesar lotes hasta terminar o detenerse; retorna (convertidos, fallidos)"""
+        converted = failed = 0
+        while not self._stop_event.is_set():
+            result = self.run_once()
+            if result is None:
+                # Otro worker tiene el lote en curso
+                if self._stop_event.wait(1.0):
+                    break
+                continue
+            converted += result["converted"]
+            failed += result["failed"]
+            if result["done"]:
+                break
+        return converted, failed
+
+    def start(self) -> None:
+        """Iniciar la migración en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rut-storage-migration", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener la migración (se reanuda desde el punto de control)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            converted, failed = self.run()
+            logger.info(f"Migración de RUT a formato {_target_format()}: {converted} convertidos, {failed} fallidos")
+        except Exception as e:
+            logger.error(f"Error en la migración de formato de RUT: {str(e)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migración de RUT al formato de RUT_STORAGE_FORMAT")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        db = SessionLocal()
+        try:
+            print(storage_status(db))
+        finally:
+            db.close()
+    else:
+        started = time.perf_counter()
+        converted, failed = RutStorageMigrationJob(chunk_size=args.chunk_size).run()
+        print(f"✅ {converted} RUT convertidos, {failed} fallidos en {time.perf_counter() - started:.1f}s")
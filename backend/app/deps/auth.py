@@ -4,19 +4,19 @@ Dependencias comunes para la aplicación.
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.core.security_utils import SecurityUtils
-from app.repositories.user import UserRepository
+from app.services.principals import load_principal
 from app.models.user import User
 
 security = HTTPBearer()
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Obtener usuario actual desde el token JWT"""
     token = credentials.credentials
@@ -30,8 +30,8 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user_repo = UserRepository(db)
-    user = user_repo.get_by_email(email)
+    # Usuario desde la caché de principales (o la base si no está)
+    user = await load_principal(db, email)
     
     if user is None:
         raise HTTPException(
@@ -61,9 +61,9 @@ def get_current_admin_user(
     return current_user
 
 
-def get_current_user_optional(
+async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Optional[User]:
     """Obtener usuario actual opcional (para endpoints públicos)"""
     if credentials is None:
@@ -77,8 +77,7 @@ def get_current_user_optional(
         if email is None:
             return None
         
-        user_repo = UserRepository(db)
-        user = user_repo.get_by_email(email)
+        user = await load_principal(db, email)
         
         if user is None or not user.is_active:
             return None
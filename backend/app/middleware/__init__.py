@@ -3,5 +3,6 @@ Middleware de la aplicación
 """
 
 from app.middleware.cors import setup_cors
+from app.middleware.audit import AuditContextMiddleware, setup_audit_context
 
-__all__ = ["setup_cors"]
+__all__ = ["setup_cors", "AuditContextMiddleware", "setup_audit_context"]
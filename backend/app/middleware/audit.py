@@ -0,0 +1,90 @@
+"""
+Middleware de contexto de auditoría: un registro consolidado por petición
+"""
+
+import logging
+from typing import Callable
+
+from fastapi import Request
+from fastapi.exception_handlers import http_exception_handler
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.audit_context import (
+    AuditContext, activate_audit_context, current_audit_context, deactivate_audit_context
+)
+from app.db.database import SessionLocal
+from app.deps.auth import get_client_ip, get_user_agent
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class AuditContextMiddleware:
+    """
+    Activa un AuditContext durante cada petición HTTP y, al terminar la
+    respuesta, escribe un único registro con los hechos no durables recogidos
+    (las acciones durables ya se confirmaron al registrarse).
+    """
+
+    def __init__(self, app: ASGIApp, session_factory: Callable = SessionLocal):
+        self.app = app
+        self.session_factory = session_factory
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.AUDIT_REQUEST_CONTEXT:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        context = AuditContext(ip_address=get_client_ip(request), user_agent=get_user_agent(request))
+        token = activate_audit_context(context)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            context.fail(type(e).__name__)
+            raise
+        finally:
+            deactivate_audit_context(token)
+            event = context.consolidate(status_code)
+            if event is not None:
+                try:
+                    await run_in_threadpool(self._write, event)
+                except Exception as e:
+                    logger.error(f"Error escribiendo el registro de auditoría de la petición: {str(e)}")
+
+    def _write(self, event: dict) -> None:
+        from app.repositories.audit import AuditRepository
+
+        db = self.session_factory()
+        try:
+            AuditRepository(db).create_log(**event, durable=False)
+        finally:
+            db.close()
+
+
+async def audit_http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Agregar el motivo del error al contexto de auditoría y responder como FastAPI"""
+    context = current_audit_context()
+    if context is not None:
+        context.fail(str(exc.detail))
+    return await http_exception_handler(request, exc)
+
+
+def setup_audit_context(app, session_factory: Callable = SessionLocal):
+    """
+    Registra el middleware de contexto de auditoría y el manejador que captura
+    los motivos de error de las HTTPException
+    """
+    app.add_middleware(AuditContextMiddleware, session_factory=session_factory)
+    app.add_exception_handler(StarletteHTTPException, audit_http_exception_handler)
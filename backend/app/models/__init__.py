@@ -5,5 +5,8 @@ Importaciones de todos los modelos para facilitar el acceso.
 from app.models.user import User
 from app.models.person import Person
 from app.models.audit_log import AuditLog
+from app.models.audit_stats import AuditStatsHourly
+from app.models.job_checkpoint import JobCheckpoint
+from app.models.revoked_token import RevokedToken
 
-__all__ = ["User", "Person", "AuditLog"]
+__all__ = ["User", "Person", "AuditLog", "AuditStatsHourly", "JobCheckpoint", "RevokedToken"]
@@ -20,12 +20,17 @@ class AuditLog(Base):
     ip_address = Column(String(45), nullable=True)  # IPv4 o IPv6
     user_agent = Column(String(500), nullable=True)
     details = Column(Text, nullable=True)  # Detalles adicionales en JSON
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Clave de partición mensual
     
     # Índices para consultas de auditoría
     __table_args__ = (
         Index('idx_audit_user_action', 'user_id', 'action'),
-        Index('idx_audit_resource', 'resource', 'resource_id'),
-        Index('idx_audit_timestamp', 'timestamp'),
         Index('idx_audit_ip_address', 'ip_address'),
+        # Índices compuestos (filtro, timestamp, id): sirven el filtro y el orden
+        # de la paginación keyset en un único recorrido del índice
+        Index('idx_audit_timestamp_id', 'timestamp', 'id'),
+        Index('idx_audit_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+        Index('idx_audit_action_timestamp_id', 'action', 'timestamp', 'id'),
+        Index('idx_audit_resource_timestamp_id', 'resource', 'timestamp', 'id'),
+        Index('idx_audit_resource_item_timestamp_id', 'resource', 'resource_id', 'timestamp', 'id'),
     )
@@ -0,0 +1,28 @@
+"""
+Modelo de agregados horarios de auditoría.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from app.db.database import Base
+
+
+class AuditStatsHourly(Base):
+    """
+    Conteo de eventos de auditoría por hora y por combinación de
+    acción, recurso, usuario e IP. Se recalcula desde audit_logs
+    (ver app.db.audit_rollup) y alimenta las estadísticas.
+    """
+    
+    __tablename__ = "audit_stats_hourly"
+    
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime(timezone=True), nullable=False)  # Inicio de la hora (UTC)
+    action = Column(String(50), nullable=False)
+    resource = Column(String(50), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    ip_address = Column(String(45), nullable=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_audit_stats_bucket', 'bucket'),
+    )
@@ -0,0 +1,17 @@
+"""
+Modelo de puntos de control de tareas en segundo plano.
+"""
+
+from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class JobCheckpoint(Base):
+    """Posición alcanzada por una tarea periódica o reanudable"""
+    
+    __tablename__ = "job_checkpoints"
+    
+    name = Column(String(100), primary_key=True)  # Identificador de la tarea
+    position = Column(Text, nullable=True)  # Última posición procesada (formato propio de cada tarea)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
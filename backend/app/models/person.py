@@ -2,7 +2,7 @@
 Modelo de persona para el sistema de auditoría.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, LargeBinary, text
 from sqlalchemy.sql import func
 from app.db.database import Base
 import hashlib
@@ -17,8 +17,10 @@ class Person(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Datos personales
-    rut = Column(String(200), unique=True, index=True, nullable=False)  # Aumentado para RUT encriptado
-    rut_hash = Column(String(64), nullable=False)  # Hash del RUT para búsquedas
+    rut = Column(String(200), unique=True, index=True, nullable=True)  # RUT encriptado en formato texto (anterior)
+    rut_data = Column(LargeBinary, nullable=True)  # RUT encriptado en formato binario (versión + token)
+    rut_hash = Column(String(64), nullable=True)  # Índice ciego del RUT (HMAC) para búsquedas (NULL con formato siv)
+    rut_masked = Column(String(20), nullable=True)  # RUT ofuscado calculado al escribir (listados)
     nombre = Column(String(100), nullable=False)
     apellido = Column(String(100), nullable=False)
     
@@ -39,12 +41,37 @@ class Person(Base):
     
     # Índices para optimización y seguridad
     __table_args__ = (
-        Index('idx_person_rut_hash', 'rut_hash'),
+        Index('uq_person_rut_hash', 'rut_hash', unique=True,
+              postgresql_where=text('rut_hash IS NOT NULL'), sqlite_where=text('rut_hash IS NOT NULL')),
+        Index('uq_person_rut_data', 'rut_data', unique=True),
         Index('idx_person_nombre_apellido', 'nombre', 'apellido'),
         Index('idx_person_created_at', 'created_at'),
         Index('idx_person_created_by', 'created_by'),
     )
     
+    @property
+    def encrypted_rut(self):
+        """RUT encriptado almacenado: rut_data (binario) o rut (texto) mientras dure la migración"""
+        return self.rut_data if self.rut_data is not None else self.rut
+    
+    def set_rut(self, rut: str) -> None:
+        """
+        Encripta y guarda el RUT en el formato configurado (RUT_STORAGE_FORMAT)
+        junto con su versión ofuscada
+        """
+        from app.core.config import settings
+        from app.core.security_service import SecurityService
+        self.rut_masked = SecurityService.mask_rut(rut)
+        if settings.RUT_STORAGE_FORMAT == "siv":
+            self.rut_data = SecurityService.encrypt_rut_siv(rut)
+            self.rut = None
+        elif settings.RUT_STORAGE_FORMAT == "binary":
+            self.rut_data = SecurityService.encrypt_rut_packed(rut)
+            self.rut = None
+        else:
+            self.rut = SecurityService.encrypt_rut(rut)
+            self.rut_data = None
+    
     def set_religion_hash(self, religion: str) -> None:
         """Genera hash irreversible de la religión usando el servicio de seguridad"""
         if religion:
@@ -58,8 +85,14 @@ class Person(Base):
             self.religion_hash = ""
     
     def set_rut_hash(self, rut: str) -> None:
-        """Genera hash del RUT para búsquedas usando el servicio de seguridad"""
-        if rut:
+        """
+        Genera el índice ciego del RUT para búsquedas usando el servicio de
+        seguridad (con el formato siv rut_data ya es la clave de búsqueda)
+        """
+        from app.core.config import settings
+        if settings.RUT_STORAGE_FORMAT == "siv":
+            self.rut_hash = None
+        elif rut:
             # Usar el servicio de seguridad centralizado
             from app.core.security_service import SecurityService
             self.rut_hash = SecurityService.hash_rut(rut)
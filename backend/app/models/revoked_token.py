@@ -0,0 +1,19 @@
+"""
+Modelo de tokens JWT revocados.
+"""
+
+from sqlalchemy import Column, String, DateTime, Index
+from app.db.database import Base
+
+
+class RevokedToken(Base):
+    """Token revocado antes de su expiración (logout), identificado por su jti"""
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)  # Claim jti del token
+    expires_at = Column(DateTime(timezone=True), nullable=False)  # exp del token; luego se compacta
+
+    __table_args__ = (
+        Index('idx_revoked_token_expires_at', 'expires_at'),
+    )
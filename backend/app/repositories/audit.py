@@ -2,12 +2,101 @@
 Repositorio para operaciones de auditoría.
 """
 
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import Optional, List, Dict
-from datetime import datetime, timedelta
+from sqlalchemy import func, select, tuple_
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timedelta, timezone
 from app.models.audit_log import AuditLog
 from app.repositories.base import BaseRepository
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.db import audit_rollup, partitions
+from app.db.counting import CountResult, CountStrategy, count_total
+from app.db.audit_writer import audit_writer, audit_events_written_counter, is_durable_action
+from app.db.audit_context import current_audit_context
+
+
+def _defer_event(user_id: Optional[int], action: str, resource: str,
+                 resource_id: Optional[int], ip_address: Optional[str],
+                 user_agent: Optional[str], details: Optional[str],
+                 durable: Optional[bool]) -> Tuple[Dict, Optional[AuditLog]]:
+    """
+    Evento de auditoría y, si no debe escribirse en línea, el AuditLog
+    transitorio que lo representa (agregado al contexto de la petición o
+    encolado en el escritor diferido)
+    """
+    event = {
+        'user_id': user_id,
+        'action': action,
+        'resource': resource,
+        'resource_id': resource_id,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'details': details,
+        'timestamp': datetime.now(timezone.utc),
+    }
+
+    if durable is None:
+        durable = is_durable_action(action)
+
+    context = current_audit_context()
+    if durable:
+        # También dentro de una petición: el hecho queda confirmado antes de responder
+        if context is not None:
+            event['ip_address'] = ip_address or context.ip_address
+            event['user_agent'] = user_agent or context.user_agent
+        return event, None
+
+    if context is not None:
+        context.record(event)
+        return event, AuditLog(**event)
+
+    if audit_writer.enqueue(event):
+        return event, AuditLog(**event)
+
+    return event, None
+
+
+def _page_query(query, limit: int, after: Optional[str], before: Optional[str], skip: int):
+    """
+    Filtro de cursor, orden y límite de una página (Query o select).
+
+    Retorna (consulta, ascendente): con before se lee en orden ascendente.
+    """
+    position = tuple_(AuditLog.timestamp, AuditLog.id)
+
+    if before:
+        query = query.filter(position > tuple_(*decode_cursor(before)))
+        return query.order_by(AuditLog.timestamp.asc(), AuditLog.id.asc()).limit(limit + 1), True
+
+    if after:
+        query = query.filter(position < tuple_(*decode_cursor(after)))
+    query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+    if skip and not after:
+        query = query.offset(skip)
+    return query.limit(limit + 1), False
+
+
+def _page_result(rows: List[AuditLog], limit: int, after: Optional[str], before: Optional[str],
+                 skip: int, ascending: bool) -> Dict:
+    """Página con items, next_cursor y prev_cursor a partir de las filas leídas"""
+    if ascending:
+        items = list(reversed(rows[:limit]))
+        has_older, has_newer = True, len(rows) > limit
+    else:
+        items = rows[:limit]
+        has_older, has_newer = len(rows) > limit, bool(after or skip)
+
+    if not items:
+        # Página vacía: se conserva el cursor recibido para poder volver atrás
+        return {'items': [], 'next_cursor': before, 'prev_cursor': after}
+
+    return {
+        'items': items,
+        'next_cursor': encode_cursor(items[-1].timestamp, items[-1].id) if has_older else None,
+        'prev_cursor': encode_cursor(items[0].timestamp, items[0].id) if has_newer else None,
+    }
 
 
 class AuditRepository:
@@ -16,138 +105,194 @@ class AuditRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_log(self, user_id: Optional[int], action: str, resource: str, 
+    def create_log(self, user_id: Optional[int], action: str, resource: str,
                    resource_id: Optional[int] = None, ip_address: Optional[str] = None,
-                   user_agent: Optional[str] = None, details: Optional[str] = None) -> AuditLog:
-        """Crear log de auditoría"""
-        db_log = AuditLog(
-            user_id=user_id,
-            action=action,
-            resource=resource,
-            resource_id=resource_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            details=details
-        )
+                   user_agent: Optional[str] = None, details: Optional[str] = None,
+                   durable: Optional[bool] = None) -> AuditLog:
+        """
+        Crear log de auditoría.
+
+        Las acciones durables (AUDIT_DURABLE_ACTIONS) o durable=True se escriben
+        y confirman en línea, también dentro de una petición. Las demás se
+        agregan al contexto de auditoría de la petición, que las escribe
+        consolidadas al terminar la respuesta, o sin contexto se encolan en el
+        escritor diferido si está activo; en ambos casos se retorna un AuditLog
+        transitorio (sin id).
+        """
+        event, deferred = _defer_event(user_id, action, resource, resource_id, ip_address,
+                                       user_agent, details, durable)
+        if deferred is not None:
+            return deferred
+
+        db_log = AuditLog(**event)
         self.db.add(db_log)
         self.db.commit()
         self.db.refresh(db_log)
+        audit_events_written_counter.labels(mode="inline").inc()
         return db_log
     
-    def get_logs(self, skip: int = 0, limit: int = 100) -> List[AuditLog]:
+    def paginate(self, query, limit: int = 100, after: Optional[str] = None,
+                 before: Optional[str] = None, skip: int = 0) -> Dict:
+        """
+        Paginar una consulta de AuditLog en orden (timestamp, id) descendente.
+
+        Con after se retornan los logs más antiguos que el cursor y con before los
+        más recientes; ambos buscan directamente en los índices compuestos
+        (..., timestamp, id) sin recorrer las páginas anteriores. skip solo se usa
+        como paginación por offset heredada cuando no se indica cursor. Se lee una
+        fila extra para saber si existe una página siguiente.
+        """
+        query, ascending = _page_query(query, limit, after, before, skip)
+        return _page_result(query.all(), limit, after, before, skip, ascending)
+
+    @staticmethod
+    def filter_conditions(start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None,
+                          user_id: Optional[int] = None,
+                          action: Optional[str] = None,
+                          resource: Optional[str] = None,
+                          resource_id: Optional[int] = None) -> List:
+        """Condiciones WHERE para los filtros presentes"""
+        conditions = []
+
+        if start_date:
+            conditions.append(AuditLog.timestamp >= start_date)
+
+        if end_date:
+            conditions.append(AuditLog.timestamp <= end_date)
+
+        if user_id is not None:
+            conditions.append(AuditLog.user_id == user_id)
+
+        if action:
+            conditions.append(AuditLog.action == action)
+
+        if resource:
+            conditions.append(AuditLog.resource == resource)
+
+        if resource_id is not None:
+            conditions.append(AuditLog.resource_id == resource_id)
+
+        return conditions
+
+    def _filtered_query(self, **filters):
+        """Construir la consulta de logs con los filtros presentes"""
+        return self.db.query(AuditLog).filter(*self.filter_conditions(**filters))
+
+    def get_logs_page(self, limit: int = 100, after: Optional[str] = None,
+                      before: Optional[str] = None, skip: int = 0, **filters) -> Dict:
+        """
+        Obtener una página de logs con filtros opcionales.
+
+        Retorna un diccionario con items, next_cursor y prev_cursor.
+        """
+        return self.paginate(self._filtered_query(**filters), limit=limit,
+                             after=after, before=before, skip=skip)
+
+    def get_logs(self, skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                 before: Optional[str] = None) -> List[AuditLog]:
         """Obtener logs de auditoría"""
-        return self.db.query(AuditLog).order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        return self.get_logs_page(limit, after, before, skip)['items']
     
-    def get_logs_by_user(self, user_id: int, skip: int = 0, limit: int = 100) -> List[AuditLog]:
+    def get_logs_by_user(self, user_id: int, skip: int = 0, limit: int = 100,
+                         after: Optional[str] = None, before: Optional[str] = None) -> List[AuditLog]:
         """Obtener logs de auditoría por usuario"""
-        return self.db.query(AuditLog).filter(
-            AuditLog.user_id == user_id
-        ).order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        return self.get_logs_page(limit, after, before, skip, user_id=user_id)['items']
     
-    def get_logs_by_action(self, action: str, skip: int = 0, limit: int = 100) -> List[AuditLog]:
+    def get_logs_by_action(self, action: str, skip: int = 0, limit: int = 100,
+                           after: Optional[str] = None, before: Optional[str] = None) -> List[AuditLog]:
         """Obtener logs de auditoría por acción"""
-        return self.db.query(AuditLog).filter(
-            AuditLog.action == action
-        ).order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        return self.get_logs_page(limit, after, before, skip, action=action)['items']
     
     def get_logs_by_resource(self, resource: str, resource_id: Optional[int] = None,
-                           skip: int = 0, limit: int = 100) -> List[AuditLog]:
+                           skip: int = 0, limit: int = 100,
+                           after: Optional[str] = None, before: Optional[str] = None) -> List[AuditLog]:
         """Obtener logs de auditoría por recurso"""
-        query = self.db.query(AuditLog).filter(AuditLog.resource == resource)
-        
-        if resource_id:
-            query = query.filter(AuditLog.resource_id == resource_id)
-        
-        return query.order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        return self.get_logs_page(limit, after, before, skip,
+                                  resource=resource, resource_id=resource_id)['items']
     
     def get_logs_by_period(self, start_date: datetime, end_date: datetime,
-                          skip: int = 0, limit: int = 100) -> List[AuditLog]:
+                          skip: int = 0, limit: int = 100,
+                          after: Optional[str] = None, before: Optional[str] = None) -> List[AuditLog]:
         """Obtener logs de auditoría por período"""
-        return self.db.query(AuditLog).filter(
-            and_(AuditLog.timestamp >= start_date, AuditLog.timestamp <= end_date)
-        ).order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        return self.get_logs_page(limit, after, before, skip,
+                                  start_date=start_date, end_date=end_date)['items']
     
     def get_stats(self, days: int = 30) -> Dict:
-        """Obtener estadísticas de auditoría"""
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-        
-        # Total de acciones
-        total_actions = self.db.query(AuditLog).filter(
-            AuditLog.timestamp >= start_date
-        ).count()
-        
-        # Acciones por tipo
-        actions_by_type = dict(
-            self.db.query(AuditLog.action, func.count(AuditLog.id))
-            .filter(AuditLog.timestamp >= start_date)
-            .group_by(AuditLog.action)
-            .all()
-        )
-        
-        # Recursos por tipo
-        resources_by_type = dict(
-            self.db.query(AuditLog.resource, func.count(AuditLog.id))
-            .filter(AuditLog.timestamp >= start_date)
-            .group_by(AuditLog.resource)
-            .all()
-        )
-        
-        # Usuarios más activos
-        most_active_users = self.db.query(
-            AuditLog.user_id,
-            func.count(AuditLog.id).label('actions_count')
-        ).filter(
-            and_(AuditLog.timestamp >= start_date, AuditLog.user_id.isnot(None))
-        ).group_by(AuditLog.user_id).order_by(
-            func.count(AuditLog.id).desc()
-        ).limit(10).all()
-        
-        # IPs más frecuentes
-        frequent_ips = self.db.query(
-            AuditLog.ip_address,
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            and_(AuditLog.timestamp >= start_date, AuditLog.ip_address.isnot(None))
-        ).group_by(AuditLog.ip_address).order_by(
-            func.count(AuditLog.id).desc()
-        ).limit(10).all()
-        
-        # Acciones por día
-        daily_actions = self.db.query(
-            func.date(AuditLog.timestamp).label('date'),
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.timestamp >= start_date
-        ).group_by(
-            func.date(AuditLog.timestamp)
-        ).order_by(
-            func.date(AuditLog.timestamp)
-        ).all()
+        """
+        Obtener estadísticas de auditoría.
+
+        Cada desglose es una suma agrupada en la base sobre audit_stats_hourly
+        más los logs aún no compactados (audit_rollup.stats_counts), por lo que
+        el costo depende del número de horas y valores distintos del período y
+        no del número de logs. Días y horas son UTC, como los agregados. El
+        período comienza al inicio de la hora correspondiente.
+        """
+        end_date = datetime.now(timezone.utc)
+        start_date = audit_rollup.hour_start(end_date - timedelta(days=days))
         
-        # Distribución por hora
-        hourly_distribution = self.db.query(
-            func.extract('hour', AuditLog.timestamp).label('hour'),
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.timestamp >= start_date
-        ).group_by(
-            func.extract('hour', AuditLog.timestamp)
-        ).order_by(
-            func.extract('hour', AuditLog.timestamp)
-        ).all()
+        counts = audit_rollup.stats_counts(self.db, start_date)
+        users = Counter({user_id: count for user_id, count in counts['user_id'].items() if user_id is not None})
+        ips = Counter({ip: count for ip, count in counts['ip_address'].items() if ip is not None})
+        daily = Counter()
+        hourly = Counter()
+        for bucket, count in counts['hour'].items():
+            daily[bucket.date().isoformat()] += count
+            hourly[bucket.hour] += count
         
         return {
             'period_days': days,
             'start_date': start_date,
             'end_date': end_date,
-            'total_actions': total_actions,
-            'actions_by_type': actions_by_type,
-            'resources_by_type': resources_by_type,
-            'most_active_users': [{'user_id': user_id, 'actions_count': count} for user_id, count in most_active_users],
-            'frequent_ips': [{'ip': ip, 'count': count} for ip, count in frequent_ips],
-            'daily_actions': [{'date': str(date), 'count': count} for date, count in daily_actions],
-            'hourly_distribution': [{'hour': int(hour), 'count': count} for hour, count in hourly_distribution]
+            'total_actions': sum(counts['action'].values()),
+            'actions_by_type': dict(counts['action']),
+            'resources_by_type': dict(counts['resource']),
+            'most_active_users': [{'user_id': user_id, 'actions_count': count} for user_id, count in users.most_common(10)],
+            'frequent_ips': [{'ip': ip, 'count': count} for ip, count in ips.most_common(10)],
+            'daily_actions': [{'date': date, 'count': daily[date]} for date in sorted(daily)],
+            'hourly_distribution': [{'hour': hour, 'count': hourly[hour]} for hour in sorted(hourly)]
+        }
+    
+    def purge_before(self, cutoff: datetime, dry_run: bool = True) -> Dict:
+        """
+        Eliminar (o simular la eliminación de) logs anteriores a cutoff.
+
+        Con audit_logs particionada se eliminan particiones mensuales completas
+        (DETACH + DROP) y los conteos son estimaciones de pg_class; el mes que
+        contiene cutoff se conserva entero. Las filas de audit_logs_default
+        anteriores a cutoff se borran con el corte exacto. Sin particiones se
+        borran filas.
+        """
+        bind = self.db.get_bind()
+        if partitions.is_partitioned(bind):
+            connection = self.db.connection()
+            if dry_run:
+                affected = partitions.partitions_before(connection, cutoff)
+                default_rows = partitions.count_default_before(connection, cutoff)
+            else:
+                affected = partitions.drop_audit_partitions_before(connection, cutoff)
+                default_rows = partitions.delete_default_before(connection, cutoff)
+                self.db.commit()
+            return {
+                'strategy': 'partitions',
+                'rows': sum(p['estimated_rows'] for p in affected) + default_rows,
+                'rows_are_estimate': True,
+                'partitions': [p['name'] for p in affected],
+                'effective_cutoff': max((p['end'] for p in affected), default=None),
+            }
+
+        query = self.db.query(AuditLog).filter(AuditLog.timestamp < cutoff)
+        if dry_run:
+            rows = query.count()
+        else:
+            rows = query.delete(synchronize_session=False)
+            self.db.commit()
+        return {
+            'strategy': 'rows',
+            'rows': rows,
+            'rows_are_estimate': False,
+            'partitions': [],
+            'effective_cutoff': cutoff,
         }
     
     def count(self) -> int:
@@ -161,6 +306,26 @@ class AuditRepository:
     def count_by_action(self, action: str) -> int:
         """Contar logs por acción"""
         return self.db.query(AuditLog).filter(AuditLog.action == action).count()
+
+    def count_filtered(self, **filters) -> int:
+        """Contar logs con los mismos filtros que get_logs_page"""
+        return self._filtered_query(**filters).count()
+
+    def count_page_total(self, page: Dict, strategy: CountStrategy = CountStrategy.EXACT,
+                         skip: int = 0, **filters) -> CountResult:
+        """
+        Total de una página de get_logs_page según la estrategia de conteo.
+
+        next_cursor indica si hay logs más antiguos, por lo que lookahead no
+        necesita consultas adicionales.
+        """
+        return count_total(
+            self._filtered_query(**filters), strategy,
+            skip=skip,
+            returned=len(page['items']),
+            has_more=page['next_cursor'] is not None,
+            filtered=bool(self.filter_conditions(**filters))
+        )
     
     def get_logs_filtered(self, start_date: Optional[datetime] = None, 
                         end_date: Optional[datetime] = None,
@@ -169,24 +334,112 @@ class AuditRepository:
                         resource: Optional[str] = None,
                         resource_id: Optional[int] = None,
                         skip: int = 0, 
-                        limit: int = 100) -> List[AuditLog]:
+                        limit: int = 100,
+                        after: Optional[str] = None,
+                        before: Optional[str] = None) -> List[AuditLog]:
         """Obtener logs de auditoría con múltiples filtros"""
-        query = self.db.query(AuditLog)
-        
-        # Aplicar filtros si están presentes
-        if start_date and end_date:
-            query = query.filter(and_(AuditLog.timestamp >= start_date, AuditLog.timestamp <= end_date))
-        
-        if user_id is not None:
-            query = query.filter(AuditLog.user_id == user_id)
-        
-        if action:
-            query = query.filter(AuditLog.action == action)
-        
-        if resource:
-            query = query.filter(AuditLog.resource == resource)
-        
-        if resource_id is not None:
-            query = query.filter(AuditLog.resource_id == resource_id)
-        
-        return query.order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        return self.get_logs_page(
+            limit, after, before, skip,
+            start_date=start_date, end_date=end_date, user_id=user_id,
+            action=action, resource=resource, resource_id=resource_id
+        )['items']
+
+
+
+class AsyncAuditRepository:
+    """
+    Repositorio async para operaciones de auditoría.
+
+    Las consultas de páginas y conteos simples se ejecutan con await; las
+    estadísticas, la purga y los totales por estrategia reutilizan la lógica
+    síncrona de AuditRepository mediante run_sync sobre la misma conexión
+    async, sin bloquear el event loop.
+    """
+    
+    filter_conditions = staticmethod(AuditRepository.filter_conditions)
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_log(self, user_id: Optional[int], action: str, resource: str,
+                         resource_id: Optional[int] = None, ip_address: Optional[str] = None,
+                         user_agent: Optional[str] = None, details: Optional[str] = None,
+                         durable: Optional[bool] = None) -> AuditLog:
+        """Crear log de auditoría (mismas reglas que AuditRepository.create_log)"""
+        event, deferred = _defer_event(user_id, action, resource, resource_id, ip_address,
+                                       user_agent, details, durable)
+        if deferred is not None:
+            return deferred
+
+        db_log = AuditLog(**event)
+        self.db.add(db_log)
+        await self.db.commit()
+        await self.db.refresh(db_log)
+        audit_events_written_counter.labels(mode="inline").inc()
+        return db_log
+    
+    async def paginate(self, statement, limit: int = 100, after: Optional[str] = None,
+                       before: Optional[str] = None, skip: int = 0) -> Dict:
+        """Paginar un select de AuditLog (como AuditRepository.paginate)"""
+        statement, ascending = _page_query(statement, limit, after, before, skip)
+        rows = list((await self.db.execute(statement)).scalars().all())
+        return _page_result(rows, limit, after, before, skip, ascending)
+    
+    def _filtered_statement(self, **filters):
+        """Construir el select de logs con los filtros presentes"""
+        return select(AuditLog).where(*self.filter_conditions(**filters))
+    
+    async def get_logs_page(self, limit: int = 100, after: Optional[str] = None,
+                            before: Optional[str] = None, skip: int = 0, **filters) -> Dict:
+        """Obtener una página de logs con filtros opcionales"""
+        return await self.paginate(self._filtered_statement(**filters), limit=limit,
+                                   after=after, before=before, skip=skip)
+    
+    async def get_logs(self, skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                       before: Optional[str] = None) -> List[AuditLog]:
+        """Obtener logs de auditoría"""
+        return (await self.get_logs_page(limit, after, before, skip))['items']
+    
+    async def get_logs_filtered(self, start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None,
+                                user_id: Optional[int] = None,
+                                action: Optional[str] = None,
+                                resource: Optional[str] = None,
+                                resource_id: Optional[int] = None,
+                                skip: int = 0,
+                                limit: int = 100,
+                                after: Optional[str] = None,
+                                before: Optional[str] = None) -> List[AuditLog]:
+        """Obtener logs de auditoría con múltiples filtros"""
+        return (await self.get_logs_page(
+            limit, after, before, skip,
+            start_date=start_date, end_date=end_date, user_id=user_id,
+            action=action, resource=resource, resource_id=resource_id
+        ))['items']
+    
+    async def get_stats(self, days: int = 30) -> Dict:
+        """Obtener estadísticas de auditoría (ver AuditRepository.get_stats)"""
+        return await self.db.run_sync(lambda session: AuditRepository(session).get_stats(days))
+    
+    async def purge_before(self, cutoff: datetime, dry_run: bool = True) -> Dict:
+        """Eliminar logs anteriores a cutoff (ver AuditRepository.purge_before)"""
+        return await self.db.run_sync(
+            lambda session: AuditRepository(session).purge_before(cutoff, dry_run=dry_run)
+        )
+    
+    async def count(self) -> int:
+        """Contar total de logs"""
+        return await self.count_filtered()
+    
+    async def count_filtered(self, **filters) -> int:
+        """Contar logs con los mismos filtros que get_logs_page"""
+        return (await self.db.execute(
+            select(func.count()).select_from(AuditLog).where(*self.filter_conditions(**filters))
+        )).scalar()
+    
+    async def count_page_total(self, page: Dict, strategy: CountStrategy = CountStrategy.EXACT,
+                               skip: int = 0, **filters) -> CountResult:
+        """Total de una página de get_logs_page (ver AuditRepository.count_page_total)"""
+        return await self.db.run_sync(
+            lambda session: AuditRepository(session).count_page_total(page, strategy, skip=skip, **filters)
+        )
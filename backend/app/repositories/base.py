@@ -2,6 +2,8 @@
 Repositorio base con operaciones CRUD genéricas.
 """
 
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import TypeVar, Generic, Type, Optional, List, Any
 from pydantic import BaseModel
@@ -55,3 +57,63 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def count(self) -> int:
         """Contar registros"""
         return self.db.query(self.model).count()
+
+
+class AsyncBaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """Repositorio base async con las mismas operaciones CRUD que BaseRepository"""
+    
+    def __init__(self, model: Type[ModelType], db: AsyncSession):
+        self.model = model
+        self.db = db
+    
+    async def first(self, statement) -> Optional[Any]:
+        """Primer objeto de una consulta select o None"""
+        return (await self.db.execute(statement.limit(1))).scalars().first()
+    
+    async def all(self, statement) -> List[Any]:
+        """Todos los objetos de una consulta select"""
+        return list((await self.db.execute(statement)).scalars().all())
+    
+    async def scalar(self, statement) -> Any:
+        """Valor escalar de una consulta (p. ej. un COUNT)"""
+        return (await self.db.execute(statement)).scalar()
+    
+    async def get(self, id: Any) -> Optional[ModelType]:
+        """Obtener por ID"""
+        return await self.first(select(self.model).where(self.model.id == id))
+    
+    async def get_multi(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
+        """Obtener múltiples registros"""
+        return await self.all(select(self.model).offset(skip).limit(limit))
+    
+    async def save(self, db_obj: ModelType) -> ModelType:
+        """Confirmar los cambios y recargar el objeto (valores por defecto del servidor)"""
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        return db_obj
+    
+    async def create(self, obj_in: CreateSchemaType) -> ModelType:
+        """Crear nuevo registro"""
+        obj_in_data = obj_in.dict()
+        db_obj = self.model(**obj_in_data)
+        self.db.add(db_obj)
+        return await self.save(db_obj)
+    
+    async def update(self, db_obj: ModelType, obj_in: UpdateSchemaType) -> ModelType:
+        """Actualizar registro existente"""
+        obj_data = obj_in.dict(exclude_unset=True)
+        for field, value in obj_data.items():
+            setattr(db_obj, field, value)
+        return await self.save(db_obj)
+    
+    async def delete(self, id: Any) -> Optional[ModelType]:
+        """Eliminar registro"""
+        obj = await self.db.get(self.model, id)
+        if obj:
+            await self.db.delete(obj)
+            await self.db.commit()
+        return obj
+    
+    async def count(self) -> int:
+        """Contar registros"""
+        return await self.scalar(select(func.count()).select_from(self.model))
@@ -2,11 +2,97 @@
 Repositorio para operaciones de personas.
 """
 
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+from typing import Optional, List, Tuple
 from app.models.person import Person
 from app.schemas.person import PersonCreate, PersonUpdate
-from app.repositories.base import BaseRepository
+from app.repositories.base import AsyncBaseRepository, BaseRepository
+
+
+def _rut_conditions(rut: str):
+    """
+    Condición de búsqueda por RUT en claro: índice único de rut_hash o, para
+    filas en formato siv, índice único de rut_data con el valor AES-SIV del RUT
+    """
+    from app.core.security_service import SecurityService
+    
+    return or_(
+        Person.rut_hash == SecurityService.hash_rut(rut),
+        Person.rut_data.in_(SecurityService.rut_lookup_values(rut)),
+    )
+
+
+def _name_conditions(nombre: str = None, apellido: str = None) -> List:
+    """Condiciones de búsqueda por nombre y/o apellido"""
+    conditions = []
+    if nombre:
+        conditions.append(Person.nombre.ilike(f"%{nombre}%"))
+    if apellido:
+        conditions.append(Person.apellido.ilike(f"%{apellido}%"))
+    return conditions
+
+
+def _new_person(person_data: PersonCreate, created_by: int,
+                religion_digest: Optional[Tuple[str, str]] = None) -> Person:
+    """
+    Persona nueva con el RUT encriptado y los hashes calculados.
+
+    religion_digest es el (hash, salt) de la religión ya calculado fuera del
+    event loop; si no se entrega se calcula aquí.
+    """
+    db_person = Person(
+        nombre=person_data.nombre,
+        apellido=person_data.apellido,
+        email=person_data.email,
+        telefono=person_data.telefono,
+        direccion=person_data.direccion,
+        fecha_nacimiento=person_data.fecha_nacimiento,
+        created_by=created_by
+    )
+    
+    # Encriptar el RUT antes de almacenarlo
+    db_person.set_rut(person_data.rut)
+    
+    # Generar hashes (usar RUT original sin encriptar para el hash)
+    db_person.set_rut_hash(person_data.rut)
+    if religion_digest is not None:
+        db_person.religion_hash, db_person.religion_salt = religion_digest
+    else:
+        db_person.set_religion_hash(person_data.religion)
+    
+    return db_person
+
+
+def _apply_person_update(db_person: Person, person_data: PersonUpdate,
+                         religion_digest: Optional[Tuple[str, str]] = None) -> None:
+    """Aplicar los campos presentes de person_data (religion_digest como en _new_person)"""
+    # Importar la caché de RUT
+    from app.services.rut_display import invalidate_display_rut
+    
+    update_data = person_data.dict(exclude_unset=True)
+    
+    # Actualizar campos básicos
+    for field, value in update_data.items():
+        if field not in ['rut', 'religion']:
+            setattr(db_person, field, value)
+    
+    # Actualizar RUT si se proporciona
+    if 'rut' in update_data:
+        # Descartar el RUT anterior de la caché de RUT desencriptados
+        invalidate_display_rut(db_person.encrypted_rut)
+        # Encriptar el nuevo RUT
+        db_person.set_rut(update_data['rut'])
+        # Generar nuevo hash usando el RUT original
+        db_person.set_rut_hash(update_data['rut'])
+    
+    # Actualizar religión si se proporciona
+    if 'religion' in update_data:
+        if religion_digest is not None:
+            db_person.religion_hash, db_person.religion_salt = religion_digest
+        else:
+            db_person.set_religion_hash(update_data['religion'])
 
 
 class PersonRepository(BaseRepository[Person, PersonCreate, PersonUpdate]):
@@ -19,73 +105,39 @@ class PersonRepository(BaseRepository[Person, PersonCreate, PersonUpdate]):
         """Obtener persona por hash de RUT"""
         return self.db.query(Person).filter(Person.rut_hash == rut_hash).first()
     
+    def get_by_rut(self, rut: str) -> Optional[Person]:
+        """Obtener persona por RUT en claro (índice ciego o valor AES-SIV)"""
+        return self.db.query(Person).filter(_rut_conditions(rut)).first()
+    
+    def search_by_name_query(self, nombre: str = None, apellido: str = None) -> Query:
+        """Consulta sin paginar de personas por nombre y/o apellido"""
+        return self.db.query(Person).filter(*_name_conditions(nombre, apellido))
+    
     def search_by_name(self, nombre: str = None, apellido: str = None, skip: int = 0, limit: int = 100) -> List[Person]:
         """Buscar personas por nombre y/o apellido"""
-        query = self.db.query(Person)
-        
-        if nombre:
-            query = query.filter(Person.nombre.ilike(f"%{nombre}%"))
-        if apellido:
-            query = query.filter(Person.apellido.ilike(f"%{apellido}%"))
-        
-        return query.offset(skip).limit(limit).all()
+        return self.search_by_name_query(nombre, apellido).offset(skip).limit(limit).all()
+    
+    def created_by_query(self, created_by: int) -> Query:
+        """Consulta sin paginar de personas creadas por un usuario"""
+        return self.db.query(Person).filter(Person.created_by == created_by)
     
     def get_by_created_by(self, created_by: int, skip: int = 0, limit: int = 100) -> List[Person]:
         """Obtener personas creadas por un usuario específico"""
-        return self.db.query(Person).filter(Person.created_by == created_by).offset(skip).limit(limit).all()
+        return self.created_by_query(created_by).offset(skip).limit(limit).all()
     
-    def create_person(self, person_data: PersonCreate, created_by: int) -> Person:
-        """Crear nueva persona"""
-        # Importar el servicio de seguridad
-        from app.core.security_service import SecurityService
-        
-        # Encriptar el RUT antes de almacenarlo
-        encrypted_rut = SecurityService.encrypt_rut(person_data.rut)
-        
-        db_person = Person(
-            rut=encrypted_rut,  # Usar RUT encriptado
-            nombre=person_data.nombre,
-            apellido=person_data.apellido,
-            email=person_data.email,
-            telefono=person_data.telefono,
-            direccion=person_data.direccion,
-            fecha_nacimiento=person_data.fecha_nacimiento,
-            created_by=created_by
-        )
-        
-        # Generar hashes (usar RUT original sin encriptar para el hash)
-        db_person.set_rut_hash(person_data.rut)
-        db_person.set_religion_hash(person_data.religion)
-        
+    def create_person(self, person_data: PersonCreate, created_by: int,
+                      religion_digest: Optional[Tuple[str, str]] = None) -> Person:
+        """Crear nueva persona (religion_digest como en _new_person)"""
+        db_person = _new_person(person_data, created_by, religion_digest)
         self.db.add(db_person)
         self.db.commit()
         self.db.refresh(db_person)
         return db_person
     
-    def update_person(self, db_person: Person, person_data: PersonUpdate) -> Person:
-        """Actualizar persona existente"""
-        # Importar el servicio de seguridad
-        from app.core.security_service import SecurityService
-        
-        update_data = person_data.dict(exclude_unset=True)
-        
-        # Actualizar campos básicos
-        for field, value in update_data.items():
-            if field not in ['rut', 'religion']:
-                setattr(db_person, field, value)
-        
-        # Actualizar RUT si se proporciona
-        if 'rut' in update_data:
-            # Encriptar el nuevo RUT
-            encrypted_rut = SecurityService.encrypt_rut(update_data['rut'])
-            db_person.rut = encrypted_rut
-            # Generar nuevo hash usando el RUT original
-            db_person.set_rut_hash(update_data['rut'])
-        
-        # Actualizar religión si se proporciona
-        if 'religion' in update_data:
-            db_person.set_religion_hash(update_data['religion'])
-        
+    def update_person(self, db_person: Person, person_data: PersonUpdate,
+                      religion_digest: Optional[Tuple[str, str]] = None) -> Person:
+        """Actualizar persona existente (religion_digest como en _new_person)"""
+        _apply_person_update(db_person, person_data, religion_digest)
         self.db.commit()
         self.db.refresh(db_person)
         return db_person
@@ -93,3 +145,74 @@ class PersonRepository(BaseRepository[Person, PersonCreate, PersonUpdate]):
     def count_by_created_by(self, created_by: int) -> int:
         """Contar personas creadas por un usuario específico"""
         return self.db.query(Person).filter(Person.created_by == created_by).count()
+    
+    def delete(self, id: int) -> Optional[Person]:
+        """Eliminar persona y descartar su RUT de la caché de RUT desencriptados"""
+        from app.services.rut_display import invalidate_display_rut
+        
+        person = self.get(id)
+        if person is None:
+            return None
+        encrypted_rut = person.encrypted_rut
+        super().delete(id)
+        invalidate_display_rut(encrypted_rut)
+        return person
+
+
+class AsyncPersonRepository(AsyncBaseRepository[Person, PersonCreate, PersonUpdate]):
+    """Repositorio async para operaciones de personas"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(Person, db)
+    
+    async def get_by_rut_hash(self, rut_hash: str) -> Optional[Person]:
+        """Obtener persona por hash de RUT"""
+        return await self.first(select(Person).where(Person.rut_hash == rut_hash))
+    
+    async def get_by_rut(self, rut: str) -> Optional[Person]:
+        """Obtener persona por RUT en claro (índice ciego o valor AES-SIV)"""
+        return await self.first(select(Person).where(_rut_conditions(rut)))
+    
+    async def search_by_name(self, nombre: str = None, apellido: str = None, skip: int = 0, limit: int = 100) -> List[Person]:
+        """Buscar personas por nombre y/o apellido"""
+        return await self.all(
+            select(Person).where(*_name_conditions(nombre, apellido)).offset(skip).limit(limit)
+        )
+    
+    async def get_by_created_by(self, created_by: int, skip: int = 0, limit: int = 100) -> List[Person]:
+        """Obtener personas creadas por un usuario específico"""
+        return await self.all(
+            select(Person).where(Person.created_by == created_by).offset(skip).limit(limit)
+        )
+    
+    async def create_person(self, person_data: PersonCreate, created_by: int,
+                            religion_digest: Optional[Tuple[str, str]] = None) -> Person:
+        """Crear nueva persona (religion_digest como en _new_person)"""
+        db_person = _new_person(person_data, created_by, religion_digest)
+        self.db.add(db_person)
+        return await self.save(db_person)
+    
+    async def update_person(self, db_person: Person, person_data: PersonUpdate,
+                            religion_digest: Optional[Tuple[str, str]] = None) -> Person:
+        """Actualizar persona existente (religion_digest como en _new_person)"""
+        _apply_person_update(db_person, person_data, religion_digest)
+        return await self.save(db_person)
+    
+    async def count_by_created_by(self, created_by: int) -> int:
+        """Contar personas creadas por un usuario específico"""
+        return await self.scalar(
+            select(func.count()).select_from(Person).where(Person.created_by == created_by)
+        )
+    
+    async def delete(self, id: int) -> Optional[Person]:
+        """Eliminar persona y descartar su RUT de la caché de RUT desencriptados"""
+        from app.services.rut_display import invalidate_display_rut
+        
+        person = await self.get(id)
+        if person is None:
+            return None
+        encrypted_rut = person.encrypted_rut
+        await self.db.delete(person)
+        await self.db.commit()
+        invalidate_display_rut(encrypted_rut)
+        return person
@@ -2,11 +2,23 @@
 Repositorio para operaciones de usuarios.
 """
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, Iterable, Dict, List
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.repositories.base import BaseRepository
+from app.repositories.base import AsyncBaseRepository, BaseRepository
+
+
+def _new_user(user_data: UserCreate, hashed_password: str) -> User:
+    """Usuario nuevo con la contraseña ya hasheada"""
+    return User(
+        email=user_data.email,
+        hashed_password=hashed_password,
+        is_active=user_data.is_active,
+        is_admin=user_data.is_admin
+    )
 
 
 class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
@@ -19,18 +31,20 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
         """Obtener usuario por email"""
         return self.db.query(User).filter(User.email == email).first()
     
+    def get_emails(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Obtener los emails de varios usuarios con una sola consulta IN"""
+        ids = set(user_ids)
+        if not ids:
+            return {}
+        return dict(self.db.query(User.id, User.email).filter(User.id.in_(ids)).all())
+    
     def get_active_users(self, skip: int = 0, limit: int = 100):
         """Obtener usuarios activos"""
         return self.db.query(User).filter(User.is_active == True).offset(skip).limit(limit).all()
     
     def create_user(self, user_data: UserCreate, hashed_password: str) -> User:
         """Crear nuevo usuario con contraseña hasheada"""
-        db_user = User(
-            email=user_data.email,
-            hashed_password=hashed_password,
-            is_active=user_data.is_active,
-            is_admin=user_data.is_admin
-        )
+        db_user = _new_user(user_data, hashed_password)
         self.db.add(db_user)
         self.db.commit()
         self.db.refresh(db_user)
@@ -64,3 +78,53 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
         self.db.commit()
         self.db.refresh(user)
         return user
+
+
+class AsyncUserRepository(AsyncBaseRepository[User, UserCreate, UserUpdate]):
+    """Repositorio async para operaciones de usuarios"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(User, db)
+    
+    async def get_by_email(self, email: str) -> Optional[User]:
+        """Obtener usuario por email"""
+        return await self.first(select(User).where(User.email == email))
+    
+    async def get_emails(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Obtener los emails de varios usuarios con una sola consulta IN"""
+        ids = set(user_ids)
+        if not ids:
+            return {}
+        result = await self.db.execute(select(User.id, User.email).where(User.id.in_(ids)))
+        return dict(result.all())
+    
+    async def get_active_users(self, skip: int = 0, limit: int = 100) -> List[User]:
+        """Obtener usuarios activos"""
+        return await self.all(select(User).where(User.is_active == True).offset(skip).limit(limit))
+    
+    async def create_user(self, user_data: UserCreate, hashed_password: str) -> User:
+        """Crear nuevo usuario con contraseña hasheada"""
+        db_user = _new_user(user_data, hashed_password)
+        self.db.add(db_user)
+        return await self.save(db_user)
+    
+    async def update_password(self, user: User, hashed_password: str) -> User:
+        """Actualizar contraseña de usuario"""
+        user.hashed_password = hashed_password
+        return await self.save(user)
+    
+    async def increment_login_attempts(self, user: User) -> User:
+        """Incrementar intentos de login fallidos"""
+        user.login_attempts += 1
+        return await self.save(user)
+    
+    async def reset_login_attempts(self, user: User) -> User:
+        """Resetear intentos de login fallidos"""
+        user.login_attempts = 0
+        user.locked_until = None
+        return await self.save(user)
+    
+    async def lock_user(self, user: User, locked_until) -> User:
+        """Bloquear usuario temporalmente"""
+        user.locked_until = locked_until
+        return await self.save(user)
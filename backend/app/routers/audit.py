@@ -1,15 +1,18 @@
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 
-from app.db.database import get_db
+from app.db.database import get_async_db, get_session_scope
 from app.models.audit_log import AuditLog
 from app.models.user import User
 from app.schemas.audit import AuditLogResponse, AuditLogStatsResponse
 from app.services.audit import AuditService
+from app.services.user_emails import resolve_user_emails
+from app.repositories.audit import AsyncAuditRepository
 from app.deps.auth import get_current_user
+from app.utils.cursor import decode_cursor
 
 
 def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
@@ -33,7 +36,9 @@ async def get_audit_logs(
     user_id: Optional[int] = Query(None, description="Filtrar por ID de usuario"),
     start_date: Optional[datetime] = Query(None, description="Fecha de inicio (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="Fecha de fin (ISO format)"),
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Cursor: logs más antiguos que este (reemplaza skip)"),
+    before: Optional[str] = Query(None, description="Cursor: logs más recientes que este"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -42,45 +47,57 @@ async def get_audit_logs(
     """
     audit_service = AuditService(db)
     
-    # Construir query base
-    query = db.query(AuditLog)
+    # Validar cursores de paginación keyset
+    if after and before:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use solo uno de los parámetros after o before"
+        )
+    try:
+        for cursor in (after, before):
+            if cursor:
+                decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+    
+    # Construir filtros
+    conditions = []
     
-    # Aplicar filtros
     if action:
-        query = query.filter(AuditLog.action.ilike(f"%{action}%"))
+        conditions.append(AuditLog.action.ilike(f"%{action}%"))
     
     if resource:
-        query = query.filter(AuditLog.resource.ilike(f"%{resource}%"))
+        conditions.append(AuditLog.resource.ilike(f"%{resource}%"))
     
     if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
+        conditions.append(AuditLog.user_id == user_id)
     
     if start_date:
-        query = query.filter(AuditLog.timestamp >= start_date)
+        conditions.append(AuditLog.timestamp >= start_date)
     
     if end_date:
-        query = query.filter(AuditLog.timestamp <= end_date)
+        conditions.append(AuditLog.timestamp <= end_date)
     
     # Obtener total para paginación
-    total = query.count()
+    total = (await db.execute(select(func.count()).select_from(AuditLog).where(*conditions))).scalar()
     
-    # Aplicar ordenamiento y paginación
-    logs = query.order_by(desc(AuditLog.timestamp)).offset(skip).limit(limit).all()
+    # Aplicar ordenamiento y paginación (keyset si hay cursor, offset en caso contrario)
+    page = await AsyncAuditRepository(db).paginate(
+        select(AuditLog).where(*conditions), limit=limit, after=after, before=before, skip=skip
+    )
+    logs = page['items']
     
-    # Convertir a formato de respuesta
+    # Convertir a formato de respuesta (emails de la página en una sola consulta)
+    emails = await resolve_user_emails(db, (log.user_id for log in logs))
     log_responses = []
     for log in logs:
-        # Obtener información del usuario si existe
-        user_email = None
-        if log.user_id:
-            user = db.query(User).filter(User.id == log.user_id).first()
-            if user:
-                user_email = user.email
-        
         log_response = AuditLogResponse(
             id=log.id,
             user_id=log.user_id,
-            user_email=user_email,
+            user_email=emails.get(log.user_id),
             action=log.action,
             resource=log.resource,
             resource_id=log.resource_id,
@@ -92,7 +109,7 @@ async def get_audit_logs(
         log_responses.append(log_response)
     
     # Log de auditoría para esta consulta
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="READ",
         resource="audit_logs",
@@ -104,6 +121,8 @@ async def get_audit_logs(
         "total": total,
         "skip": skip,
         "limit": limit,
+        "next_cursor": page['next_cursor'],
+        "prev_cursor": page['prev_cursor'],
         "filters": {
             "action": action,
             "resource": resource,
@@ -117,7 +136,7 @@ async def get_audit_logs(
 @router.get("/stats", response_model=AuditLogStatsResponse)
 async def get_audit_stats(
     days: int = Query(30, ge=1, le=365, description="Número de días para las estadísticas"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -126,74 +145,25 @@ async def get_audit_stats(
     """
     audit_service = AuditService(db)
     
-    # Calcular fecha de inicio
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Query base para el período
-    base_query = db.query(AuditLog).filter(AuditLog.timestamp >= start_date)
-    
-    # Total de acciones en el período
-    total_actions = base_query.count()
-    
-    # Acciones por tipo
-    actions_by_type = base_query.with_entities(
-        AuditLog.action,
-        func.count(AuditLog.id).label('count')
-    ).group_by(AuditLog.action).all()
-    
-    actions_stats = {action: count for action, count in actions_by_type}
-    
-    # Acciones por recurso
-    resources_by_type = base_query.with_entities(
-        AuditLog.resource,
-        func.count(AuditLog.id).label('count')
-    ).group_by(AuditLog.resource).all()
-    
-    resources_stats = {resource: count for resource, count in resources_by_type}
-    
-    # Usuarios más activos
-    active_users = base_query.filter(AuditLog.user_id.isnot(None)).with_entities(
-        AuditLog.user_id,
-        func.count(AuditLog.id).label('count')
-    ).group_by(AuditLog.user_id).order_by(desc('count')).limit(10).all()
+    # Estadísticas desde los agregados horarios (audit_stats_hourly)
+    stats = await AsyncAuditRepository(db).get_stats(days)
     
     # Obtener información de usuarios
+    emails = await resolve_user_emails(db, (u['user_id'] for u in stats['most_active_users']))
     users_stats = []
-    for user_id, count in active_users:
-        user = db.query(User).filter(User.id == user_id).first()
+    for user_stats in stats['most_active_users']:
         users_stats.append({
-            "user_id": user_id,
-            "user_email": user.email if user else f"Usuario {user_id}",
-            "actions_count": count
+            "user_id": user_stats['user_id'],
+            "user_email": emails.get(user_stats['user_id']) or f"Usuario {user_stats['user_id']}",
+            "actions_count": user_stats['actions_count']
         })
     
-    # IPs más frecuentes
-    frequent_ips = base_query.filter(AuditLog.ip_address.isnot(None)).with_entities(
-        AuditLog.ip_address,
-        func.count(AuditLog.id).label('count')
-    ).group_by(AuditLog.ip_address).order_by(desc('count')).limit(10).all()
-    
-    ips_stats = [{"ip": ip, "count": count} for ip, count in frequent_ips]
-    
     # Acciones por día (últimos 7 días para el gráfico)
-    last_week = datetime.utcnow() - timedelta(days=7)
-    daily_actions = base_query.filter(AuditLog.timestamp >= last_week).with_entities(
-        func.date(AuditLog.timestamp).label('date'),
-        func.count(AuditLog.id).label('count')
-    ).group_by(func.date(AuditLog.timestamp)).order_by('date').all()
-    
-    daily_stats = [{"date": str(date), "count": count} for date, count in daily_actions]
-    
-    # Acciones por hora del día (promedio)
-    hourly_actions = base_query.with_entities(
-        func.extract('hour', AuditLog.timestamp).label('hour'),
-        func.count(AuditLog.id).label('count')
-    ).group_by(func.extract('hour', AuditLog.timestamp)).order_by('hour').all()
-    
-    hourly_stats = [{"hour": int(hour), "count": count} for hour, count in hourly_actions]
+    last_week = (datetime.utcnow() - timedelta(days=7)).date().isoformat()
+    daily_stats = [day for day in stats['daily_actions'] if day['date'] >= last_week]
     
     # Log de auditoría para esta consulta
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="READ",
         resource="audit_stats",
@@ -202,135 +172,101 @@ async def get_audit_stats(
     
     return AuditLogStatsResponse(
         period_days=days,
-        start_date=start_date,
-        end_date=datetime.utcnow(),
-        total_actions=total_actions,
-        actions_by_type=actions_stats,
-        resources_by_type=resources_stats,
+        start_date=stats['start_date'],
+        end_date=stats['end_date'],
+        total_actions=stats['total_actions'],
+        actions_by_type=stats['actions_by_type'],
+        resources_by_type=stats['resources_by_type'],
         most_active_users=users_stats,
-        frequent_ips=ips_stats,
+        frequent_ips=stats['frequent_ips'],
         daily_actions=daily_stats,
-        hourly_distribution=hourly_stats
+        hourly_distribution=stats['hourly_distribution']
     )
 
 
 @router.get("/actions", response_model=List[str])
 async def get_available_actions(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
     Obtener lista de tipos de acciones disponibles
     """
-    actions = db.query(AuditLog.action).distinct().all()
+    actions = (await db.execute(select(AuditLog.action).distinct())).all()
     return [action[0] for action in actions if action[0]]
 
 
 @router.get("/resources", response_model=List[str])
 async def get_available_resources(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
     Obtener lista de recursos disponibles
     """
-    resources = db.query(AuditLog.resource).distinct().all()
+    resources = (await db.execute(select(AuditLog.resource).distinct())).all()
     return [resource[0] for resource in resources if resource[0]]
 
 
 @router.get("/export")
 async def export_audit_logs(
-    format: str = Query("csv", regex="^(csv|json)$", description="Formato de exportación"),
+    format: str = Query("csv", regex="^(csv|ndjson|json|arrow|parquet)$", description="Formato de exportación"),
     start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
     end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
     action: Optional[str] = Query(None, description="Filtrar por acción"),
     resource: Optional[str] = Query(None, description="Filtrar por recurso"),
-    db: Session = Depends(get_db),
+    user_id: Optional[int] = Query(None, description="Filtrar por ID de usuario"),
+    db: AsyncSession = Depends(get_async_db),
+    session_scope: Callable = Depends(get_session_scope),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
-    Exportar logs de auditoría en CSV o JSON
+    Exportar logs de auditoría en CSV, NDJSON, JSON, Arrow IPC o Parquet
+    Las filas se transmiten por bloques, sin límite de cantidad
     """
-    from fastapi.responses import StreamingResponse
-    import csv
-    import json
-    from io import StringIO
+    from app.services.audit_export import (
+        COLUMNAR_FORMATS, columnar_available, export_statement, export_response
+    )
     
-    audit_service = AuditService(db)
+    if format in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="La exportación columnar requiere el paquete pyarrow"
+        )
     
-    # Construir query
-    query = db.query(AuditLog)
+    audit_service = AuditService(db)
     
+    # Construir filtros
+    conditions = []
     if start_date:
-        query = query.filter(AuditLog.timestamp >= start_date)
+        conditions.append(AuditLog.timestamp >= start_date)
     if end_date:
-        query = query.filter(AuditLog.timestamp <= end_date)
+        conditions.append(AuditLog.timestamp <= end_date)
     if action:
-        query = query.filter(AuditLog.action.ilike(f"%{action}%"))
+        conditions.append(AuditLog.action.ilike(f"%{action}%"))
     if resource:
-        query = query.filter(AuditLog.resource.ilike(f"%{resource}%"))
-    
-    logs = query.order_by(desc(AuditLog.timestamp)).all()
+        conditions.append(AuditLog.resource.ilike(f"%{resource}%"))
+    if user_id:
+        conditions.append(AuditLog.user_id == user_id)
     
     # Log de auditoría para exportación
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="EXPORT",
         resource="audit_logs",
-        details=f"Exportación en formato {format} ({len(logs)} registros)"
+        details=f"Exportación en formato {format} (acción: {action}, recurso: {resource}, "
+                f"usuario: {user_id}, desde: {start_date}, hasta: {end_date})"
     )
     
-    if format == "csv":
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Headers
-        writer.writerow([
-            "ID", "User ID", "Action", "Resource", "Resource ID",
-            "IP Address", "User Agent", "Details", "Timestamp"
-        ])
-        
-        # Data
-        for log in logs:
-            writer.writerow([
-                log.id, log.user_id, log.action, log.resource, log.resource_id,
-                log.ip_address, log.user_agent, log.details, log.timestamp
-            ])
-        
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-        )
-    
-    else:  # JSON
-        data = []
-        for log in logs:
-            data.append({
-                "id": log.id,
-                "user_id": log.user_id,
-                "action": log.action,
-                "resource": log.resource,
-                "resource_id": log.resource_id,
-                "ip_address": log.ip_address,
-                "user_agent": log.user_agent,
-                "details": log.details,
-                "timestamp": log.timestamp.isoformat() if log.timestamp else None
-            })
-        
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        return StreamingResponse(
-            iter([json_str]),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"}
-        )
+    headers = ["ID", "User ID", "Action", "Resource", "Resource ID",
+               "IP Address", "User Agent", "Details", "Timestamp"]
+    return export_response(export_statement(conditions), format, headers, session_scope)
 
 
 @router.delete("/logs/{log_id}")
 async def delete_audit_log(
     log_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -339,7 +275,7 @@ async def delete_audit_log(
     """
     audit_service = AuditService(db)
     
-    log = db.query(AuditLog).filter(AuditLog.id == log_id).first()
+    log = await db.get(AuditLog, log_id)
     if not log:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -347,7 +283,7 @@ async def delete_audit_log(
         )
     
     # Log de auditoría antes de eliminar
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="DELETE",
         resource="audit_logs",
@@ -355,8 +291,8 @@ async def delete_audit_log(
         details=f"Eliminación de log: {log.action} en {log.resource}"
     )
     
-    db.delete(log)
-    db.commit()
+    await db.delete(log)
+    await db.commit()
     
     return {"message": "Log de auditoría eliminado exitosamente"}
 
@@ -365,7 +301,7 @@ async def delete_audit_log(
 async def cleanup_old_logs(
     days_to_keep: int = Query(90, ge=30, le=3650, description="Días de logs a mantener"),
     dry_run: bool = Query(True, description="Simulación sin eliminar datos"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -376,39 +312,46 @@ async def cleanup_old_logs(
     
     cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
     
-    # Contar logs que serían eliminados
-    old_logs_count = db.query(AuditLog).filter(AuditLog.timestamp < cutoff_date).count()
+    # Con audit_logs particionada se eliminan particiones mensuales completas
+    # y el conteo proviene de las estadísticas de cada partición
+    result = await AsyncAuditRepository(db).purge_before(cutoff_date, dry_run=dry_run)
+    effective_cutoff = result['effective_cutoff']
     
     if dry_run:
         # Solo simulación
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="SIMULATE_CLEANUP",
             resource="audit_logs",
-            details=f"Simulación de limpieza: {old_logs_count} logs serían eliminados (>{days_to_keep} días)"
+            details=f"Simulación de limpieza: {result['rows']} logs serían eliminados (>{days_to_keep} días)"
         )
         
         return {
             "message": "Simulación de limpieza completada",
-            "logs_to_delete": old_logs_count,
+            "logs_to_delete": result['rows'],
+            "count_is_estimate": result['rows_are_estimate'],
+            "strategy": result['strategy'],
+            "partitions": result['partitions'],
             "cutoff_date": cutoff_date.isoformat(),
+            "effective_cutoff": effective_cutoff.isoformat() if effective_cutoff else None,
             "dry_run": True
         }
     else:
-        # Eliminación real
-        deleted_count = db.query(AuditLog).filter(AuditLog.timestamp < cutoff_date).delete()
-        db.commit()
-        
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="CLEANUP",
             resource="audit_logs",
-            details=f"Limpieza realizada: {deleted_count} logs eliminados (>{days_to_keep} días)"
+            details=f"Limpieza realizada: {result['rows']} logs eliminados (>{days_to_keep} días, "
+                    f"particiones: {', '.join(result['partitions']) or 'ninguna'})"
         )
         
         return {
             "message": "Limpieza de logs completada",
-            "logs_deleted": deleted_count,
+            "logs_deleted": result['rows'],
+            "count_is_estimate": result['rows_are_estimate'],
+            "strategy": result['strategy'],
+            "partitions": result['partitions'],
             "cutoff_date": cutoff_date.isoformat(),
+            "effective_cutoff": effective_cutoff.isoformat() if effective_cutoff else None,
             "dry_run": False
         }
@@ -1,9 +1,9 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.schemas.user import Token, LoginRequest, UserCreate, UserResponse
 from app.models.user import User
 from app.schemas.common import ApiResponse
@@ -11,8 +11,10 @@ from app.services.user import UserService
 from app.services.auth import AuthService
 from app.core.security_service import SecurityService
 from app.core.security_utils import SecurityUtils
+from app.core.password_hasher import login_duration_histogram
 from app.services.audit import AuditService
-from app.deps.auth import get_current_user
+from app.deps.auth import security, get_current_user
+from app.core.token_revocation import revoke_token
 from app.core.config import settings
 
 
@@ -73,7 +75,7 @@ router = APIRouter()
 async def login(
     request: Request,
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Iniciar sesión en el sistema.
@@ -97,11 +99,12 @@ async def login(
     audit_service = AuditService(db)
     
     # Autenticar usuario
-    user = auth_service.authenticate_user(login_data.email, login_data.password)
+    with login_duration_histogram.time():
+        user = await auth_service.authenticate_user(login_data.email, login_data.password)
     
     if not user:
         # Log de intento fallido
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=None,
             action="LOGIN_FAILED",
             resource="auth",
@@ -124,7 +127,7 @@ async def login(
     )
     
     # Log de login exitoso
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=user.id,
         action="LOGIN_SUCCESS",
         resource="auth",
@@ -190,7 +193,7 @@ async def login(
 async def register(
     request: Request,
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Registrar nuevo usuario"""
     
@@ -204,10 +207,10 @@ async def register(
     
     try:
         # Crear usuario (autoregistro, sin created_by)
-        user = user_service.create_user_direct(user_data)
+        user = await user_service.create_user_direct(user_data)
         
         # Log de registro exitoso
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=user.id,
             action="REGISTER_SUCCESS",
             resource="auth",
@@ -224,7 +227,7 @@ async def register(
         
     except HTTPException as e:
         # Log de registro fallido
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=None,
             action="REGISTER_FAILED",
             resource="auth",
@@ -254,7 +257,7 @@ async def verify_token(current_user: User = Depends(get_current_user)):
 async def refresh_token(
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Renovar token de acceso"""
     
@@ -273,7 +276,7 @@ async def refresh_token(
     )
     
     # Log de renovación
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="TOKEN_REFRESH",
         resource="auth",
@@ -288,8 +291,9 @@ async def refresh_token(
 @router.post("/logout", response_model=ApiResponse)
 async def logout(
     request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Cerrar sesión"""
     
@@ -300,8 +304,11 @@ async def logout(
     # Servicios
     audit_service = AuditService(db)
     
+    # Revocar el token (el logout deja de ser solo un registro de auditoría)
+    await revoke_token(credentials.credentials)
+    
     # Log de logout
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="LOGOUT",
         resource="auth",
@@ -1,16 +1,17 @@
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import math
 
-from app.db.database import get_db
-from app.schemas.person import PersonCreate, PersonUpdate, PersonResponse
+from app.db.database import get_async_db
+from app.schemas.person import PersonCreate, PersonUpdate, PersonResponse, RutMode
 from app.schemas.user import UserResponse
 from app.models.user import User
 from app.schemas.common import ApiResponse, PaginatedResponse
 from app.services.person import PersonService
 from app.services.audit import AuditService
 from app.core.security_service import SecurityService
+from app.core.hash_executor import religion_hash_executor
 from app.deps.auth import get_current_user
 
 
@@ -122,7 +123,7 @@ router = APIRouter()
 async def create_person(
     request: Request,
     person_data: PersonCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -153,11 +154,14 @@ async def create_person(
     audit_service = AuditService(db)
     
     try:
+        # Hash de religión en el executor acotado, fuera del event loop
+        religion_digest = await religion_hash_executor.hash(person_data.religion)
+        
         # Crear persona
-        person = person_service.create_person(person_data, current_user.id)
+        person = await person_service.create_person(person_data, current_user.id, religion_digest=religion_digest)
         
         # Log adicional de auditoría
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="CREATE_PERSON",
             resource="persons",
@@ -179,7 +183,7 @@ async def create_person(
         
     except HTTPException as e:
         # Log de error
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="CREATE_PERSON_FAILED",
             resource="persons",
@@ -196,7 +200,8 @@ async def get_persons(
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Elementos por página"),
     search: Optional[str] = Query(None, description="Término de búsqueda"),
-    db: Session = Depends(get_db),
+    rut_mode: Optional[RutMode] = Query(None, description="RUT en el listado: masked (sin desencriptar) o full; por defecto PERSON_LIST_RUT_MODE"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Obtener lista de personas con paginación y búsqueda"""
@@ -209,11 +214,12 @@ async def get_persons(
     audit_service = AuditService(db)
     
     # Obtener personas
-    persons, total = person_service.get_persons(
+    persons, total = await person_service.get_persons(
         skip=skip,
         limit=per_page,
         search=search,
-        requested_by=current_user.id
+        requested_by=current_user.id,
+        rut_mode=rut_mode
     )
     
     # Debug: Verificar tipo de datos
@@ -232,7 +238,7 @@ async def get_persons(
     client_ip = get_client_ip(request)
     user_agent = get_user_agent(request)
     
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="LIST_PERSONS",
         resource="persons",
@@ -265,7 +271,7 @@ async def get_persons(
 async def get_person(
     request: Request,
     person_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Obtener persona por ID"""
@@ -275,7 +281,7 @@ async def get_person(
     audit_service = AuditService(db)
     
     # Obtener persona
-    person = person_service.get_person_by_id(person_id, current_user.id)
+    person = await person_service.get_person_by_id(person_id, current_user.id)
     
     if not person:
         raise HTTPException(
@@ -287,7 +293,7 @@ async def get_person(
     client_ip = get_client_ip(request)
     user_agent = get_user_agent(request)
     
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="GET_PERSON",
         resource="persons",
@@ -320,7 +326,7 @@ async def update_person(
     request: Request,
     person_id: int,
     person_data: PersonUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Actualizar persona"""
@@ -334,11 +340,14 @@ async def update_person(
     audit_service = AuditService(db)
     
     try:
+        # Hash de religión en el executor acotado, fuera del event loop
+        religion_digest = await religion_hash_executor.hash(person_data.religion) if person_data.religion else None
+        
         # Actualizar persona
-        person = person_service.update_person(person_id, person_data, current_user.id)
+        person = await person_service.update_person(person_id, person_data, current_user.id, religion_digest=religion_digest)
         
         # Log adicional de auditoría
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="UPDATE_PERSON",
             resource="persons",
@@ -360,7 +369,7 @@ async def update_person(
         
     except HTTPException as e:
         # Log de error
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="UPDATE_PERSON_FAILED",
             resource="persons",
@@ -376,7 +385,7 @@ async def update_person(
 async def delete_person(
     request: Request,
     person_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Eliminar persona"""
@@ -391,11 +400,11 @@ async def delete_person(
     
     try:
         # Eliminar persona
-        success = person_service.delete_person(person_id, current_user.id)
+        success = await person_service.delete_person(person_id, current_user.id)
         
         if success:
             # Log adicional de auditoría
-            audit_service.create_audit_log(
+            await audit_service.create_audit_log(
                 user_id=current_user.id,
                 action="DELETE_PERSON",
                 resource="persons",
@@ -417,7 +426,7 @@ async def delete_person(
             
     except HTTPException as e:
         # Log de error
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="DELETE_PERSON_FAILED",
             resource="persons",
@@ -496,7 +505,7 @@ async def delete_person(
 async def search_person_by_rut(
     request: Request,
     rut: str = Query(..., description="RUT de la persona a buscar (formato: XX.XXX.XXX-X o XXXXXXXX-X)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -517,7 +526,7 @@ async def search_person_by_rut(
     audit_service = AuditService(db)
     
     # Buscar persona
-    person = person_service.search_by_rut(rut, current_user.id)
+    person = await person_service.search_by_rut(rut, current_user.id)
     
     if not person:
         raise HTTPException(
@@ -529,7 +538,7 @@ async def search_person_by_rut(
     client_ip = get_client_ip(request)
     user_agent = get_user_agent(request)
     
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="SEARCH_PERSON_BY_RUT",
         resource="persons",
@@ -1,8 +1,8 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.schemas.user import UserResponse, UserCreate, UserUpdate
 from app.models.user import User
 from app.schemas.common import ApiResponse
@@ -60,7 +60,7 @@ router = APIRouter()
 async def create_user(
     request: Request,
     user_data: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Crear nuevo usuario (solo administradores)"""
@@ -75,10 +75,10 @@ async def create_user(
     
     try:
         # Crear usuario
-        user = user_service.create_user(user_data, current_user.id)
+        user = await user_service.create_user(user_data, current_user.id)
         
         # Log adicional de auditoría
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="CREATE_USER",
             resource="users",
@@ -101,7 +101,7 @@ async def create_user(
         
     except HTTPException as e:
         # Log de error
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="CREATE_USER_FAILED",
             resource="users",
@@ -117,7 +117,7 @@ async def get_users(
     request: Request,
     skip: int = Query(0, ge=0, description="Número de elementos a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de elementos"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Obtener lista de usuarios (solo administradores)"""
@@ -127,13 +127,13 @@ async def get_users(
     audit_service = AuditService(db)
     
     # Obtener usuarios
-    users = user_service.get_users(skip=skip, limit=limit)
+    users = await user_service.get_users(skip=skip, limit=limit)
     
     # Log de auditoría
     client_ip = get_client_ip(request)
     user_agent = get_user_agent(request)
     
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="LIST_USERS",
         resource="users",
@@ -149,7 +149,7 @@ async def get_users(
 async def get_user(
     request: Request,
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtener usuario por ID (administradores o el propio usuario)"""
@@ -165,7 +165,7 @@ async def get_user(
     audit_service = AuditService(db)
     
     # Obtener usuario
-    user = user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id)
     
     if not user:
         raise HTTPException(
@@ -177,7 +177,7 @@ async def get_user(
     client_ip = get_client_ip(request)
     user_agent = get_user_agent(request)
     
-    audit_service.create_audit_log(
+    await audit_service.create_audit_log(
         user_id=current_user.id,
         action="GET_USER",
         resource="users",
@@ -195,7 +195,7 @@ async def update_user(
     request: Request,
     user_id: int,
     user_data: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Actualizar usuario (administradores o el propio usuario)"""
@@ -224,10 +224,10 @@ async def update_user(
     
     try:
         # Actualizar usuario
-        user = user_service.update_user(user_id, user_data, current_user.id)
+        user = await user_service.update_user(user_id, user_data, current_user.id)
         
         # Log adicional de auditoría
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="UPDATE_USER",
             resource="users",
@@ -250,7 +250,7 @@ async def update_user(
         
     except HTTPException as e:
         # Log de error
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="UPDATE_USER_FAILED",
             resource="users",
@@ -266,7 +266,7 @@ async def update_user(
 async def delete_user(
     request: Request,
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Eliminar usuario (solo administradores)"""
@@ -288,11 +288,11 @@ async def delete_user(
     
     try:
         # Eliminar usuario
-        success = user_service.delete_user(user_id, current_user.id)
+        success = await user_service.delete_user(user_id, current_user.id)
         
         if success:
             # Log adicional de auditoría
-            audit_service.create_audit_log(
+            await audit_service.create_audit_log(
                 user_id=current_user.id,
                 action="DELETE_USER",
                 resource="users",
@@ -314,7 +314,7 @@ async def delete_user(
             
     except HTTPException as e:
         # Log de error
-        audit_service.create_audit_log(
+        await audit_service.create_audit_log(
             user_id=current_user.id,
             action="DELETE_USER_FAILED",
             resource="users",
@@ -7,6 +7,8 @@ from typing import Optional, List, Any, Union
 from datetime import datetime, date
 import re
 
+from app.core import rut_engine
+
 
 # Funciones de validación de RUT chileno
 
@@ -21,20 +23,7 @@ def validate_rut_format(rut: str) -> bool:
 
 def calculate_rut_dv(rut_number: int) -> str:
     """Calcula el dígito verificador de un RUT"""
-    serie = [2, 3, 4, 5, 6, 7]
-    sum = 0
-    
-    for i in range(len(str(rut_number))):
-        sum += int(str(rut_number)[-1-i]) * serie[i % len(serie)]
-    
-    res = 11 - (sum % 11)
-    
-    if res == 11:
-        return '0'
-    elif res == 10:
-        return 'K'
-    else:
-        return str(res)
+    return rut_engine.check_digit(str(rut_number))
 
 def validate_rut(rut: str) -> bool:
     """Validación completa de RUT chileno: formato y dígito verificador"""
@@ -3,7 +3,7 @@ Importaciones de todos los esquemas para facilitar el acceso.
 """
 
 from app.schemas.user import UserBase, UserCreate, UserUpdate, UserResponse, LoginRequest, Token, TokenData
-from app.schemas.person import PersonBase, PersonCreate, PersonUpdate, PersonResponse, PersonDetailResponse
+from app.schemas.person import PersonBase, PersonCreate, PersonUpdate, PersonResponse, PersonDetailResponse, RutMode
 from app.schemas.audit import AuditLogResponse, AuditLogStatsResponse
 from app.schemas.common import ApiResponse, PaginatedResponse, HealthCheckResponse
 
@@ -11,7 +11,7 @@ __all__ = [
     # User schemas
     "UserBase", "UserCreate", "UserUpdate", "UserResponse", "LoginRequest", "Token", "TokenData",
     # Person schemas
-    "PersonBase", "PersonCreate", "PersonUpdate", "PersonResponse", "PersonDetailResponse",
+    "PersonBase", "PersonCreate", "PersonUpdate", "PersonResponse", "PersonDetailResponse", "RutMode",
     # Audit schemas
     "AuditLogResponse", "AuditLogStatsResponse",
     # Common schemas
@@ -87,3 +87,40 @@ class AuditLogStatsResponse(BaseModel):
                 ]
             }
         }
+
+
+class AuditIngestError(BaseModel):
+    """Error de validación o carga de un evento en la ingesta masiva"""
+    line: Optional[int] = None  # None si el error afecta a todo el lote
+    error: str
+
+
+class AuditIngestBatchResult(BaseModel):
+    """Resultado de un lote de la ingesta masiva"""
+    batch: int
+    accepted: int
+    rejected: int
+    errors: List[AuditIngestError] = []
+
+
+class AuditIngestResponse(BaseModel):
+    """Esquema de respuesta de la ingesta masiva de auditoría"""
+    format: str
+    accepted: int
+    rejected: int
+    batches: List[AuditIngestBatchResult]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "format": "ndjson",
+                "accepted": 9998,
+                "rejected": 2,
+                "batches": [
+                    {"batch": 1, "accepted": 4999, "rejected": 1,
+                     "errors": [{"line": 17, "error": "action: es obligatorio"}]},
+                    {"batch": 2, "accepted": 4999, "rejected": 1,
+                     "errors": [{"line": 6042, "error": "JSON inválido"}]}
+                ]
+            }
+        }
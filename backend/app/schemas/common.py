@@ -23,6 +23,10 @@ class PaginatedResponse(BaseModel):
     pages: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None  # Cursor keyset para la página siguiente (after)
+    prev_cursor: Optional[str] = None  # Cursor keyset para la página anterior (before)
+    total_is_exact: bool = True  # False si total es una estimación o una cota inferior
+    count_strategy: str = "exact"  # Estrategia usada para el total: exact, estimate o lookahead
 
 
 class HealthCheckResponse(BaseModel):
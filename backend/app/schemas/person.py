@@ -5,8 +5,11 @@ Esquemas Pydantic para personas.
 from pydantic import BaseModel, EmailStr, validator, Field
 from typing import Optional
 from datetime import datetime
+from enum import Enum
 import re
 
+from app.core import rut_engine
+
 
 # Lista de religiones válidas
 VALID_RELIGIONS = [
@@ -44,20 +47,7 @@ class PersonBase(BaseModel):
             raise ValueError('Formato de RUT inválido')
         
         # Validar dígito verificador
-        rut_digits = clean_rut[:-1]
-        dv = clean_rut[-1]
-        
-        suma = 0
-        multiplicador = 2
-        
-        for digit in reversed(rut_digits):
-            suma += int(digit) * multiplicador
-            multiplicador = multiplicador + 1 if multiplicador < 7 else 2
-        
-        resto = suma % 11
-        dv_calculado = 'K' if resto == 1 else '0' if resto == 0 else str(11 - resto)
-        
-        if dv != dv_calculado:
+        if not rut_engine.has_valid_check_digit(clean_rut):
             raise ValueError('RUT inválido')
         
         return clean_rut
@@ -128,10 +118,16 @@ class PersonUpdate(BaseModel):
     _validate_telefono = validator('telefono', allow_reuse=True)(PersonBase.__dict__['validate_telefono'])
 
 
+class RutMode(str, Enum):
+    """RUT en los listados de personas"""
+    MASKED = "masked"  # Solo rut_masked, sin desencriptar
+    FULL = "full"  # RUT desencriptado y formateado
+
+
 class PersonResponse(BaseModel):
     """Esquema de respuesta para personas"""
     id: int
-    rut: str = Field(..., description="RUT desencriptado y formateado")
+    rut: Optional[str] = Field(None, description="RUT desencriptado y formateado (None en listados con rut_mode=masked)")
     rut_masked: Optional[str] = Field(None, description="RUT ofuscado para mostrar")
     nombre: str
     apellido: str
@@ -110,7 +110,9 @@ class AuditService:
         details: Optional[str] = None
     ) -> None:
         """Registrar acción en log de auditoría"""
-        log_entry = AuditLog(
+        from app.repositories.audit import AuditRepository
+        
+        AuditRepository(self.db).create_log(
             user_id=user_id,
             action=action,
             resource=resource,
@@ -119,9 +121,6 @@ class AuditService:
             user_agent=user_agent,
             details=details
         )
-        
-        self.db.add(log_entry)
-        self.db.commit()
     
     def get_audit_logs(
         self,
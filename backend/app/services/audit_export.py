@@ -0,0 +1,297 @@
+"""
+Exportación de logs de auditoría en streaming.
+
+Las filas se leen con un cursor del lado del servidor (yield_per) en bloques de
+AUDIT_EXPORT_CHUNK_SIZE y cada bloque se codifica y envía antes de leer el
+siguiente, por lo que la memoria no depende del número de filas exportadas.
+La exportación abre su propia sesión con la fábrica de la petición
+(get_session_scope, que respeta los overrides de get_db): la respuesta sigue
+transmitiéndose después de que termina el manejador de la ruta. Un hilo
+dedicado lee y codifica los bloques y los entrega al event loop por una cola
+acotada, de modo que la sesión síncrona se usa siempre desde el mismo hilo.
+
+Los formatos columnares (arrow: IPC stream, parquet) escriben record batches
+tipados y comprimidos con zstd, con timestamp como timestamp[us, UTC] y
+action/resource codificados como diccionario. Requieren pyarrow, que se
+importa solo al usarlos.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import threading
+from datetime import datetime
+from typing import (
+    AsyncIterator, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+)
+
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.models.audit_log import AuditLog
+
+# Métricas de Prometheus
+audit_export_rows_counter = Counter(
+    'audit_export_rows_total', 'Logs de auditoría exportados', ['format']
+)
+
+EXPORT_COLUMNS = (
+    AuditLog.id,
+    AuditLog.user_id,
+    AuditLog.action,
+    AuditLog.resource,
+    AuditLog.resource_id,
+    AuditLog.ip_address,
+    AuditLog.user_agent,
+    AuditLog.details,
+    AuditLog.timestamp,
+)
+
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+# Bloques codificados que el hilo de exportación adelanta al envío
+EXPORT_QUEUE_SIZE = 4
+
+# Fin de la exportación en la cola
+_DONE = object()
+
+
+def columnar_available() -> bool:
+    """Indica si pyarrow está instalado (necesario para arrow y parquet)"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_statement(conditions: Sequence = ()) -> Select:
+    """Consulta de exportación (columnas planas, sin objetos ORM) en orden cronológico inverso"""
+    return select(*EXPORT_COLUMNS).where(*conditions).order_by(
+        AuditLog.timestamp.desc(), AuditLog.id.desc()
+    )
+
+
+def _row_dict(row) -> Dict:
+    data = dict(zip(EXPORT_FIELDS, row))
+    if data["timestamp"] is not None:
+        data["timestamp"] = data["timestamp"].isoformat()
+    return data
+
+
+def _encode_csv(chunks: Iterable[List], headers: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for rows in chunks:
+        for row in rows:
+            data = _row_dict(row)
+            writer.writerow([data[field] for field in EXPORT_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Encabezados aunque no haya filas
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _encode_ndjson(chunks: Iterable[List]) -> Iterator[str]:
+    for rows in chunks:
+        yield "".join(json.dumps(_row_dict(row), ensure_ascii=False) + "\n" for row in rows)
+
+
+def _encode_json(chunks: Iterable[List]) -> Iterator[str]:
+    yield "["
+    separator = ""
+    for rows in chunks:
+        yield separator + ",".join(json.dumps(_row_dict(row), ensure_ascii=False) for row in rows)
+        separator = ","
+    yield "]"
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    labels = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        pa.field("id", pa.int64(), nullable=False),
+        pa.field("user_id", pa.int64()),
+        pa.field("action", labels, nullable=False),
+        pa.field("resource", labels, nullable=False),
+        pa.field("resource_id", pa.int64()),
+        pa.field("ip_address", pa.string()),
+        pa.field("user_agent", pa.string()),
+        pa.field("details", pa.string()),
+        pa.field("timestamp", pa.timestamp("us", tz="UTC"), nullable=False),
+    ])
+
+
+def _record_batch(rows: List, schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+class _ChunkSink:
+    """Destino de escritura para pyarrow que entrega lo escrito por bloques"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Posición absoluta: Parquet la usa para los offsets del footer
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _encode_arrow(chunks: Iterable[List]) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, schema, options=options) as writer:
+        for rows in chunks:
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _encode_parquet(chunks: Iterable[List]) -> Iterator[bytes]:
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for rows in chunks:
+        # Un row group por bloque leído
+        writer.write_batch(_record_batch(rows, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(statement: Select, format: str, headers: Optional[Sequence[str]],
+                session_scope: Callable[[], ContextManager[Session]],
+                chunk_size: Optional[int] = None) -> Iterator[Union[str, bytes]]:
+    """Generar la exportación codificada por bloques (síncrono, en un solo hilo)"""
+    if chunk_size is None:
+        chunk_size = (settings.AUDIT_EXPORT_COLUMNAR_BATCH_SIZE if format in COLUMNAR_FORMATS
+                      else settings.AUDIT_EXPORT_CHUNK_SIZE)
+    with session_scope() as db:
+        result = db.execute(statement.execution_options(yield_per=chunk_size))
+
+        def counted_chunks():
+            for rows in result.partitions():
+                audit_export_rows_counter.labels(format=format).inc(len(rows))
+                yield rows
+
+        if format == "csv":
+            yield from _encode_csv(counted_chunks(), headers or EXPORT_FIELDS)
+        elif format == "ndjson":
+            yield from _encode_ndjson(counted_chunks())
+        elif format == "arrow":
+            yield from _encode_arrow(counted_chunks())
+        elif format == "parquet":
+            yield from _encode_parquet(counted_chunks())
+        else:
+            yield from _encode_json(counted_chunks())
+
+
+async def stream_export(statement: Select, format: str, headers: Optional[Sequence[str]],
+                        session_scope: Callable[[], ContextManager[Session]]) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Generador asíncrono de la exportación.
+
+    Un hilo dedicado ejecuta iter_export y entrega cada bloque por una cola de
+    EXPORT_QUEUE_SIZE elementos, de modo que el cursor y la sesión síncrona se
+    usan siempre desde el mismo hilo y la lectura no se adelanta al envío. Si
+    el cliente se desconecta, el hilo se detiene y cierra el cursor y la sesión.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        iterator = iter_export(statement, format, headers, session_scope)
+        last = _DONE
+        try:
+            for chunk in iterator:
+                if stop.is_set():
+                    break
+                put(chunk)
+        except Exception as e:
+            last = e
+        finally:
+            iterator.close()
+        if not stop.is_set():
+            put(last)
+
+    threading.Thread(target=produce, name="audit-export", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Liberar un put en espera para que el hilo vea stop y cierre la sesión
+        while not queue.empty():
+            queue.get_nowait()
+
+
+def export_response(statement: Select, format: str, headers: Optional[Sequence[str]],
+                    session_scope: Callable[[], ContextManager[Session]]) -> StreamingResponse:
+    """Respuesta HTTP con la exportación en streaming como archivo adjunto"""
+    filename = f"audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        stream_export(statement, format, headers, session_scope),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -2,32 +2,35 @@
 Servicio de autenticación y autorización.
 """
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from typing import Optional
 from datetime import datetime, timedelta
 from app.models.user import User
 from app.schemas.user import UserCreate, Token
-from app.repositories.user import UserRepository
-from app.repositories.audit import AuditRepository
+from app.repositories.user import AsyncUserRepository
+from app.repositories.audit import AsyncAuditRepository
+from app.services.principals import load_principal
 from app.core.security_utils import SecurityUtils
+from app.core.password_hasher import password_hasher
+from app.core.token_revocation import revoke_token
 from app.core.config import settings
 
 
 class AuthService:
-    """Servicio de autenticación y autorización"""
+    """Servicio de autenticación y autorización (sobre la sesión async de la petición)"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.user_repo = UserRepository(db)
-        self.audit_repo = AuditRepository(db)
+        self.user_repo = AsyncUserRepository(db)
+        self.audit_repo = AsyncAuditRepository(db)
     
-    def login(self, email: str, password: str, ip_address: str = None, user_agent: str = None) -> Token:
+    async def login(self, email: str, password: str, ip_address: str = None, user_agent: str = None) -> Token:
         """Iniciar sesión"""
         from app.services.user import UserService
         
         user_service = UserService(self.db)
-        user = user_service.authenticate_user(email, password, ip_address, user_agent)
+        user = await user_service.authenticate_user(email, password, ip_address, user_agent)
         
         if not user:
             raise HTTPException(
@@ -43,7 +46,7 @@ class AuthService:
             )
         
         # Crear log de auditoría para login exitoso
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user.id,
             action="LOGIN",
             resource="users",
@@ -61,10 +64,10 @@ class AuthService:
         
         return Token(access_token=access_token, token_type="bearer")
     
-    def register(self, user_data: UserCreate, ip_address: str = None) -> Token:
+    async def register(self, user_data: UserCreate, ip_address: str = None) -> Token:
         """Registrar nuevo usuario"""
         # Verificar si el email ya existe
-        if self.user_repo.get_by_email(user_data.email):
+        if await self.user_repo.get_by_email(user_data.email):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El email ya está registrado"
@@ -78,14 +81,14 @@ class AuthService:
             )
         
         # Crear hash de contraseña
-        hashed_password = SecurityUtils.get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         
         # Crear usuario (por defecto no es admin)
         user_data.is_admin = False
-        user = self.user_repo.create_user(user_data, hashed_password)
+        user = await self.user_repo.create_user(user_data, hashed_password)
         
         # Crear log de auditoría
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user.id,
             action="REGISTER",
             resource="users",
@@ -102,7 +105,7 @@ class AuthService:
         
         return Token(access_token=access_token, token_type="bearer")
     
-    def verify_token(self, token: str, ip_address: str = None, user_agent: str = None) -> dict:
+    async def verify_token(self, token: str, ip_address: str = None, user_agent: str = None) -> dict:
         """Verificar token JWT"""
         try:
             payload = SecurityUtils.verify_token(token)
@@ -110,9 +113,9 @@ class AuthService:
             # Crear log de auditoría para verificación exitosa
             user_email = payload.get("sub")
             if user_email:
-                user = self.user_repo.get_by_email(user_email)
+                user = await self.user_repo.get_by_email(user_email)
                 if user:
-                    self.audit_repo.create_log(
+                    await self.audit_repo.create_log(
                         user_id=user.id,
                         action="VERIFY_TOKEN",
                         resource="users",
@@ -125,7 +128,7 @@ class AuthService:
             return {"valid": True, "payload": payload}
         except HTTPException:
             # Log de verificación fallida (sin user_id porque no se pudo verificar)
-            self.audit_repo.create_log(
+            await self.audit_repo.create_log(
                 user_id=None,
                 action="VERIFY_TOKEN",
                 resource="users",
@@ -135,23 +138,23 @@ class AuthService:
             )
             return {"valid": False, "payload": None}
     
-    def logout(self, user_id: int, ip_address: str = None) -> bool:
-        """Cerrar sesión"""
+    async def logout(self, user_id: int, ip_address: str = None, token: str = None) -> bool:
+        """Cerrar sesión revocando el token"""
+        revoked = await revoke_token(token) if token else False
+        
         # Crear log de auditoría
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user_id,
             action="LOGOUT",
             resource="users",
             resource_id=user_id,
             ip_address=ip_address,
-            details="Sesión cerrada"
+            details="Sesión cerrada" if revoked else "Sesión cerrada (token sin jti, vence por expiración)"
         )
         
-        # En una implementación real, aquí se invalidaría el token
-        # Por ahora solo registramos el logout
         return True
     
-    def get_current_user(self, token: str) -> User:
+    async def get_current_user(self, token: str) -> User:
         """Obtener usuario actual desde token"""
         payload = SecurityUtils.verify_token(token)
         email = payload.get("sub")
@@ -163,7 +166,7 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        user = self.user_repo.get_by_email(email)
+        user = await load_principal(self.db, email)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -179,9 +182,9 @@ class AuthService:
         
         return user
     
-    def refresh_token(self, token: str) -> Token:
+    async def refresh_token(self, token: str) -> Token:
         """Renovar token"""
-        user = self.get_current_user(token)
+        user = await self.get_current_user(token)
         
         # Crear nuevo token
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -190,7 +193,7 @@ class AuthService:
         )
         
         # Crear log de auditoría
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user.id,
             action="REFRESH_TOKEN",
             resource="users",
@@ -200,16 +203,16 @@ class AuthService:
         
         return Token(access_token=access_token, token_type="bearer")
     
-    def authenticate_user(self, email: str, password: str, ip_address: str = None, user_agent: str = None) -> Optional[User]:
+    async def authenticate_user(self, email: str, password: str, ip_address: str = None, user_agent: str = None) -> Optional[User]:
         """Autenticar usuario"""
         # Obtener usuario directamente del repositorio (modelo SQLAlchemy)
-        user = self.user_repo.get_by_email(email)
+        user = await self.user_repo.get_by_email(email)
         
         if not user:
             return None
             
         # Verificar contraseña
-        if not SecurityUtils.verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
             
         if not user.is_active:
@@ -218,6 +221,6 @@ class AuthService:
         # Actualizar último login
         user.last_login = datetime.utcnow()
         user.login_attempts = 0  # Reset attempts on successful login
-        self.db.commit()
+        await self.db.commit()
         
         return user
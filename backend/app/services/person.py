@@ -2,26 +2,26 @@
 Servicio para operaciones de personas.
 """
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from app.models.person import Person
-from app.schemas.person import PersonCreate, PersonUpdate, PersonResponse, PersonDetailResponse
-from app.repositories.person import PersonRepository
-from app.repositories.audit import AuditRepository
+from app.schemas.person import PersonCreate, PersonUpdate, PersonResponse, PersonDetailResponse, RutMode
+from app.repositories.person import AsyncPersonRepository
+from app.repositories.audit import AsyncAuditRepository
 import logging
-from app.repositories.audit import AuditRepository
+from app.db.counting import invalidate_counts
+from app.services.rut_display import resolve_display_ruts
 from app.core.config import settings
-import hashlib
 
 
 class PersonService:
-    """Servicio para operaciones de personas"""
+    """Servicio para operaciones de personas (sobre la sesión async de la petición)"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.person_repo = PersonRepository(db)
-        self.audit_repo = AuditRepository(db)
+        self.person_repo = AsyncPersonRepository(db)
+        self.audit_repo = AsyncAuditRepository(db)
     
     def _mask_rut(self, rut: str) -> str:
         """Ofuscar RUT para mostrar"""
@@ -45,13 +45,69 @@ class PersonService:
         # Usar primeros 8 caracteres del hash como indicador
         return f"hash_{religion_hash[:8]}"
     
-    def get_persons(self, skip: int = 0, limit: int = 100, search: str = None, user_id: int = None, ip_address: str = None, requested_by: int = None):
-        """Obtener lista de personas con búsqueda opcional"""
+    def _person_response(self, person: Person, rut: str, rut_masked: str) -> PersonResponse:
+        """Esquema de respuesta de una persona con su RUT ya desencriptado"""
+        return PersonResponse(
+            id=person.id,
+            rut=rut,
+            rut_masked=rut_masked,
+            nombre=person.nombre,
+            apellido=person.apellido,
+            religion_indicator=self._get_religion_indicator(person.religion_hash),
+            email=person.email,
+            telefono=person.telefono,
+            direccion=person.direccion,
+            fecha_nacimiento=person.fecha_nacimiento,
+            created_at=person.created_at,
+            updated_at=person.updated_at
+        )
+    
+    def _display_ruts(self, persons: List[Person]) -> List[Tuple[str, str]]:
+        """
+        (RUT formateado, RUT ofuscado) de cada persona, desencriptados en un
+        lote y con la caché de RUT si está activa
+        """
+        result = []
+        for person, display in zip(persons, resolve_display_ruts([person.encrypted_rut for person in persons])):
+            if display is None:
+                logging.warning(f"RUT corrupto para persona {person.id}")
+                result.append((f"ERROR_ID_{person.id}", "ERROR"))
+            else:
+                formatted_rut, masked_rut = display
+                result.append((formatted_rut or f"INVALID_ID_{person.id}", masked_rut))
+        return result
+    
+    def _list_ruts(self, persons: List[Person], rut_mode: Optional[RutMode] = None) -> List[Tuple[Optional[str], str]]:
+        """
+        (RUT, RUT ofuscado) de cada persona para los listados.
+
+        En modo masked (PERSON_LIST_RUT_MODE por defecto) se usa rut_masked sin
+        desencriptar y el RUT es None; solo se desencriptan las filas que aún no
+        tienen rut_masked. En modo full se desencripta como en el detalle.
+        """
+        if RutMode(rut_mode or settings.PERSON_LIST_RUT_MODE) == RutMode.FULL:
+            return self._display_ruts(persons)
+        
+        pending = [person for person in persons if person.rut_masked is None]
+        fallback = dict(zip((person.id for person in pending), self._display_ruts(pending)))
+        return [
+            (None, person.rut_masked if person.rut_masked is not None else fallback[person.id][1])
+            for person in persons
+        ]
+    
+    async def get_persons(self, skip: int = 0, limit: int = 100, search: str = None, user_id: int = None, ip_address: str = None, requested_by: int = None, include_total: bool = True,
+                    rut_mode: Optional[RutMode] = None):
+        """
+        Obtener lista de personas con búsqueda opcional.
+
+        Retorna (personas, total); con include_total=False no se cuenta y total es None.
+        rut_mode elige entre RUT ofuscado (sin desencriptar) y RUT completo.
+        """
         
         # Obtener personas usando repositorio
         if search:
             # Búsqueda simple - se puede mejorar en el futuro
-            persons = self.person_repo.get_multi(skip=skip, limit=limit)
+            persons = await self.person_repo.get_multi(skip=skip, limit=limit)
             # Filtrar por nombre o apellido si se proporciona búsqueda
             filtered_persons = []
             for person in persons:
@@ -62,14 +118,14 @@ class PersonService:
             persons = filtered_persons[:limit]  # Aplicar límite después del filtro
             total = len(filtered_persons)
         else:
-            persons = self.person_repo.get_multi(skip=skip, limit=limit)
+            persons = await self.person_repo.get_multi(skip=skip, limit=limit)
             # Para obtener el total, hacemos una consulta adicional
-            total = self.person_repo.count()
+            total = await self.person_repo.count() if include_total else None
         
         # Log de consulta masiva
         user_id_to_log = user_id or requested_by
         if user_id_to_log:
-            self.audit_repo.create_log(
+            await self.audit_repo.create_log(
                 user_id=user_id_to_log,
                 action="READ",
                 resource="persons",
@@ -77,67 +133,21 @@ class PersonService:
                 details=f"Consulta masiva de personas: {len(persons)} registros"
             )
         
-        # Importar servicio de seguridad para desencriptar RUT
-        from app.security import SecurityService
-        
         # Convertir a esquema de respuesta
         result = []
-        for person in persons:
-            # Desencriptar el RUT antes de crear la respuesta
-            try:
-                decrypted_rut = SecurityService.decrypt_rut(person.rut)
-                
-                # Verificar si la desencriptación fue exitosa
-                if decrypted_rut in ["RUT_DECRYPT_ERROR", "RUT_CORRUPTED"]:
-                    formatted_rut = f"ERROR_ID_{person.id}"
-                    clean_rut = "ERROR"
-                    logging.warning(f"RUT corrupto para persona {person.id}")
-                else:
-                    # Limpiar el RUT desencriptado antes de formatear
-                    clean_rut = SecurityService.clean_rut(decrypted_rut)
-                    # Solo formatear si el RUT limpio es válido
-                    if clean_rut and SecurityService.validate_rut(clean_rut):
-                        formatted_rut = SecurityService.format_rut(clean_rut)
-                    else:
-                        # Si no es válido, usar el RUT limpio sin formatear
-                        formatted_rut = clean_rut if clean_rut else f"INVALID_ID_{person.id}"
-                        
-            except Exception as e:
-                # Si ocurre un error, registrarlo y usar un RUT por defecto
-                logging.error(f"Error al procesar RUT para persona {person.id}: {str(e)}")
-                decrypted_rut = "ERROR_DECRYPT"
-                formatted_rut = f"ERROR_ID_{person.id}"
-                clean_rut = "ERROR"
-            
-            # Crear respuesta con RUT desencriptado
-            person_dict = {
-                'id': person.id,
-                'rut': formatted_rut,  # RUT desencriptado y formateado
-                'rut_masked': SecurityService.mask_rut(clean_rut) if clean_rut not in ["ERROR", "ERROR_DECRYPT"] else "ERROR",
-                'nombre': person.nombre,
-                'apellido': person.apellido,
-                'religion_indicator': self._get_religion_indicator(person.religion_hash),
-                'email': person.email,
-                'telefono': person.telefono,
-                'direccion': person.direccion,
-                'fecha_nacimiento': person.fecha_nacimiento,
-                'created_at': person.created_at,
-                'updated_at': person.updated_at
-            }
-            
-            person_response = PersonResponse(**person_dict)
-            result.append(person_response)
+        for person, (formatted_rut, masked_rut) in zip(persons, self._list_ruts(persons, rut_mode)):
+            result.append(self._person_response(person, formatted_rut, masked_rut))
         
         return result, total
     
-    def get_person_by_id(self, person_id: int, user_id: int = None, ip_address: str = None) -> Optional[PersonDetailResponse]:
+    async def get_person_by_id(self, person_id: int, user_id: int = None, ip_address: str = None) -> Optional[PersonDetailResponse]:
         """Obtener persona por ID"""
-        person = self.person_repo.get(person_id)
+        person = await self.person_repo.get(person_id)
         if not person:
             return None
         
         # Log de consulta individual
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user_id,
             action="READ",
             resource="persons",
@@ -146,24 +156,14 @@ class PersonService:
             details=f"Consulta de persona: {person.nombre} {person.apellido}"
         )
         
-        # Importar servicio de seguridad para desencriptar RUT
-        from app.security import SecurityService
-        
-        # Desencriptar el RUT
-        try:
-            decrypted_rut = SecurityService.decrypt_rut(person.rut)
-            formatted_rut = SecurityService.format_rut(decrypted_rut)
-        except Exception as e:
-            # Si ocurre un error, registrarlo y usar el RUT encriptado
-            logging.error(f"Error al desencriptar RUT: {str(e)}")
-            decrypted_rut = person.rut
-            formatted_rut = person.rut
+        # Desencriptar el RUT (o tomarlo de la caché de RUT)
+        formatted_rut, masked_rut = self._display_ruts([person])[0]
         
         # Crear respuesta con RUT desencriptado
         person_dict = {
             'id': person.id,
             'rut': formatted_rut,  # RUT desencriptado y formateado
-            'rut_masked': self._mask_rut(decrypted_rut),  # RUT ofuscado
+            'rut_masked': masked_rut,  # RUT ofuscado
             'nombre': person.nombre,
             'apellido': person.apellido,
             'religion_indicator': self._get_religion_indicator(person.religion_hash),
@@ -179,16 +179,13 @@ class PersonService:
         
         return person_response
     
-    def search_person_by_rut(self, rut: str, user_id: int = None, ip_address: str = None) -> Optional[PersonDetailResponse]:
+    async def search_person_by_rut(self, rut: str, user_id: int = None, ip_address: str = None) -> Optional[PersonDetailResponse]:
         """Buscar persona por RUT"""
-        # Generar hash del RUT para búsqueda
-        clean_rut = rut.replace(".", "").replace("-", "").lower()
-        rut_hash = hashlib.sha256(clean_rut.encode()).hexdigest()
-        
-        person = self.person_repo.get_by_rut_hash(rut_hash)
+        # Buscar por el índice ciego del RUT
+        person = await self.person_repo.get_by_rut(rut)
         if not person:
             # Log de búsqueda fallida
-            self.audit_repo.create_log(
+            await self.audit_repo.create_log(
                 user_id=user_id,
                 action="SEARCH_FAILED",
                 resource="persons",
@@ -198,7 +195,7 @@ class PersonService:
             return None
         
         # Log de búsqueda exitosa
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user_id,
             action="SEARCH_SUCCESS",
             resource="persons",
@@ -207,24 +204,14 @@ class PersonService:
             details=f"Búsqueda exitosa por RUT: {person.nombre} {person.apellido}"
         )
         
-        # Importar servicio de seguridad para desencriptar RUT
-        from app.security import SecurityService
-        
-        # Desencriptar el RUT
-        try:
-            decrypted_rut = SecurityService.decrypt_rut(person.rut)
-            formatted_rut = SecurityService.format_rut(decrypted_rut)
-        except Exception as e:
-            # Si ocurre un error, registrarlo y usar el RUT encriptado
-            logging.error(f"Error al desencriptar RUT: {str(e)}")
-            decrypted_rut = person.rut
-            formatted_rut = person.rut
+        # Desencriptar el RUT (o tomarlo de la caché de RUT)
+        formatted_rut, masked_rut = self._display_ruts([person])[0]
         
         # Crear respuesta con RUT desencriptado
         person_dict = {
             'id': person.id,
             'rut': formatted_rut,  # RUT desencriptado y formateado
-            'rut_masked': self._mask_rut(decrypted_rut),  # RUT ofuscado
+            'rut_masked': masked_rut,  # RUT ofuscado
             'nombre': person.nombre,
             'apellido': person.apellido,
             'religion_indicator': self._get_religion_indicator(person.religion_hash),
@@ -240,23 +227,22 @@ class PersonService:
         
         return person_response
     
-    def create_person(self, person_data: PersonCreate, created_by: int, ip_address: str = None) -> PersonResponse:
-        """Crear nueva persona"""
+    async def create_person(self, person_data: PersonCreate, created_by: int, ip_address: str = None,
+                      religion_digest: Optional[Tuple[str, str]] = None) -> PersonResponse:
+        """Crear nueva persona (religion_digest: hash y salt ya calculados de la religión)"""
         # Verificar si el RUT ya existe
-        clean_rut = person_data.rut.replace(".", "").replace("-", "").lower()
-        rut_hash = hashlib.sha256(clean_rut.encode()).hexdigest()
-        
-        if self.person_repo.get_by_rut_hash(rut_hash):
+        if await self.person_repo.get_by_rut(person_data.rut):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El RUT ya está registrado"
             )
         
         # Crear persona
-        person = self.person_repo.create_person(person_data, created_by)
+        person = await self.person_repo.create_person(person_data, created_by, religion_digest)
+        invalidate_counts()
         
         # Log de creación
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=created_by,
             action="CREATE",
             resource="persons",
@@ -270,13 +256,13 @@ class PersonService:
         
         # Desencriptar el RUT
         try:
-            decrypted_rut = SecurityService.decrypt_rut(person.rut)
+            decrypted_rut = SecurityService.decrypt_rut(person.encrypted_rut)
             formatted_rut = SecurityService.format_rut(decrypted_rut)
         except Exception as e:
-            # Si ocurre un error, registrarlo y usar el RUT encriptado
+            # Si ocurre un error, registrarlo y no exponer el RUT encriptado
             logging.error(f"Error al desencriptar RUT: {str(e)}")
-            decrypted_rut = person.rut
-            formatted_rut = person.rut
+            decrypted_rut = "RUT_DECRYPT_ERROR"
+            formatted_rut = f"ERROR_ID_{person.id}"
         
         # Crear respuesta con RUT desencriptado
         person_dict = {
@@ -298,9 +284,10 @@ class PersonService:
         
         return person_response
     
-    def update_person(self, person_id: int, person_data: PersonUpdate, updated_by: int, ip_address: str = None) -> PersonResponse:
-        """Actualizar persona"""
-        person = self.person_repo.get(person_id)
+    async def update_person(self, person_id: int, person_data: PersonUpdate, updated_by: int, ip_address: str = None,
+                      religion_digest: Optional[Tuple[str, str]] = None) -> PersonResponse:
+        """Actualizar persona (religion_digest: hash y salt ya calculados de la religión)"""
+        person = await self.person_repo.get(person_id)
         if not person:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -309,10 +296,7 @@ class PersonService:
         
         # Verificar si el nuevo RUT ya existe
         if person_data.rut:
-            clean_rut = person_data.rut.replace(".", "").replace("-", "").lower()
-            rut_hash = hashlib.sha256(clean_rut.encode()).hexdigest()
-            
-            existing_person = self.person_repo.get_by_rut_hash(rut_hash)
+            existing_person = await self.person_repo.get_by_rut(person_data.rut)
             if existing_person and existing_person.id != person_id:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -320,10 +304,10 @@ class PersonService:
                 )
         
         # Actualizar persona
-        updated_person = self.person_repo.update_person(person, person_data)
+        updated_person = await self.person_repo.update_person(person, person_data, religion_digest)
         
         # Log de actualización
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=updated_by,
             action="UPDATE",
             resource="persons",
@@ -335,25 +319,15 @@ class PersonService:
         # Importar servicio de seguridad para desencriptar RUT
         from app.security import SecurityService
         
-        # Convertir a esquema de respuesta
-        person_response = PersonResponse.model_validate(updated_person)
-        
         # Desencriptar el RUT
-        try:
-            decrypted_rut = SecurityService.decrypt_rut(updated_person.rut)
-            person_response.rut = decrypted_rut  # Usar el RUT desencriptado
-        except Exception as e:
-            # Si ocurre un error, registrarlo y mantener el RUT encriptado
-            logging.error(f"Error al desencriptar RUT: {str(e)}")
-            
-        person_response.rut_masked = self._mask_rut(updated_person.rut)
-        person_response.religion_indicator = self._get_religion_indicator(updated_person.religion_hash)
+        decrypted_rut = SecurityService.decrypt_rut(updated_person.encrypted_rut)
         
-        return person_response
+        # Convertir a esquema de respuesta
+        return self._person_response(updated_person, decrypted_rut, self._mask_rut(decrypted_rut))
     
-    def delete_person(self, person_id: int, deleted_by: int, ip_address: str = None) -> bool:
+    async def delete_person(self, person_id: int, deleted_by: int, ip_address: str = None) -> bool:
         """Eliminar persona"""
-        person = self.person_repo.get(person_id)
+        person = await self.person_repo.get(person_id)
         if not person:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -361,7 +335,7 @@ class PersonService:
             )
         
         # Log de eliminación
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=deleted_by,
             action="DELETE",
             resource="persons",
@@ -371,14 +345,16 @@ class PersonService:
         )
         
         # Eliminar persona
-        self.person_repo.delete(person_id)
+        await self.person_repo.delete(person_id)
+        invalidate_counts()
         return True
     
-    def search_persons_by_name(self, nombre: str = None, apellido: str = None, 
+    async def search_persons_by_name(self, nombre: str = None, apellido: str = None, 
                               skip: int = 0, limit: int = 100, 
-                              user_id: int = None, ip_address: str = None) -> List[PersonResponse]:
-        """Buscar personas por nombre y/o apellido"""
-        persons = self.person_repo.search_by_name(nombre, apellido, skip, limit)
+                              user_id: int = None, ip_address: str = None,
+                              rut_mode: Optional[RutMode] = None) -> List[PersonResponse]:
+        """Buscar personas por nombre y/o apellido (rut_mode como en get_persons)"""
+        persons = await self.person_repo.search_by_name(nombre, apellido, skip, limit)
         
         # Log de búsqueda
         search_criteria = []
@@ -387,7 +363,7 @@ class PersonService:
         if apellido:
             search_criteria.append(f"apellido: {apellido}")
         
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user_id,
             action="SEARCH",
             resource="persons",
@@ -395,35 +371,21 @@ class PersonService:
             details=f"Búsqueda por {', '.join(search_criteria)}: {len(persons)} resultados"
         )
         
-        # Importar servicio de seguridad para desencriptar RUT
-        from app.security import SecurityService
-        
         # Convertir a esquema de respuesta
         result = []
-        for person in persons:
-            person_response = PersonResponse.model_validate(person)
-            
-            # Desencriptar el RUT
-            try:
-                decrypted_rut = SecurityService.decrypt_rut(person.rut)
-                person_response.rut = decrypted_rut  # Usar el RUT desencriptado
-            except Exception as e:
-                # Si ocurre un error, registrarlo y mantener el RUT encriptado
-                logging.error(f"Error al desencriptar RUT: {str(e)}")
-                
-            person_response.rut_masked = self._mask_rut(person.rut)
-            person_response.religion_indicator = self._get_religion_indicator(person.religion_hash)
-            result.append(person_response)
+        for person, (formatted_rut, masked_rut) in zip(persons, self._list_ruts(persons, rut_mode)):
+            result.append(self._person_response(person, formatted_rut, masked_rut))
         
         return result
     
-    def get_persons_by_user(self, created_by: int, skip: int = 0, limit: int = 100, 
-                           user_id: int = None, ip_address: str = None) -> List[PersonResponse]:
-        """Obtener personas creadas por un usuario específico"""
-        persons = self.person_repo.get_by_created_by(created_by, skip, limit)
+    async def get_persons_by_user(self, created_by: int, skip: int = 0, limit: int = 100, 
+                           user_id: int = None, ip_address: str = None,
+                           rut_mode: Optional[RutMode] = None) -> List[PersonResponse]:
+        """Obtener personas creadas por un usuario específico (rut_mode como en get_persons)"""
+        persons = await self.person_repo.get_by_created_by(created_by, skip, limit)
         
         # Log de consulta
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user_id,
             action="READ",
             resource="persons",
@@ -431,24 +393,9 @@ class PersonService:
             details=f"Consulta de personas creadas por usuario {created_by}: {len(persons)} registros"
         )
         
-        # Importar servicio de seguridad para desencriptar RUT
-        from app.security import SecurityService
-        
         # Convertir a esquema de respuesta
         result = []
-        for person in persons:
-            person_response = PersonResponse.model_validate(person)
-            
-            # Desencriptar el RUT
-            try:
-                decrypted_rut = SecurityService.decrypt_rut(person.rut)
-                person_response.rut = decrypted_rut  # Usar el RUT desencriptado
-            except Exception as e:
-                # Si ocurre un error, registrarlo y mantener el RUT encriptado
-                logging.error(f"Error al desencriptar RUT: {str(e)}")
-                
-            person_response.rut_masked = self._mask_rut(person.rut)
-            person_response.religion_indicator = self._get_religion_indicator(person.religion_hash)
-            result.append(person_response)
+        for person, (formatted_rut, masked_rut) in zip(persons, self._list_ruts(persons, rut_mode)):
+            result.append(self._person_response(person, formatted_rut, masked_rut))
         
         return result
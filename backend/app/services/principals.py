@@ -0,0 +1,187 @@
+"""
+Caché del usuario autenticado (principal) por sujeto del token.
+
+get_current_user consultaba users en cada petición autenticada solo para
+conocer id, is_active e is_admin. Con PRINCIPAL_CACHE_ENABLED la fila del
+usuario (sin hashed_password) se guarda en una caché de proceso por sujeto
+(email), acotada en entradas (PRINCIPAL_CACHE_SIZE) y en tiempo
+(PRINCIPAL_CACHE_TTL, corto a propósito). UserService invalida la entrada al
+actualizar, eliminar, bloquear o cambiar la contraseña de un usuario, y el aviso
+se publica en PRINCIPAL_CACHE_PUBSUB_BACKEND para que los demás workers también
+la descarten; con el backend memory los otros procesos dependen del TTL, por
+lo que el arranque lo advierte si hay más de un worker (WEB_CONCURRENCY).
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.repositories.user import AsyncUserRepository
+from app.utils.cache import TTLCache
+from app.utils.pubsub import PubSubBackend, create_pubsub
+
+logger = logging.getLogger(__name__)
+
+# Métricas de Prometheus
+principal_cache_requests_counter = Counter(
+    'principal_cache_requests_total', 'Consultas a la caché de usuarios autenticados', ['result']
+)
+principal_cache_invalidations_counter = Counter(
+    'principal_cache_invalidations_total', 'Invalidaciones de la caché de usuarios autenticados', ['source']
+)
+principal_cache_entries_gauge = Gauge(
+    'principal_cache_entries', 'Entradas en la caché de usuarios autenticados'
+)
+
+# Columnas que no se guardan en caché
+EXCLUDED_COLUMNS = ("hashed_password",)
+
+
+def _snapshot(user: User) -> Dict[str, Any]:
+    """Valores de las columnas del usuario, sin datos secretos"""
+    return {
+        column.key: getattr(user, column.key)
+        for column in User.__table__.columns
+        if column.key not in EXCLUDED_COLUMNS
+    }
+
+
+class PrincipalCache:
+    """
+    Caché sujeto -> fila del usuario. Devuelve un User transitorio (fuera de
+    toda sesión) nuevo en cada acierto, para que las peticiones no compartan
+    instancias.
+
+    Cada invalidación incrementa una generación: una carga que empezó antes de
+    una invalidación no guarda su resultado, así una petición lenta no vuelve a
+    dejar en caché el estado anterior a un cambio.
+    """
+
+    def __init__(self, max_size: int, ttl: float, channel: str):
+        self.channel = channel
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._pubsub: Optional[PubSubBackend] = None
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, subject: str) -> Optional[User]:
+        """Usuario en caché para el sujeto, o None"""
+        snapshot = self._cache.get(subject)
+        principal_cache_requests_counter.labels(result="miss" if snapshot is None else "hit").inc()
+        return None if snapshot is None else User(**snapshot)
+
+    def set(self, subject: str, user: User, generation: int) -> None:
+        """Guardar el usuario si no hubo invalidaciones desde generation"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._cache.set(subject, _snapshot(user))
+        principal_cache_entries_gauge.set(len(self._cache))
+
+    def invalidate(self, *subjects: Optional[str]) -> None:
+        """Descartar los sujetos en este proceso y avisar a los demás"""
+        subjects = [subject for subject in subjects if subject]
+        if not subjects:
+            return
+        for subject in subjects:
+            self._discard(subject, source="local")
+            if self._pubsub is not None:
+                self._pubsub.publish(self.channel, subject)
+
+    def clear(self) -> None:
+        """Eliminar todas las entradas de este proceso"""
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+        principal_cache_entries_gauge.set(0)
+
+    def start(self, pubsub: PubSubBackend) -> None:
+        """Suscribirse a las invalidaciones publicadas por otros procesos"""
+        self._pubsub = pubsub
+        pubsub.subscribe(self.channel, self._on_message)
+
+    def stop(self) -> None:
+        """Cerrar el backend de pub/sub"""
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _on_message(self, subject: str) -> None:
+        self._discard(subject, source="remote")
+
+    def _discard(self, subject: str, source: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.invalidate(subject)
+        principal_cache_invalidations_counter.labels(source=source).inc()
+        principal_cache_entries_gauge.set(len(self._cache))
+
+
+# Caché de proceso email -> usuario autenticado
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    channel=settings.PRINCIPAL_CACHE_PUBSUB_CHANNEL,
+)
+
+
+async def load_principal(db: AsyncSession, subject: str) -> Optional[User]:
+    """Usuario del sujeto de un token: de la caché o de la base (None si no existe)"""
+    if not settings.PRINCIPAL_CACHE_ENABLED:
+        return await AsyncUserRepository(db).get_by_email(subject)
+
+    user = principal_cache.get(subject)
+    if user is not None:
+        return user
+
+    generation = principal_cache.generation
+    user = await AsyncUserRepository(db).get_by_email(subject)
+    if user is not None:
+        principal_cache.set(subject, user, generation)
+    return user
+
+
+def invalidate_principal(*subjects: Optional[str]) -> None:
+    """Descartar el usuario en caché de los sujetos (emails) en todos los workers"""
+    principal_cache.invalidate(*subjects)
+
+
+def check_principal_invalidation_backend(workers: int) -> None:
+    """
+    Advertir si las invalidaciones no llegan a los demás workers: un usuario
+    eliminado, desactivado o sin rol de administrador seguiría autorizado en
+    ellos hasta PRINCIPAL_CACHE_TTL segundos.
+    """
+    if workers <= 1 or not settings.PRINCIPAL_CACHE_ENABLED:
+        return
+    if settings.PRINCIPAL_CACHE_PUBSUB_BACKEND == "memory":
+        logger.warning(
+            f"PRINCIPAL_CACHE_PUBSUB_BACKEND=memory con {workers} workers: los cambios de un "
+            f"usuario llegan a los demás workers hasta {settings.PRINCIPAL_CACHE_TTL}s después "
+            f"(TTL de la caché); use redis o PRINCIPAL_CACHE_ENABLED=False"
+        )
+
+
+def start_principal_invalidation() -> None:
+    """Conectar la caché al backend de pub/sub configurado"""
+    check_principal_invalidation_backend(settings.WEB_CONCURRENCY)
+    principal_cache.start(create_pubsub(
+        settings.PRINCIPAL_CACHE_PUBSUB_BACKEND, settings.PRINCIPAL_CACHE_PUBSUB_URL
+    ))
+
+
+def stop_principal_invalidation() -> None:
+    """Desconectar la caché del backend de pub/sub"""
+    principal_cache.stop()
@@ -0,0 +1,92 @@
+"""
+RUT para mostrar (formateado y ofuscado) a partir del RUT cifrado.
+
+Las mismas personas se listan y consultan una y otra vez, y cada vista paga
+una desencriptación Fernet más el formateo. Con RUT_DISPLAY_CACHE_ENABLED el
+par (formateado, ofuscado) se guarda en una caché de proceso por texto
+cifrado, acotada en entradas (RUT_DISPLAY_CACHE_SIZE), en bytes estimados
+(RUT_DISPLAY_CACHE_MAX_BYTES) y en tiempo (RUT_DISPLAY_CACHE_TTL).
+PersonRepository invalida la entrada al cambiar el RUT o eliminar la persona;
+en otros procesos la entrada vence por TTL. Desactivada por defecto.
+"""
+
+import sys
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from app.core.security_service import SecurityService
+from app.utils.cache import TTLCache
+
+# Métricas de Prometheus
+rut_display_cache_requests_counter = Counter(
+    'rut_display_cache_requests_total', 'Consultas a la caché de RUT desencriptados', ['result']
+)
+rut_display_cache_entries_gauge = Gauge(
+    'rut_display_cache_entries', 'Entradas en la caché de RUT desencriptados'
+)
+rut_display_cache_bytes_gauge = Gauge(
+    'rut_display_cache_bytes', 'Bytes estimados de la caché de RUT desencriptados'
+)
+
+DECRYPT_ERRORS = ("RUT_DECRYPT_ERROR", "RUT_CORRUPTED")
+
+
+def _entry_size(key: Hashable, value: Tuple[str, str]) -> int:
+    """Bytes estimados de una entrada (clave, tupla y sus dos cadenas)"""
+    return sys.getsizeof(key) + sys.getsizeof(value) + sum(sys.getsizeof(part) for part in value)
+
+
+# Caché de proceso texto cifrado -> (RUT formateado, RUT ofuscado)
+rut_display_cache = TTLCache(
+    max_size=settings.RUT_DISPLAY_CACHE_SIZE,
+    ttl=settings.RUT_DISPLAY_CACHE_TTL,
+    max_bytes=settings.RUT_DISPLAY_CACHE_MAX_BYTES,
+    sizeof=_entry_size,
+)
+
+
+def display_pair(decrypted_rut: str) -> Optional[Tuple[str, str]]:
+    """(formateado, ofuscado) de un RUT desencriptado, o None si no se pudo desencriptar"""
+    if decrypted_rut in DECRYPT_ERRORS:
+        return None
+    clean_rut = SecurityService.clean_rut(decrypted_rut)
+    # Solo formatear si el RUT limpio es válido
+    if clean_rut and SecurityService.validate_rut(clean_rut):
+        formatted_rut = SecurityService.format_rut(clean_rut)
+    else:
+        formatted_rut = clean_rut
+    return formatted_rut, SecurityService.mask_rut(clean_rut)
+
+
+def resolve_display_ruts(encrypted_ruts: Sequence[str]) -> List[Optional[Tuple[str, str]]]:
+    """
+    Par (formateado, ofuscado) de cada RUT cifrado, en el mismo orden.
+
+    Los que no están en caché se desencriptan en un solo lote. None indica que
+    el RUT no se pudo desencriptar (estos resultados no se guardan).
+    """
+    if not settings.RUT_DISPLAY_CACHE_ENABLED:
+        return [display_pair(rut) for rut in SecurityService.decrypt_ruts_batch(encrypted_ruts)]
+
+    keys = {rut for rut in encrypted_ruts if rut}
+    pairs: Dict[str, Optional[Tuple[str, str]]] = rut_display_cache.get_many(keys)
+    missing = [rut for rut in keys if rut not in pairs]
+    rut_display_cache_requests_counter.labels(result="hit").inc(len(pairs))
+    rut_display_cache_requests_counter.labels(result="miss").inc(len(missing))
+    if missing:
+        loaded = dict(zip(missing, map(display_pair, SecurityService.decrypt_ruts_batch(missing))))
+        rut_display_cache.set_many({rut: pair for rut, pair in loaded.items() if pair is not None})
+        pairs.update(loaded)
+        rut_display_cache_entries_gauge.set(len(rut_display_cache))
+        rut_display_cache_bytes_gauge.set(rut_display_cache.bytes)
+    return [pairs.get(rut, ("", "")) if rut else ("", "") for rut in encrypted_ruts]
+
+
+def invalidate_display_rut(encrypted_rut: Optional[str]) -> None:
+    """Descartar el RUT en caché de un texto cifrado (al cambiar o eliminar la persona)"""
+    if encrypted_rut:
+        rut_display_cache.invalidate(encrypted_rut)
+        rut_display_cache_entries_gauge.set(len(rut_display_cache))
+        rut_display_cache_bytes_gauge.set(rut_display_cache.bytes)
@@ -2,49 +2,52 @@
 Servicio para operaciones de usuarios.
 """
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from typing import Optional, List
 from datetime import datetime, timedelta
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
-from app.repositories.user import UserRepository
-from app.repositories.audit import AuditRepository
+from app.repositories.user import AsyncUserRepository
+from app.repositories.audit import AsyncAuditRepository
+from app.services.user_emails import invalidate_user_email
+from app.services.principals import invalidate_principal
 from app.core.security_utils import SecurityUtils
+from app.core.password_hasher import password_hasher
 from app.core.config import settings
 
 
 class UserService:
-    """Servicio para operaciones de usuarios"""
+    """Servicio para operaciones de usuarios (sobre la sesión async de la petición)"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.user_repo = UserRepository(db)
-        self.audit_repo = AuditRepository(db)
+        self.user_repo = AsyncUserRepository(db)
+        self.audit_repo = AsyncAuditRepository(db)
     
-    def get_users(self, skip: int = 0, limit: int = 100) -> List[UserResponse]:
+    async def get_users(self, skip: int = 0, limit: int = 100) -> List[UserResponse]:
         """Obtener lista de usuarios"""
-        users = self.user_repo.get_multi(skip=skip, limit=limit)
+        users = await self.user_repo.get_multi(skip=skip, limit=limit)
         return [UserResponse.model_validate(user) for user in users]
     
-    def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
+    async def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
         """Obtener usuario por ID"""
-        user = self.user_repo.get(user_id)
+        user = await self.user_repo.get(user_id)
         if user:
             return UserResponse.model_validate(user)
         return None
     
-    def get_user_by_email(self, email: str) -> Optional[UserResponse]:
+    async def get_user_by_email(self, email: str) -> Optional[UserResponse]:
         """Obtener usuario por email"""
-        user = self.user_repo.get_by_email(email)
+        user = await self.user_repo.get_by_email(email)
         if user:
             return UserResponse.model_validate(user)
         return None
     
-    def create_user(self, user_data: UserCreate, created_by: int, ip_address: str = None) -> UserResponse:
+    async def create_user(self, user_data: UserCreate, created_by: int, ip_address: str = None) -> UserResponse:
         """Crear nuevo usuario"""
         # Verificar si el email ya existe
-        if self.user_repo.get_by_email(user_data.email):
+        if await self.user_repo.get_by_email(user_data.email):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El email ya está registrado"
@@ -58,13 +61,13 @@ class UserService:
             )
         
         # Crear hash de contraseña
-        hashed_password = SecurityUtils.get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         
         # Crear usuario
-        user = self.user_repo.create_user(user_data, hashed_password)
+        user = await self.user_repo.create_user(user_data, hashed_password)
         
         # Crear log de auditoría
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=created_by,
             action="CREATE",
             resource="users",
@@ -75,26 +78,26 @@ class UserService:
         
         return UserResponse.model_validate(user)
     
-    def create_user_direct(self, user_data: UserCreate) -> User:
+    async def create_user_direct(self, user_data: UserCreate) -> User:
         """Crear usuario directamente para pruebas (sin auditoría)"""
         # Verificar si el email ya existe
-        if self.user_repo.get_by_email(user_data.email):
+        if await self.user_repo.get_by_email(user_data.email):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El email ya está registrado"
             )
         
         # Crear hash de contraseña
-        hashed_password = SecurityUtils.get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         
         # Crear usuario directamente
-        user = self.user_repo.create_user(user_data, hashed_password)
+        user = await self.user_repo.create_user(user_data, hashed_password)
         
         return user
     
-    def update_user(self, user_id: int, user_data: UserUpdate, updated_by: int, ip_address: str = None) -> UserResponse:
+    async def update_user(self, user_id: int, user_data: UserUpdate, updated_by: int, ip_address: str = None) -> UserResponse:
         """Actualizar usuario"""
-        user = self.user_repo.get(user_id)
+        user = await self.user_repo.get(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -103,12 +106,14 @@ class UserService:
         
         # Verificar si el nuevo email ya existe
         if user_data.email and user_data.email != user.email:
-            if self.user_repo.get_by_email(user_data.email):
+            if await self.user_repo.get_by_email(user_data.email):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="El email ya está registrado"
                 )
         
+        previous_email = user.email
+        
         # Actualizar contraseña si se proporciona
         if user_data.password:
             if not SecurityUtils.validate_password_strength(user_data.password):
@@ -116,14 +121,16 @@ class UserService:
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="La contraseña no cumple con los requisitos de seguridad"
                 )
-            hashed_password = SecurityUtils.get_password_hash(user_data.password)
-            user = self.user_repo.update_password(user, hashed_password)
+            hashed_password = await password_hasher.hash(user_data.password)
+            user = await self.user_repo.update_password(user, hashed_password)
         
         # Actualizar otros campos
-        updated_user = self.user_repo.update(user, user_data)
+        updated_user = await self.user_repo.update(user, user_data)
+        invalidate_user_email(user_id)
+        invalidate_principal(previous_email, updated_user.email)
         
         # Crear log de auditoría
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=updated_by,
             action="UPDATE",
             resource="users",
@@ -134,9 +141,9 @@ class UserService:
         
         return UserResponse.model_validate(updated_user)
     
-    def delete_user(self, user_id: int, deleted_by: int, ip_address: str = None) -> bool:
+    async def delete_user(self, user_id: int, deleted_by: int, ip_address: str = None) -> bool:
         """Eliminar usuario"""
-        user = self.user_repo.get(user_id)
+        user = await self.user_repo.get(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -145,7 +152,7 @@ class UserService:
         
         # No permitir eliminar el último administrador
         if user.is_admin:
-            admin_count = len([u for u in self.user_repo.get_multi(skip=0, limit=1000) if u.is_admin and u.id != user_id])
+            admin_count = len([u for u in await self.user_repo.get_multi(skip=0, limit=1000) if u.is_admin and u.id != user_id])
             if admin_count == 0:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -153,7 +160,7 @@ class UserService:
                 )
         
         # Crear log de auditoría
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=deleted_by,
             action="DELETE",
             resource="users",
@@ -163,16 +170,18 @@ class UserService:
         )
         
         # Eliminar usuario
-        self.user_repo.delete(user_id)
+        await self.user_repo.delete(user_id)
+        invalidate_user_email(user_id)
+        invalidate_principal(user.email)
         return True
     
-    def authenticate_user(self, email: str, password: str, ip_address: str = None, user_agent: str = None) -> Optional[User]:
+    async def authenticate_user(self, email: str, password: str, ip_address: str = None, user_agent: str = None) -> Optional[User]:
         """Autenticar usuario"""
-        user = self.user_repo.get_by_email(email)
+        user = await self.user_repo.get_by_email(email)
         
         if not user:
             # Log de intento de login fallido
-            self.audit_repo.create_log(
+            await self.audit_repo.create_log(
                 user_id=None,
                 action="LOGIN_FAILED",
                 resource="users",
@@ -185,7 +194,7 @@ class UserService:
         # Verificar si el usuario está bloqueado
         if user.locked_until and user.locked_until > datetime.utcnow():
             # Log de intento de login con usuario bloqueado
-            self.audit_repo.create_log(
+            await self.audit_repo.create_log(
                 user_id=user.id,
                 action="LOGIN_BLOCKED",
                 resource="users",
@@ -196,17 +205,18 @@ class UserService:
             return None
         
         # Verificar contraseña
-        if not SecurityUtils.verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             # Incrementar intentos fallidos
-            self.user_repo.increment_login_attempts(user)
+            await self.user_repo.increment_login_attempts(user)
             
             # Bloquear usuario si supera el límite
             if user.login_attempts >= settings.MAX_LOGIN_ATTEMPTS:
                 locked_until = datetime.utcnow() + timedelta(seconds=settings.LOCKOUT_DURATION)
-                self.user_repo.lock_user(user, locked_until)
+                await self.user_repo.lock_user(user, locked_until)
+            invalidate_principal(user.email)
             
             # Log de intento de login fallido
-            self.audit_repo.create_log(
+            await self.audit_repo.create_log(
                 user_id=user.id,
                 action="LOGIN_FAILED",
                 resource="users",
@@ -217,12 +227,13 @@ class UserService:
             return None
         
         # Login exitoso
-        self.user_repo.reset_login_attempts(user)
+        await self.user_repo.reset_login_attempts(user)
         user.last_login = datetime.utcnow()
-        self.user_repo.update(user, UserUpdate())
+        await self.user_repo.update(user, UserUpdate())
+        invalidate_principal(user.email)
         
         # Log de login exitoso
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user.id,
             action="LOGIN_SUCCESS",
             resource="users",
@@ -233,9 +244,9 @@ class UserService:
         
         return user
     
-    def get_current_user_info(self, user_id: int, ip_address: str = None) -> UserResponse:
+    async def get_current_user_info(self, user_id: int, ip_address: str = None) -> UserResponse:
         """Obtener información del usuario actual"""
-        user = self.user_repo.get(user_id)
+        user = await self.user_repo.get(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -243,7 +254,7 @@ class UserService:
             )
         
         # Log de consulta de información personal
-        self.audit_repo.create_log(
+        await self.audit_repo.create_log(
             user_id=user.id,
             action="READ",
             resource="users",
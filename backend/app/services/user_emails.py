@@ -0,0 +1,48 @@
+"""
+Resolución por lotes de emails de usuario para respuestas de auditoría.
+
+Los user_id distintos de una página se resuelven con una sola consulta IN y se
+guardan en una caché de proceso id -> email. UserService invalida la entrada al
+actualizar o eliminar un usuario; en otros procesos la entrada vence tras
+USER_EMAIL_CACHE_TTL segundos.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.user import AsyncUserRepository
+from app.utils.cache import TTLCache
+
+# Caché de proceso id -> email (None para usuarios eliminados)
+user_email_cache = TTLCache(
+    max_size=settings.USER_EMAIL_CACHE_SIZE, ttl=settings.USER_EMAIL_CACHE_TTL
+)
+
+
+async def resolve_user_emails(db: AsyncSession, user_ids: Iterable[Optional[int]]) -> Dict[int, Optional[str]]:
+    """Obtener el email de cada user_id (None si el usuario ya no existe)"""
+    ids = {user_id for user_id in user_ids if user_id}
+    emails = user_email_cache.get_many(ids)
+    missing = ids - emails.keys()
+    if missing:
+        found = await AsyncUserRepository(db).get_emails(missing)
+        loaded = {user_id: found.get(user_id) for user_id in missing}
+        user_email_cache.set_many(loaded)
+        emails.update(loaded)
+    return emails
+
+
+async def enrich_user_emails(db: AsyncSession, items: List) -> List:
+    """Asignar user_email a cada elemento (AuditLogResponse o similar) según su user_id"""
+    emails = await resolve_user_emails(db, (item.user_id for item in items))
+    for item in items:
+        if item.user_id and emails.get(item.user_id):
+            item.user_email = emails[item.user_id]
+    return items
+
+
+def invalidate_user_email(user_id: int) -> None:
+    """Descartar el email en caché de un usuario"""
+    user_email_cache.invalidate(user_id)
@@ -5,6 +5,7 @@ Utilidades del sistema de auditoría
 from .rut import RutValidator
 from .religion import ReligionHasher  
 from .responses import ResponseUtils
+from .cursor import encode_cursor, decode_cursor
 from .system_status import (
     get_system_status,
     print_system_status
@@ -46,6 +47,8 @@ __all__ = [
     "create_success_response",
     "create_error_response",
     "create_paginated_response",
+    "encode_cursor",
+    "decode_cursor",
     "get_system_status",
     "print_system_status",
     "populate_database",
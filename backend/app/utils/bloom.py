@@ -0,0 +1,65 @@
+"""
+Filtro de Bloom en memoria para pruebas de pertenencia baratas.
+
+Un negativo es definitivo (el elemento nunca se agregó); un positivo puede ser
+falso con probabilidad cercana a false_positive_rate mientras no se superen
+capacity elementos. No admite eliminar: para descartar elementos se construye
+un filtro nuevo.
+"""
+
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """Filtro de Bloom dimensionado para capacity elementos y una tasa de falsos positivos"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.bits = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self) -> int:
+        """Elementos agregados (sin contar los que ya parecían estar)"""
+        return self.count
+
+    def __contains__(self, item: str) -> bool:
+        array = self._array
+        first, second = self._hashes(item)
+        bits = self.bits
+        for i in range(self.hashes):
+            index = (first + i * second) % bits
+            if not array[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+    def add(self, item: str) -> bool:
+        """Agregar un elemento; devuelve False si ya parecía estar (no cambió ningún bit)"""
+        changed = False
+        array = self._array
+        for index in self._indexes(item):
+            mask = 1 << (index & 7)
+            if not array[index >> 3] & mask:
+                array[index >> 3] |= mask
+                changed = True
+        if changed:
+            self.count += 1
+        return changed
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def _indexes(self, item: str):
+        first, second = self._hashes(item)
+        return ((first + i * second) % self.bits for i in range(self.hashes))
+
+    @staticmethod
+    def _hashes(item: str):
+        # Doble hashing (Kirsch-Mitzenmacher) sobre un solo digest de 128 bits
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
@@ -0,0 +1,107 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU, segura entre hilos.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Caché acotada a max_size entradas que expiran ttl segundos después de
+    guardarse. Al superar max_size se desaloja la entrada usada hace más tiempo.
+
+    Con max_bytes y sizeof(key, value) también se acota el tamaño estimado de
+    las entradas: se desalojan las menos usadas hasta quedar bajo max_bytes.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Hashable, Any], int]] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Obtener un valor vigente o default"""
+        with self._lock:
+            value = self._get(key, time.monotonic())
+        return default if value is self._MISSING else value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Obtener los valores vigentes de varias claves (las ausentes no se incluyen)"""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                value = self._get(key, now)
+                if value is not self._MISSING:
+                    found[key] = value
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Guardar un valor; ttl permite acortar la vigencia de esta entrada"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._set(key, value, expires_at)
+
+    def set_many(self, items: Dict[Hashable, Any]) -> None:
+        """Guardar varios valores con el TTL por defecto"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items.items():
+                self._set(key, value, expires_at)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Eliminar una entrada"""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        """Eliminar todas las entradas"""
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def _get(self, key: Hashable, now: float) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return self._MISSING
+        expires_at, value, _ = entry
+        if expires_at <= now:
+            self._pop(key)
+            self.misses += 1
+            return self._MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        size = self.sizeof(key, value) if self.sizeof else 0
+        self._pop(key)
+        self._data[key] = (expires_at, value, size)
+        self.bytes += size
+        while len(self._data) > self.max_size or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and self._data
+        ):
+            _, (_, _, evicted) = self._data.popitem(last=False)
+            self.bytes -= evicted
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
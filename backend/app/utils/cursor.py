@@ -0,0 +1,32 @@
+"""
+Cursores opacos para paginación keyset (seek).
+
+Un cursor codifica la posición (timestamp, id) del último elemento visto, de modo
+que la página siguiente se obtiene con WHERE (timestamp, id) < cursor en lugar de
+OFFSET, sin recorrer ni descartar las filas de las páginas anteriores.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Codificar la posición (timestamp, id) como cadena opaca segura para URLs"""
+    payload = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodificar un cursor generado por encode_cursor.
+
+    Lanza ValueError si el cursor está mal formado.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Cursor de paginación inválido") from e
@@ -0,0 +1,55 @@
+"""
+Sustituto en memoria del subconjunto de la API de redis-py que usan los
+almacenes de la aplicación (set con expiración, exists, delete, scan_iter).
+Sirve para desarrollo y pruebas sin un servidor Redis; no se comparte entre
+procesos.
+"""
+
+import fnmatch
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class FakeRedis:
+    """Claves con expiración opcional, con vencimiento perezoso como Redis"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, name: str, value, ex: Optional[int] = None, exat: Optional[int] = None) -> bool:
+        expires_at = exat if exat is not None else (time.time() + ex if ex is not None else None)
+        with self._lock:
+            self._data[name] = (str(value), expires_at)
+        return True
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(name, time.time())
+        return None if entry is None else entry[0]
+
+    def exists(self, *names: str) -> int:
+        now = time.time()
+        with self._lock:
+            return sum(1 for name in names if self._live(name, now) is not None)
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> Iterator[str]:
+        now = time.time()
+        with self._lock:
+            names = [name for name in list(self._data) if self._live(name, now) is not None]
+        return iter(name for name in names if match is None or fnmatch.fnmatchcase(name, match))
+
+    def close(self) -> None:
+        """Compatibilidad con redis.Redis.close"""
+
+    def _live(self, name: str, now: float) -> Optional[Tuple[str, Optional[float]]]:
+        entry = self._data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[name]
+            return None
+        return entry
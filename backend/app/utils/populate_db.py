@@ -8,8 +8,10 @@ from faker import Faker
 from sqlalchemy.orm import sessionmaker
 from app.models import User, Person, AuditLog
 from app.core.security_utils import SecurityUtils
+from app.core import rut_engine
 from app.core.security_service import SecurityService
 from app.db.database import engine
+from app.repositories.person import PersonRepository
 from datetime import datetime, timedelta
 
 
@@ -35,24 +37,7 @@ def generate_valid_rut():
     """Generar un RUT válido chileno"""
     rut_number = random.randint(10000000, 25000000)
     
-    # Calcular dígito verificador
-    serie = [2, 3, 4, 5, 6, 7]
-    sum_value = 0
-    rut_str = str(rut_number)
-    
-    for i in range(len(rut_str)):
-        sum_value += int(rut_str[-(i+1)]) * serie[i % len(serie)]
-    
-    dv = 11 - (sum_value % 11)
-    
-    if dv == 11:
-        dv = '0'
-    elif dv == 10:
-        dv = 'K'
-    else:
-        dv = str(dv)
-    
-    return f"{rut_number}-{dv}"
+    return f"{rut_number}-{rut_engine.check_digit(str(rut_number))}"
 
 
 def create_test_users(db, count: int = 5):
@@ -98,21 +83,15 @@ def create_test_persons(db, users, count: int = 50):
         rut = generate_valid_rut()
         
         # Verificar que el RUT no exista ya encriptado
-        rut_hash = SecurityService.hash_rut(rut)
-        if db.query(Person).filter(Person.rut_hash == rut_hash).first():
+        if PersonRepository(db).get_by_rut(rut):
             continue
         
         # Seleccionar religión aleatoria
         religion = random.choice(RELIGIONES)
         religion_hash, salt = SecurityService.hash_religion(religion)
         
-        # Encriptar RUT
-        encrypted_rut = SecurityService.encrypt_rut(rut)
-        
         # Crear persona
         person = Person(
-            rut=encrypted_rut,  # RUT encriptado
-            rut_hash=rut_hash,  # Hash del RUT para búsquedas
             nombre=fake.first_name(),
             apellido=fake.last_name(),
             religion_hash=religion_hash,
@@ -123,6 +102,9 @@ def create_test_persons(db, users, count: int = 50):
             fecha_nacimiento=fake.date_of_birth(minimum_age=18, maximum_age=80) if random.random() > 0.2 else None,
             created_by=random.choice(users).id
         )
+        # Encriptar RUT en el formato configurado y generar su índice de búsqueda
+        person.set_rut(rut)
+        person.set_rut_hash(rut)
         
         db.add(person)
         created_persons.append(person)
@@ -0,0 +1,111 @@
+"""
+Publicación/suscripción mínima para avisos entre procesos (invalidación de cachés).
+
+PubSubBackend define la interfaz: publish(channel, message) entrega el mensaje
+a todos los suscriptores del canal, incluido el propio proceso. InMemoryPubSub
+la implementa dentro de un proceso (pruebas y despliegues de un solo worker);
+RedisPubSub reparte los mensajes entre workers y máquinas con Redis (requiere el
+paquete redis). Otros backends se registran en PUBSUB_BACKENDS.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[str], None]
+
+
+class PubSubBackend:
+    """Interfaz de un backend de publicación/suscripción de mensajes de texto"""
+
+    def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Liberar conexiones e hilos del backend"""
+
+
+class InMemoryPubSub(PubSubBackend):
+    """Entrega síncrona a los suscriptores del mismo proceso"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Error en suscriptor del canal %s", channel)
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        with self._lock:
+            if callback not in self._subscribers[channel]:
+                self._subscribers[channel].append(callback)
+
+    def close(self) -> None:
+        with self._lock:
+            self._subscribers.clear()
+
+
+class RedisPubSub(PubSubBackend):
+    """
+    Canales de Redis. Los mensajes recibidos se entregan desde un hilo de
+    escucha propio, así que los suscriptores deben ser seguros entre hilos.
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._thread = None
+
+    def publish(self, channel: str, message: str) -> None:
+        try:
+            self._client.publish(channel, message)
+        except Exception:
+            # Sin Redis los demás procesos dependen del TTL de sus entradas
+            logger.exception("No se pudo publicar en el canal %s", channel)
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        def handler(event):
+            try:
+                callback(event["data"])
+            except Exception:
+                logger.exception("Error en suscriptor del canal %s", channel)
+
+        self._pubsub.subscribe(**{channel: handler})
+        if self._thread is None:
+            self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        self._pubsub.close()
+        self._client.close()
+
+
+PUBSUB_BACKENDS: Dict[str, Callable[[Optional[str]], PubSubBackend]] = {
+    "memory": lambda url: InMemoryPubSub(),
+    "redis": lambda url: RedisPubSub(url),
+}
+
+
+def create_pubsub(backend: str, url: Optional[str] = None) -> PubSubBackend:
+    """Crear el backend configurado (memory, redis o uno registrado en PUBSUB_BACKENDS)"""
+    try:
+        factory = PUBSUB_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de pub/sub no soportado: {backend}")
+    return factory(url)
@@ -32,19 +32,38 @@ class ResponseUtils:
         items: List[Any],
         total: int,
         page: int,
-        per_page: int
+        per_page: int,
+        next_cursor: Optional[str] = None,
+        prev_cursor: Optional[str] = None,
+        total_is_exact: bool = True,
+        count_strategy: str = "exact"
     ) -> PaginatedResponse:
-        """Crear respuesta paginada"""
+        """
+        Crear respuesta paginada.
+
+        Si se entregan cursores keyset, has_next/has_prev se derivan de ellos y no
+        del número de página. total_is_exact y count_strategy indican cómo se
+        obtuvo el total (ver app.db.counting).
+        """
         pages = (total + per_page - 1) // per_page  # Ceiling division
         
+        if next_cursor is not None or prev_cursor is not None:
+            has_next, has_prev = next_cursor is not None, prev_cursor is not None
+        else:
+            has_next, has_prev = page < pages, page > 1
+        
         return PaginatedResponse(
             items=items,
             total=total,
             page=page,
             per_page=per_page,
             pages=pages,
-            has_next=page < pages,
-            has_prev=page > 1
+            has_next=has_next,
+            has_prev=has_prev,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+            total_is_exact=total_is_exact,
+            count_strategy=count_strategy
         )
     
     @staticmethod
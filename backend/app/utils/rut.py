@@ -5,6 +5,8 @@ Utilidades para validación de RUT chileno.
 import re
 from typing import Optional
 
+from app.core import rut_engine
+
 
 class RutValidator:
     """Validador de RUT chileno"""
@@ -23,18 +25,7 @@ class RutValidator:
         if len(clean) < 8:
             return rut
         
-        # Separar número y dígito verificador
-        numero = clean[:-1]
-        dv = clean[-1]
-        
-        # Agregar puntos cada 3 dígitos desde la derecha
-        formatted = ""
-        for i, digit in enumerate(reversed(numero)):
-            if i > 0 and i % 3 == 0:
-                formatted = "." + formatted
-            formatted = digit + formatted
-        
-        return f"{formatted}-{dv}"
+        return rut_engine.format_rut(clean)
     
     @staticmethod
     def validate_rut(rut: str) -> bool:
@@ -60,39 +51,14 @@ class RutValidator:
         """Validar dígito verificador del RUT"""
         if len(rut) < 8:
             return False
-        
-        rut_digits = rut[:-1]
-        dv = rut[-1]
-        
-        try:
-            suma = 0
-            multiplicador = 2
-            
-            for digit in reversed(rut_digits):
-                suma += int(digit) * multiplicador
-                multiplicador = multiplicador + 1 if multiplicador < 7 else 2
-            
-            resto = suma % 11
-            dv_calculado = 'K' if resto == 1 else '0' if resto == 0 else str(11 - resto)
-            
-            return dv == dv_calculado
-        except (ValueError, IndexError):
-            return False
+        return rut_engine.has_valid_check_digit(rut)
     
     @staticmethod
     def generate_dv(rut_number: str) -> str:
         """Generar dígito verificador para un número de RUT"""
         try:
-            suma = 0
-            multiplicador = 2
-            
-            for digit in reversed(rut_number):
-                suma += int(digit) * multiplicador
-                multiplicador = multiplicador + 1 if multiplicador < 7 else 2
-            
-            resto = suma % 11
-            return 'K' if resto == 1 else '0' if resto == 0 else str(11 - resto)
-        except (ValueError, IndexError):
+            return rut_engine.check_digit(rut_number)
+        except ValueError:
             return ""
     
     @staticmethod
@@ -115,7 +81,7 @@ class RutValidator:
             raise ValueError("El número base debe estar entre 1,000,000 y 99,999,999")
         
         # Calcular dígito verificador
-        dv = RutValidator.calculate_dv(str(base_number))
+        dv = rut_engine.check_digit(str(base_number))
         
         # Formatear RUT
         rut = f"{base_number}{dv}"
@@ -141,4 +107,4 @@ def format_rut(rut: str) -> str:
 
 def clean_rut(rut: str) -> str:
     """Función de compatibilidad para testing"""
-    return RutValidator.clean_rut(rut)
+    return RutValidator.clean_rut(rut)
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Benchmarks de rendimiento del backend (se ejecutan como módulos desde backend/)
+"""
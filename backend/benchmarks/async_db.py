@@ -0,0 +1,163 @@
+"""
+Prueba de carga de la capa de base de datos de las rutas: sesión síncrona
+dentro de un handler async (get_db, como antes) frente a AsyncSession
+(get_async_db).
+
+Monta dos rutas equivalentes que leen una página de audit_logs con
+AuditRepository / AsyncAuditRepository más una consulta lenta simulada en la
+base (pg_sleep en PostgreSQL, una función sleep registrada en SQLite), y las
+carga con un número creciente de peticiones concurrentes. Con la sesión
+síncrona cada consulta bloquea el event loop y el rendimiento queda plano en
+una consulta en vuelo; con AsyncSession escala hasta el tamaño del pool.
+
+Por defecto usa un archivo SQLite temporal; con --database-url se puede medir
+en PostgreSQL (usar una base de pruebas: la tabla audit_logs se crea y se
+vacía).
+
+Uso:
+    python -m benchmarks.async_db
+    python -m benchmarks.async_db --latency-ms 50 --concurrency 1 4 16 64
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.database import Base, async_database_url
+from app.models.audit_log import AuditLog
+from app.repositories.audit import AsyncAuditRepository, AuditRepository
+
+
+def _sleep_statement(dialect: str, latency_ms: float):
+    """Consulta que tarda latency_ms en la base"""
+    if dialect == "postgresql":
+        return text("SELECT pg_sleep(:seconds)").bindparams(seconds=latency_ms / 1000)
+    return text("SELECT sleep(:ms)").bindparams(ms=latency_ms)
+
+
+def _register_sqlite_sleep(engine) -> None:
+    """Registrar sleep(ms) en cada conexión SQLite (se ejecuta en el hilo de la conexión)"""
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, _):
+        dbapi_connection.create_function("sleep", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+
+def _build_app(sync_factory, async_factory, sleep) -> FastAPI:
+    """Rutas equivalentes con sesión síncrona y con AsyncSession"""
+    app = FastAPI()
+
+    def get_sync_db():
+        db = sync_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with async_factory() as db:
+            yield db
+
+    @app.get("/sync")
+    async def sync_route(db: Session = Depends(get_sync_db)):
+        db.execute(sleep)
+        return {"items": len(AuditRepository(db).get_logs_page(limit=20)["items"])}
+
+    @app.get("/async")
+    async def async_route(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(sleep)
+        return {"items": len((await AsyncAuditRepository(db).get_logs_page(limit=20))["items"])}
+
+    return app
+
+
+async def _load(app: FastAPI, path: str, concurrency: int, requests: int) -> float:
+    """Peticiones por segundo con concurrency peticiones en vuelo"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        pending = iter(range(requests))
+
+        async def worker():
+            for _ in pending:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def _run(args, sync_engine, async_engine) -> List[Dict]:
+    dialect = sync_engine.dialect.name
+    sleep = _sleep_statement(dialect, args.latency_ms)
+    app = _build_app(
+        sessionmaker(bind=sync_engine, autoflush=False),
+        async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False),
+        sleep,
+    )
+    results = []
+    for concurrency in args.concurrency:
+        requests = max(args.requests, concurrency * 4)
+        results.append({
+            "concurrency": concurrency,
+            "sync": await _load(app, "/sync", concurrency, requests),
+            "async": await _load(app, "/async", concurrency, requests),
+        })
+    await async_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga de sesión síncrona frente a AsyncSession")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--pool-size", type=int, default=32)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'async_db.sqlite')}"
+    sqlite = make_url(database_url).get_backend_name() == "sqlite"
+
+    sync_engine = create_engine(database_url, pool_size=args.pool_size, max_overflow=0,
+                                **({"connect_args": {"check_same_thread": False}} if sqlite else {}))
+    async_engine = create_async_engine(async_database_url(database_url),
+                                       **({} if sqlite else {"pool_size": args.pool_size, "max_overflow": 0}))
+    if sqlite:
+        _register_sqlite_sleep(sync_engine)
+        _register_sqlite_sleep(async_engine.sync_engine)
+
+    Base.metadata.create_all(sync_engine, tables=[AuditLog.__table__])
+    with sync_engine.begin() as connection:
+        connection.execute(AuditLog.__table__.delete())
+        start = datetime.now(timezone.utc) - timedelta(days=1)
+        connection.execute(insert(AuditLog), [
+            {"user_id": i % 50, "action": "READ", "resource": "persons",
+             "timestamp": start + timedelta(seconds=i)}
+            for i in range(5_000)
+        ])
+
+    results = asyncio.run(_run(args, sync_engine, async_engine))
+
+    print(f"latencia simulada por petición: {args.latency_ms:.0f} ms "
+          f"(máximo teórico en serie: {1000 / args.latency_ms:.0f} req/s)")
+    print(f"{'concurrencia':>12} {'síncrona req/s':>15} {'async req/s':>12} {'mejora':>7}")
+    for row in results:
+        print(f"{row['concurrency']:>12} {row['sync']:>15.0f} {row['async']:>12.0f} "
+              f"{row['async'] / row['sync']:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark de bcrypt en el event loop frente al pool acotado.
+
+Lanza N verificaciones de contraseña concurrentes, como N logins simultáneos,
+mientras un latido de 10 ms mide cuánto se retrasa el event loop. Con bcrypt
+dentro del handler (como antes) cada verificación congela el loop completo;
+con password_hasher el loop sigue atendiendo y las operaciones que exceden
+la capacidad del pool se rechazan con 503 en lugar de encolarse sin límite.
+
+Uso:
+    python -m benchmarks.password_hash
+    python -m benchmarks.password_hash --logins 4 16 64 --workers 2 --queue 8
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from app.core.config import settings
+from app.core.password_hasher import PasswordHashPool, PasswordHashPoolSaturated
+from app.core.security_utils import SecurityUtils
+
+PASSWORD = "Admin123!"
+
+
+async def _heartbeat(stop: asyncio.Event, lags: List[float], interval: float = 0.01) -> None:
+    """Retraso de cada latido respecto de su hora prevista"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _run(logins: int, verify) -> Dict[str, float]:
+    stop = asyncio.Event()
+    lags: List[float] = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(0.02)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+    return {
+        "elapsed": elapsed,
+        "max_lag_ms": max(lags, default=0.0) * 1000,
+        "rejected": sum(isinstance(result, PasswordHashPoolSaturated) for result in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de bcrypt en el event loop frente al pool")
+    parser.add_argument("--logins", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--workers", type=int, default=0, help="Hilos del pool (0 = núcleos)")
+    parser.add_argument("--queue", type=int, default=settings.PASSWORD_HASH_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    settings.PASSWORD_HASH_MAX_WORKERS = args.workers
+    settings.PASSWORD_HASH_QUEUE_SIZE = args.queue
+    hashed = SecurityUtils.get_password_hash(PASSWORD)
+    pool = PasswordHashPool()
+
+    async def inline():
+        return SecurityUtils.verify_password(PASSWORD, hashed)
+
+    async def pooled():
+        return await pool.verify(PASSWORD, hashed)
+
+    print(f"pool: {pool.capacity - args.queue} hilos + {args.queue} en cola")
+    print(f"{'logins':>7} {'en loop s':>10} {'latido máx ms':>14} {'pool s':>7} {'latido máx ms':>14} {'503':>5}")
+    for logins in args.logins:
+        blocking = asyncio.run(_run(logins, inline))
+        pooled_result = asyncio.run(_run(logins, pooled))
+        print(f"{logins:>7} {blocking['elapsed']:>10.2f} {blocking['max_lag_ms']:>14.0f} "
+              f"{pooled_result['elapsed']:>7.2f} {pooled_result['max_lag_ms']:>14.0f} "
+              f"{pooled_result['rejected']:>5}")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de desencriptación de RUT para listados.
+
+Compara el costo por fila de decrypt_rut fila a fila con decrypt_ruts_batch
+(en proceso, listados) y decrypt_ruts_bulk con pool de procesos (tareas
+masivas), para lotes de distintos tamaños.
+
+Uso:
+    python -m benchmarks.rut_decrypt
+    python -m benchmarks.rut_decrypt --sizes 10 100 10000 --workers 4
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+from app.core import rut_engine
+from app.core.config import settings
+from app.core.security_service import SecurityService
+
+
+def _sample_ruts(size: int) -> List[str]:
+    """RUT válidos cifrados con la clave actual"""
+    ruts = []
+    for number in range(10_000_000, 10_000_000 + size):
+        body = str(number)
+        ruts.append(SecurityService.encrypt_rut(body + rut_engine.check_digit(body)))
+    return ruts
+
+
+def _per_row_us(function: Callable, encrypted_ruts: List[str], repeat: int) -> float:
+    """Mejor tiempo por fila (microsegundos) de repeat ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(encrypted_ruts)
+        best = min(best, time.perf_counter() - started)
+    return best / len(encrypted_ruts) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de desencriptación de RUT")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=settings.RUT_DECRYPT_POOL_WORKERS)
+    args = parser.parse_args()
+
+    settings.RUT_DECRYPT_POOL_WORKERS = args.workers
+
+    def serial(encrypted_ruts):
+        return [SecurityService.decrypt_rut(encrypted_rut) for encrypted_rut in encrypted_ruts]
+
+    def batch(encrypted_ruts):
+        return SecurityService.decrypt_ruts_batch(encrypted_ruts)
+
+    def pooled(encrypted_ruts):
+        settings.RUT_DECRYPT_POOL_THRESHOLD = 1
+        return SecurityService.decrypt_ruts_bulk(encrypted_ruts)
+
+    # Crear el pool antes de medir
+    pooled(_sample_ruts(1))
+
+    print(f"{'filas':>8} {'fila a fila':>14} {'lote':>14} {'lote + pool':>14}   (µs por fila)")
+    try:
+        for size in args.sizes:
+            encrypted_ruts = _sample_ruts(size)
+            expected = serial(encrypted_ruts)
+            assert batch(encrypted_ruts) == expected and pooled(encrypted_ruts) == expected
+            print(f"{size:>8} "
+                  f"{_per_row_us(serial, encrypted_ruts, args.repeat):>14.1f} "
+                  f"{_per_row_us(batch, encrypted_ruts, args.repeat):>14.1f} "
+                  f"{_per_row_us(pooled, encrypted_ruts, args.repeat):>14.1f}")
+    finally:
+        SecurityService.shutdown_decrypt_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark del motor de RUT: operaciones por lotes (NumPy) frente a escalares.
+
+Mide limpieza, validación, formato y cálculo de dígito verificador sobre
+listas de RUT con puntos y guión, llamando a la función escalar por cada RUT
+o a la función por lotes una vez para toda la lista.
+
+Uso:
+    python -m benchmarks.rut_engine
+    python -m benchmarks.rut_engine --sizes 1000 100000 500000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from app.core import rut_engine
+
+
+def _sample_ruts(size: int, invalid_ratio: float = 0.1) -> List[str]:
+    """RUT formateados, una fracción con dígito verificador incorrecto"""
+    rng = random.Random(size)
+    ruts = []
+    for _ in range(size):
+        body = str(rng.randint(1_000_000, 99_999_999))
+        digit = rut_engine.check_digit(body)
+        if rng.random() < invalid_ratio:
+            digit = rng.choice([char for char in rut_engine.CHECK_DIGIT_CHARS if char != digit])
+        ruts.append(rut_engine.format_rut(body + digit))
+    return ruts
+
+
+def _best_seconds(function: Callable, argument, repeat: int) -> float:
+    """Mejor tiempo de repeat ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del motor de RUT")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 200_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    operations = {
+        "clean": (
+            lambda ruts: [rut_engine.clean_rut(rut) for rut in ruts],
+            lambda ruts: rut_engine.clean_ruts(ruts),
+        ),
+        "validate": (
+            lambda ruts: [rut_engine.validate_rut(rut) for rut in ruts],
+            lambda ruts: rut_engine.validate_ruts(ruts).tolist(),
+        ),
+        "format": (
+            lambda ruts: [rut_engine.format_rut(rut) for rut in ruts],
+            lambda ruts: rut_engine.format_ruts(ruts),
+        ),
+    }
+
+    print(f"{'operación':>10} {'filas':>8} {'escalar':>12} {'lote':>12} {'aceleración':>12}   (filas/s)")
+    for size in args.sizes:
+        ruts = _sample_ruts(size)
+        numbers = [int(rut_engine.clean_rut(rut)[:-1]) for rut in ruts]
+        cases = {name: (scalar, batch, ruts) for name, (scalar, batch) in operations.items()}
+        cases["check_digit"] = (
+            lambda values: [rut_engine.check_digit(str(value)) for value in values],
+            lambda values: rut_engine.check_digits(values).tolist(),
+            numbers,
+        )
+        for name, (scalar, batch, data) in cases.items():
+            assert scalar(data) == batch(data), name
+            scalar_seconds = _best_seconds(scalar, data, args.repeat)
+            batch_seconds = _best_seconds(batch, data, args.repeat)
+            print(f"{name:>10} {size:>8} {size / scalar_seconds:>12,.0f} {size / batch_seconds:>12,.0f} "
+                  f"{scalar_seconds / batch_seconds:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
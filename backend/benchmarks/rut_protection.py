@@ -0,0 +1,98 @@
+"""
+Benchmark de los formatos de protección de RUT: Fernet + índice ciego
+(RUT_STORAGE_FORMAT=binary) frente a AES-SIV determinista (siv).
+
+Para cada formato inserta N personas con Person.set_rut/set_rut_hash (como
+PersonRepository.create_person), mide filas insertadas por segundo, el tamaño
+de los índices únicos y búsquedas por segundo con PersonRepository.get_by_rut.
+Por defecto usa SQLite en memoria; con --database-url se puede medir en
+PostgreSQL (usar una base de pruebas: la tabla persons se crea y se vacía).
+
+Uso:
+    python -m benchmarks.rut_protection
+    python -m benchmarks.rut_protection --rows 50000 --lookups 5000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import rut_engine
+from app.core.config import settings
+from app.db.database import Base
+from app.models.person import Person
+from app.repositories.person import PersonRepository
+from benchmarks.rut_storage import _index_bytes
+
+
+def _measure(session, storage_format: str, ruts, lookups) -> Dict:
+    """Insertar ruts en el formato dado y buscar lookups; retorna las mediciones"""
+    settings.RUT_STORAGE_FORMAT = storage_format
+    session.execute(Person.__table__.delete())
+    session.commit()
+
+    started = time.perf_counter()
+    for start in range(0, len(ruts), 1000):
+        for rut in ruts[start:start + 1000]:
+            person = Person(nombre="a", apellido="b", religion_hash="r", religion_salt="s", created_by=1)
+            person.set_rut(rut)
+            person.set_rut_hash(rut)
+            session.add(person)
+        session.commit()
+    insert_s = time.perf_counter() - started
+
+    repository = PersonRepository(session)
+    started = time.perf_counter()
+    for rut in lookups:
+        assert repository.get_by_rut(rut) is not None
+    lookup_s = time.perf_counter() - started
+    session.expunge_all()
+
+    return {
+        "insert": len(ruts) / insert_s,
+        "lookup": len(lookups) / lookup_s,
+        "rut_hash": _index_bytes(session, "uq_person_rut_hash"),
+        "rut_data": _index_bytes(session, "uq_person_rut_data"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de protección de RUT")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url, poolclass=StaticPool,
+                           connect_args={"check_same_thread": False} if args.database_url.startswith("sqlite") else {})
+    Base.metadata.create_all(engine, tables=[Person.__table__])
+    session = sessionmaker(bind=engine)()
+
+    ruts = [f"{number}-{digit}" for number, digit in zip(
+        range(10_000_000, 10_000_000 + args.rows),
+        rut_engine.check_digits(range(10_000_000, 10_000_000 + args.rows)),
+    )]
+    lookups = random.Random(0).sample(ruts, min(args.lookups, len(ruts)))
+
+    original_format = settings.RUT_STORAGE_FORMAT
+    try:
+        results = {name: _measure(session, name, ruts, lookups) for name in ("binary", "siv")}
+    finally:
+        settings.RUT_STORAGE_FORMAT = original_format
+
+    def kib(size):
+        return f"{size / 1024:.0f} KiB" if size is not None else "n/d"
+
+    print(f"{'formato':>8} {'inserción/s':>12} {'búsqueda/s':>11} {'idx rut_hash':>13} {'idx rut_data':>13}")
+    for name, result in results.items():
+        print(f"{name:>8} {result['insert']:>12,.0f} {result['lookup']:>11,.0f} "
+              f"{kib(result['rut_hash']):>13} {kib(result['rut_data']):>13}")
+
+
+if __name__ == "__main__":
+    main()
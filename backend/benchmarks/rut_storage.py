@@ -0,0 +1,94 @@
+"""
+Benchmark del almacenamiento de RUT cifrados: formato texto (rut, token
+Fernet en base64) frente a formato binario (rut_data, versión + token).
+
+Carga N personas en formato texto, mide el tamaño del índice único y el costo
+de desencriptar, las convierte con la migración por lotes y vuelve a medir.
+Por defecto usa SQLite en memoria; con --database-url se puede medir en
+PostgreSQL (usar una base de pruebas: la tabla persons se crea y se vacía).
+
+Uso:
+    python -m benchmarks.rut_storage
+    python -m benchmarks.rut_storage --rows 50000
+"""
+
+import argparse
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.security_service import SecurityService
+from app.db.database import Base
+from app.db.rut_storage import migrate_chunk
+from app.models.person import Person
+
+from benchmarks.rut_decrypt import _sample_ruts
+
+
+def _index_bytes(session, name: str) -> Optional[int]:
+    """Tamaño en disco de un índice (PostgreSQL o SQLite con dbstat)"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return session.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": name}).scalar()
+    if dialect == "sqlite":
+        return session.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"), {"name": name}).scalar()
+    return None
+
+
+def _decrypt_us(values: List, repeat: int = 3) -> float:
+    """Mejor tiempo por fila (microsegundos) de decrypt_ruts_batch sin pool"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        SecurityService.decrypt_ruts_batch(values)
+        best = min(best, time.perf_counter() - started)
+    return best / len(values) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de almacenamiento de RUT")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url, poolclass=StaticPool,
+                           connect_args={"check_same_thread": False} if args.database_url.startswith("sqlite") else {})
+    Base.metadata.create_all(engine, tables=[Person.__table__, Base.metadata.tables["job_checkpoints"]])
+    session = sessionmaker(bind=engine)()
+    session.execute(Person.__table__.delete())
+    session.execute(text("DELETE FROM job_checkpoints"))
+
+    encrypted = _sample_ruts(args.rows)
+    session.execute(insert(Person), [
+        {"rut": value, "rut_hash": f"{i:064d}", "nombre": "a", "apellido": "b",
+         "religion_hash": "r", "religion_salt": "s", "created_by": 1}
+        for i, value in enumerate(encrypted)
+    ])
+    session.commit()
+    text_index = _index_bytes(session, "ix_persons_rut")
+    text_values = [row.rut for row in session.query(Person.rut)]
+    text_us = _decrypt_us(text_values)
+
+    started = time.perf_counter()
+    while not migrate_chunk(session)["done"]:
+        pass
+    session.commit()
+    migration_s = time.perf_counter() - started
+    binary_index = _index_bytes(session, "uq_person_rut_data")
+    binary_values = [bytes(row.rut_data) for row in session.query(Person.rut_data)]
+    binary_us = _decrypt_us(binary_values)
+
+    def kib(size):
+        return f"{size / 1024:.0f} KiB" if size is not None else "n/d"
+
+    print(f"{'formato':>8} {'bytes/valor':>12} {'índice':>10} {'µs/fila':>9}")
+    print(f"{'texto':>8} {sum(map(len, text_values)) / args.rows:>12.0f} {kib(text_index):>10} {text_us:>9.1f}")
+    print(f"{'binario':>8} {sum(map(len, binary_values)) / args.rows:>12.0f} {kib(binary_index):>10} {binary_us:>9.1f}")
+    print(f"migración: {args.rows} filas en {migration_s:.2f}s ({args.rows / migration_s:.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
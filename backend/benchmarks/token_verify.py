@@ -0,0 +1,62 @@
+"""
+Benchmark de verificación de tokens JWT.
+
+Compara el costo por llamada de SecurityUtils.verify_token con la caché de
+tokens verificados desactivada (parseo + firma HMAC en cada llamada) y
+activada, repitiendo el mismo token como en una ráfaga del frontend. Ambos
+incluyen la verificación de revocación (negativo del filtro de Bloom).
+
+Uso:
+    python -m benchmarks.token_verify
+    python -m benchmarks.token_verify --calls 50000 --tokens 1 10 100
+"""
+
+import argparse
+import time
+from datetime import timedelta
+from typing import List
+
+from app.core import token_cache
+from app.core.config import settings
+from app.core.security_utils import SecurityUtils
+
+
+def _tokens(count: int) -> List[str]:
+    return [
+        SecurityUtils.create_access_token({"sub": f"user{i}@example.com"}, timedelta(minutes=30))
+        for i in range(count)
+    ]
+
+
+def _per_call_us(tokens: List[str], calls: int, repeat: int) -> float:
+    """Mejor tiempo por llamada (microsegundos) de repeat ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        token_cache.token_cache.clear()
+        started = time.perf_counter()
+        for i in range(calls):
+            SecurityUtils.verify_token(tokens[i % len(tokens)])
+        best = min(best, time.perf_counter() - started)
+    return best / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de verificación de tokens JWT")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1, 10, 100],
+                        help="Tokens distintos que se alternan en las llamadas")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'sin caché µs':>13} {'con caché µs':>13} {'mejora':>7}")
+    for count in args.tokens:
+        tokens = _tokens(count)
+        settings.TOKEN_CACHE_ENABLED = False
+        uncached = _per_call_us(tokens, args.calls, args.repeat)
+        settings.TOKEN_CACHE_ENABLED = True
+        cached = _per_call_us(tokens, args.calls, args.repeat)
+        print(f"{count:>8} {uncached:>13.1f} {cached:>13.1f} {uncached / cached:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
+from starlette.concurrency import run_in_threadpool
 from prometheus_fastapi_instrumentator import Instrumentator
 from prometheus_client import Gauge
 import psutil
@@ -22,7 +23,21 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 # Importar configuraciones y componentes
 from app.core.config import settings
+from app.core.security_service import SecurityService
+from app.core.hash_executor import religion_hash_executor
+from app.core.password_hasher import password_hasher
 from app.api import auth_router, users_router, persons_router, audit_router
+from app.db.audit_writer import audit_writer
+from app.db.database import engine, dispose_async_engine
+from app.db.partitions import PartitionMaintenance
+from app.db.audit_rollup import RollupCompactor
+from app.db.rut_reencryption import RutReencryptionJob
+from app.db.rut_blind_index import RutBlindIndexJob
+from app.db.rut_storage import RutStorageMigrationJob
+from app.db.rut_masked import RutMaskedBackfillJob
+from app.middleware.audit import setup_audit_context
+from app.services.principals import start_principal_invalidation, stop_principal_invalidation
+from app.core.token_revocation import start_token_revocation, stop_token_revocation
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -45,6 +60,9 @@ app.add_middleware(
     max_age=600,  # Tiempo en segundos que el navegador puede cachear la respuesta preflight
 )
 
+# Un registro de auditoría consolidado por petición (servicio + ruta)
+setup_audit_context(app)
+
 # Configurar instrumentación de Prometheus
 print("🔧 Configurando instrumentación de Prometheus...")
 instrumentator = Instrumentator(
@@ -66,6 +84,10 @@ print("🔧 Exponiendo endpoint /metrics...")
 instrumentator.expose(app, endpoint="/metrics")
 print("✅ Instrumentación de Prometheus configurada en /metrics")
 
+# Las métricas del escritor diferido de auditoría (audit_queue_depth,
+# audit_flush_duration_seconds, ...) se registran en app.db.audit_writer y
+# quedan expuestas en el mismo endpoint /metrics.
+
 # Crear métricas personalizadas del sistema
 cpu_usage_gauge = Gauge('system_cpu_usage_percent', 'CPU usage percentage')
 memory_usage_gauge = Gauge('system_memory_usage_percent', 'Memory usage percentage')
@@ -115,6 +137,190 @@ app.include_router(users_router, prefix="/api/users", tags=["Usuarios"])
 app.include_router(persons_router, prefix="/api/persons", tags=["Personas"])
 app.include_router(audit_router, prefix="/api/audit", tags=["Auditoría"])
 
+@app.on_event("startup")
+async def warm_up_security():
+    """Derivar claves e inicializar los hashers antes de atender la primera petición"""
+    if settings.SECURITY_WARMUP_ENABLED:
+        timings = await run_in_threadpool(SecurityService.warm_up)
+        print("✅ Seguridad precalentada: " + ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()
+        ))
+
+
+@app.on_event("startup")
+async def start_audit_writer():
+    """Iniciar el escritor diferido de logs de auditoría"""
+    if settings.AUDIT_ASYNC_WRITES:
+        audit_writer.start()
+        print(f"✅ Escritor de auditoría por lotes iniciado (lote: {settings.AUDIT_BATCH_SIZE}, "
+              f"intervalo: {settings.AUDIT_FLUSH_INTERVAL}s, cola: {settings.AUDIT_QUEUE_MAX_SIZE})")
+
+
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    """Vaciar la cola de auditoría antes de terminar el proceso"""
+    audit_writer.stop()
+    print("✅ Cola de auditoría vaciada")
+
+
+# Creación automática de las particiones mensuales de audit_logs de los próximos meses
+partition_maintenance = PartitionMaintenance(engine)
+
+
+@app.on_event("startup")
+async def start_partition_maintenance():
+    """Iniciar la creación periódica de particiones de auditoría"""
+    partition_maintenance.start()
+
+
+@app.on_event("shutdown")
+async def stop_partition_maintenance():
+    """Detener la creación periódica de particiones de auditoría"""
+    partition_maintenance.stop()
+
+
+# Compactación periódica de los agregados horarios usados por las estadísticas
+rollup_compactor = RollupCompactor()
+
+
+@app.on_event("startup")
+async def start_rollup_compactor():
+    """Iniciar la compactación periódica de agregados de auditoría"""
+    if settings.AUDIT_ROLLUP_ENABLED:
+        rollup_compactor.start()
+
+
+@app.on_event("shutdown")
+async def stop_rollup_compactor():
+    """Detener la compactación periódica de agregados de auditoría"""
+    rollup_compactor.stop()
+
+
+# Re-cifrado en línea de RUT mientras haya claves anteriores configuradas (rotación)
+rut_reencryption_job = RutReencryptionJob()
+
+
+@app.on_event("startup")
+async def start_rut_reencryption():
+    """Iniciar el re-cifrado de RUT con la clave actual"""
+    if settings.RUT_REENCRYPTION_ENABLED and settings.rut_previous_keys_list:
+        rut_reencryption_job.start()
+        print(f"✅ Re-cifrado de RUT iniciado (lote: {settings.RUT_REENCRYPTION_CHUNK_SIZE})")
+
+
+@app.on_event("shutdown")
+async def stop_rut_reencryption():
+    """Detener el re-cifrado de RUT (se reanuda en el próximo inicio)"""
+    rut_reencryption_job.stop()
+
+
+# Recálculo del índice ciego de RUT (filas con otra normalización o clave)
+rut_blind_index_job = RutBlindIndexJob()
+
+
+@app.on_event("startup")
+async def start_rut_blind_index():
+    """Iniciar el recálculo del índice ciego de RUT desde su punto de control"""
+    if settings.RUT_BLIND_INDEX_BACKFILL_ENABLED:
+        rut_blind_index_job.start()
+        print(f"✅ Recálculo del índice ciego de RUT iniciado (lote: {settings.RUT_BLIND_INDEX_CHUNK_SIZE})")
+
+
+@app.on_event("shutdown")
+async def stop_rut_blind_index():
+    """Detener el recálculo del índice ciego de RUT (se reanuda en el próximo inicio)"""
+    rut_blind_index_job.stop()
+
+
+# Migración en línea de RUT al formato configurado (rut -> rut_data, Fernet <-> AES-SIV)
+rut_storage_migration_job = RutStorageMigrationJob()
+
+
+@app.on_event("startup")
+async def start_rut_storage_migration():
+    """Iniciar la conversión de RUT al formato configurado desde su punto de control"""
+    if settings.RUT_STORAGE_MIGRATION_ENABLED and settings.RUT_STORAGE_FORMAT in ("binary", "siv"):
+        rut_storage_migration_job.start()
+        print(f"✅ Migración de RUT a formato {settings.RUT_STORAGE_FORMAT} iniciada "
+              f"(lote: {settings.RUT_STORAGE_MIGRATION_CHUNK_SIZE})")
+
+
+@app.on_event("shutdown")
+async def stop_rut_storage_migration():
+    """Detener la migración de formato de RUT (se reanuda en el próximo inicio)"""
+    rut_storage_migration_job.stop()
+
+
+# Completado de persons.rut_masked para filas escritas antes de la columna
+rut_masked_backfill_job = RutMaskedBackfillJob()
+
+
+@app.on_event("startup")
+async def start_rut_masked_backfill():
+    """Iniciar el completado de rut_masked desde su punto de control"""
+    if settings.RUT_MASKED_BACKFILL_ENABLED:
+        rut_masked_backfill_job.start()
+        print(f"✅ Completado de RUT ofuscado iniciado (lote: {settings.RUT_MASKED_BACKFILL_CHUNK_SIZE})")
+
+
+@app.on_event("shutdown")
+async def stop_rut_masked_backfill():
+    """Detener el completado de rut_masked (se reanuda en el próximo inicio)"""
+    rut_masked_backfill_job.stop()
+
+
+@app.on_event("shutdown")
+async def stop_rut_decrypt_pool():
+    """Cerrar el pool de procesos de desencriptación de RUT"""
+    SecurityService.shutdown_decrypt_pool()
+
+
+@app.on_event("shutdown")
+async def stop_religion_hash_executor():
+    """Cerrar el executor de hash de religión"""
+    religion_hash_executor.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    """Cerrar el pool bcrypt de contraseñas"""
+    password_hasher.shutdown()
+
+
+@app.on_event("startup")
+async def start_principal_cache():
+    """Suscribir la caché de usuarios autenticados a las invalidaciones de otros workers"""
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        start_principal_invalidation()
+        print(f"✅ Caché de usuarios autenticados (TTL: {settings.PRINCIPAL_CACHE_TTL}s, "
+              f"invalidación: {settings.PRINCIPAL_CACHE_PUBSUB_BACKEND})")
+
+
+@app.on_event("shutdown")
+async def stop_principal_cache():
+    """Cerrar la suscripción de invalidaciones de la caché de usuarios autenticados"""
+    stop_principal_invalidation()
+
+
+@app.on_event("startup")
+async def start_token_revocation_filter():
+    """Cargar el filtro de tokens revocados y suscribirlo a las revocaciones de otros workers"""
+    start_token_revocation()
+    print(f"✅ Revocación de tokens (almacén: {settings.TOKEN_REVOCATION_BACKEND}, "
+          f"compactación: {settings.TOKEN_REVOCATION_COMPACT_INTERVAL}s)")
+
+
+@app.on_event("shutdown")
+async def stop_token_revocation_filter():
+    """Detener la compactación de revocaciones de tokens"""
+    stop_token_revocation()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """Cerrar las conexiones del engine async de las rutas"""
+    await dispose_async_engine()
+
 # Manejador de errores global
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -161,7 +367,47 @@ async def metrics_info():
             "fastapi_request_size_bytes",
             "fastapi_response_size_bytes",
             "process_cpu_seconds_total",
-            "process_memory_bytes"
+            "process_memory_bytes",
+            "audit_queue_depth",
+            "audit_flush_duration_seconds",
+            "audit_flush_batch_size",
+            "audit_events_written_total",
+            "audit_events_failed_total",
+            "audit_queue_overflow_total",
+            "audit_rollup_duration_seconds",
+            "audit_rollup_lag_seconds",
+            "audit_ingest_rows_total",
+            "audit_ingest_batch_duration_seconds",
+            "audit_facts_merged_total",
+            "rut_reencryption_rows_total",
+            "rut_reencryption_progress_ratio",
+            "rut_reencryption_rows_per_second",
+            "rut_blind_index_rows_total",
+            "rut_blind_index_progress_ratio",
+            "religion_hash_queue_wait_seconds",
+            "religion_hash_duration_seconds",
+            "religion_hash_in_flight",
+            "rut_display_cache_requests_total",
+            "rut_display_cache_entries",
+            "rut_display_cache_bytes",
+            "rut_storage_rows_total",
+            "rut_storage_progress_ratio",
+            "rut_masked_backfill_rows_total",
+            "rut_masked_backfill_progress_ratio",
+            "principal_cache_requests_total",
+            "principal_cache_invalidations_total",
+            "principal_cache_entries",
+            "token_cache_requests_total",
+            "token_revocation_checks_total",
+            "token_revocations_total",
+            "token_revocation_compacted_total",
+            "token_revocation_filter_entries",
+            "password_hash_queue_wait_seconds",
+            "password_hash_duration_seconds",
+            "password_hash_pending",
+            "password_hash_pool_saturation_ratio",
+            "password_hash_rejected_total",
+            "login_duration_seconds"
         ]
     }
 
@@ -7,15 +7,18 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.core.config import settings
-from app.db.database import get_db, Base
+from app.db.database import get_db, get_async_db, async_database_url, Base
 from app.routers import auth_router, users_router, persons_router, audit_router
 from app.models.user import User
-from app.services.user import UserService
+from app.core.security_utils import SecurityUtils
+from app.repositories.user import UserRepository
 from app.schemas.user import UserCreate
+from app.services.principals import principal_cache
 
 # Configuración de base de datos de prueba
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -27,6 +30,10 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine async (aiosqlite) sobre la misma base de prueba para las rutas
+async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL))
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     try:
@@ -36,6 +43,11 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 def create_test_app():
     """Crear aplicación de prueba sin middlewares de seguridad"""
     test_app = FastAPI(title="Test API")
@@ -57,6 +69,7 @@ def create_test_app():
     
     # Override de dependencias
     test_app.dependency_overrides[get_db] = override_get_db
+    test_app.dependency_overrides[get_async_db] = override_get_async_db
     
     return test_app
 
@@ -72,6 +85,8 @@ def test_db():
 @pytest.fixture
 def client(test_db):
     """Cliente de prueba para FastAPI sin middlewares de seguridad"""
+    # Sin usuarios autenticados en caché de pruebas anteriores
+    principal_cache.clear()
     test_app = create_test_app()
     with TestClient(test_app) as test_client:
         yield test_client
@@ -118,16 +133,16 @@ def test_person_data():
 @pytest.fixture
 def authenticated_client(client, test_user_data, db_session):
     """Cliente autenticado para pruebas"""
-    # Crear usuario directamente en la base de datos usando el servicio
-    user_service = UserService(db_session)
+    # Crear usuario directamente en la base de datos usando el repositorio
+    user_repo = UserRepository(db_session)
     user_create = UserCreate(**test_user_data)
     
     # Verificar si el usuario ya existe, si no, crearlo
-    existing_user = user_service.user_repo.get_by_email(test_user_data["email"])
+    existing_user = user_repo.get_by_email(test_user_data["email"])
     if existing_user:
         user = existing_user
     else:
-        user = user_service.create_user_direct(user_create)
+        user = user_repo.create_user(user_create, SecurityUtils.get_password_hash(user_create.password))
         db_session.commit()
     
     # Autenticar usando el endpoint de login
@@ -0,0 +1,171 @@
+"""
+Pruebas de la ingesta masiva de auditoría: validación de eventos, lectura de
+registros NDJSON/CSV en streaming y resultado por lote sobre SQLite.
+"""
+import json
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models.audit_log import AuditLog
+from app.services.audit_ingest import _iter_records, ingest_stream, validate_event
+from tests.conftest import override_get_db
+
+RECEIVED_AT = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+async def _chunks(body: bytes, size: int = 7):
+    """Cuerpo en trozos pequeños, cortando líneas y caracteres multibyte"""
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def _records(body: bytes, format: str):
+    return [record async for record in _iter_records(_chunks(body), format)]
+
+
+@pytest.fixture
+def session_scope(test_db):
+    """Sesiones sobre la base de prueba, como get_session_scope en las rutas"""
+    return contextmanager(override_get_db)
+
+
+# validate_event
+
+def test_validate_event_minimo():
+    row = validate_event({"action": "LOGIN", "resource": "auth"}, RECEIVED_AT)
+    assert row["action"] == "LOGIN"
+    assert row["user_id"] is None
+    assert row["timestamp"] == RECEIVED_AT
+
+
+def test_validate_event_ignora_id_y_convierte_enteros():
+    row = validate_event({"id": 99, "action": "A", "resource": "r", "user_id": " 7 ", "resource_id": 3.0},
+                         RECEIVED_AT)
+    assert "id" not in row
+    assert row["user_id"] == 7
+    assert row["resource_id"] == 3
+
+
+def test_validate_event_campo_desconocido():
+    with pytest.raises(ValueError, match="campos desconocidos: foo"):
+        validate_event({"action": "A", "resource": "r", "foo": 1}, RECEIVED_AT)
+
+
+@pytest.mark.parametrize("value", [2 ** 31, -2 ** 31 - 1, "99999999999"])
+def test_validate_event_entero_fuera_de_int32(value):
+    with pytest.raises(ValueError, match="user_id: fuera de rango"):
+        validate_event({"action": "A", "resource": "r", "user_id": value}, RECEIVED_AT)
+
+
+def test_validate_event_limites_de_int32():
+    row = validate_event({"action": "A", "resource": "r", "user_id": 2 ** 31 - 1,
+                          "resource_id": -2 ** 31}, RECEIVED_AT)
+    assert (row["user_id"], row["resource_id"]) == (2 ** 31 - 1, -2 ** 31)
+
+
+@pytest.mark.parametrize("value", [True, 1.5, "abc"])
+def test_validate_event_entero_invalido(value):
+    with pytest.raises(ValueError, match="user_id: debe ser un entero"):
+        validate_event({"action": "A", "resource": "r", "user_id": value}, RECEIVED_AT)
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("2026-03-04T05:06:07", datetime(2026, 3, 4, 5, 6, 7, tzinfo=timezone.utc)),
+    ("2026-03-04T05:06:07Z", datetime(2026, 3, 4, 5, 6, 7, tzinfo=timezone.utc)),
+    ("2026-03-04T05:06:07z", datetime(2026, 3, 4, 5, 6, 7, tzinfo=timezone.utc)),
+    ("2026-03-04T02:06:07-03:00", datetime(2026, 3, 4, 5, 6, 7, tzinfo=timezone.utc)),
+])
+def test_validate_event_timestamp_en_utc(value, expected):
+    timestamp = validate_event({"action": "A", "resource": "r", "timestamp": value}, RECEIVED_AT)["timestamp"]
+    assert timestamp == expected
+    assert timestamp.utcoffset().total_seconds() == 0
+
+
+def test_validate_event_timestamp_invalido():
+    with pytest.raises(ValueError, match="timestamp: debe ser una fecha ISO 8601"):
+        validate_event({"action": "A", "resource": "r", "timestamp": "ayer"}, RECEIVED_AT)
+
+
+@pytest.mark.parametrize("field", ["action", "details", "user_agent"])
+def test_validate_event_rechaza_caracter_nulo(field):
+    raw = {"action": "A", "resource": "r", field: "a\x00b"}
+    with pytest.raises(ValueError, match=f"{field}: contiene caracteres nulos"):
+        validate_event(raw, RECEIVED_AT)
+
+
+def test_validate_event_obligatorios_y_largo():
+    with pytest.raises(ValueError, match="action: es obligatorio"):
+        validate_event({"resource": "r"}, RECEIVED_AT)
+    with pytest.raises(ValueError, match="action: supera 50 caracteres"):
+        validate_event({"action": "A" * 51, "resource": "r"}, RECEIVED_AT)
+
+
+def test_validate_event_details_objeto_serializado():
+    row = validate_event({"action": "A", "resource": "r", "details": {"clave": "ñ"}}, RECEIVED_AT)
+    assert json.loads(row["details"]) == {"clave": "ñ"}
+
+
+# _iter_records
+
+@pytest.mark.asyncio
+async def test_iter_records_csv_con_salto_de_linea_entre_comillas():
+    body = 'action,resource,details\nA,r,"primera\nsegunda, con ""comillas"""\n\nB,r,x\n'.encode()
+    records = await _records(body, "csv")
+    assert records == [
+        (1, "action,resource,details"),
+        (2, 'A,r,"primera\nsegunda, con ""comillas"""'),
+        (5, "B,r,x"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iter_records_ndjson_omite_lineas_vacias_y_sin_salto_final():
+    body = '{"a": "ñandú"}\r\n\n  \n{"b": 2}'.encode()
+    records = await _records(body, "ndjson")
+    assert [(line, json.loads(text)) for line, text in records] == [(1, {"a": "ñandú"}), (4, {"b": 2})]
+
+
+# ingest_stream (SQLite)
+
+def _count(session_scope, action: str) -> int:
+    with session_scope() as db:
+        return db.query(AuditLog).filter(AuditLog.action == action).count()
+
+
+@pytest.mark.asyncio
+async def test_ingest_stream_csv_con_bom_y_registro_multilinea(session_scope):
+    body = ('﻿Action,Resource,Details,Timestamp\n'
+            'INGEST_CSV,r,"línea 1\nlínea 2",2026-03-04T05:06:07Z\n'
+            'INGEST_CSV,r,x\n'
+            'INGEST_CSV,r,,2026-03-04T05:06:07\n').encode()
+    result = await ingest_stream(_chunks(body), "csv", session_scope)
+
+    assert (result["accepted"], result["rejected"]) == (2, 1)
+    assert result["batches"][0]["errors"] == [{"line": 4, "error": "se esperaban 4 columnas y hay 3"}]
+    with session_scope() as db:
+        details = [log.details for log in db.query(AuditLog).filter(AuditLog.action == "INGEST_CSV")]
+    assert sorted(details, key=lambda value: value or "") == [None, "línea 1\nlínea 2"]
+
+
+@pytest.mark.asyncio
+async def test_ingest_stream_conteos_por_lote(session_scope):
+    lines = [
+        {"action": "INGEST_NDJSON", "resource": "r", "user_id": 1},
+        {"action": "INGEST_NDJSON", "resource": "r", "user_id": 2 ** 31},
+        "no es json",
+        {"action": "INGEST_NDJSON", "resource": "r", "foo": 1},
+        {"action": "INGEST_NDJSON", "resource": "r", "timestamp": "2026-03-04T05:06:07Z"},
+        {"action": "INGEST_NDJSON", "resource": "r", "details": "con \x00 nulo"},
+        {"action": "INGEST_NDJSON", "resource": "r"},
+    ]
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines).encode()
+    result = await ingest_stream(_chunks(body), "ndjson", session_scope, batch_size=3)
+
+    assert [(batch["batch"], batch["accepted"], batch["rejected"]) for batch in result["batches"]] == [
+        (1, 1, 2), (2, 1, 2), (3, 1, 0)
+    ]
+    assert (result["accepted"], result["rejected"]) == (3, 4)
+    assert [error["line"] for batch in result["batches"] for error in batch["errors"]] == [2, 3, 4, 6]
+    assert _count(session_scope, "INGEST_NDJSON") == 3
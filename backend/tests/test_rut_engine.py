@@ -0,0 +1,109 @@
+"""
+Pruebas del motor de RUT: las funciones por lotes (NumPy) deben coincidir con
+las escalares en todos los casos, incluidos los bordes.
+"""
+import random
+
+import pytest
+
+from app.core import rut_engine
+
+EDGE_CASES = [
+    # Vacíos y de un carácter
+    "", "1", "k", "K", "-", ".", " ",
+    # K minúscula y mayúscula
+    "10000013-k", "10000013-K", "10.000.013-k", "10000013k",
+    # Ceros a la izquierda
+    "0-0", "00-0", "0000001-9", "01.234.567-4", "00012345-5", "000000000-0",
+    # Puntos y guiones en lugares extraños
+    "1.2.3.4.5.6.7.8-5", "-12345678-5", "12345678-5-", "1-2-3-4-5-6-7-8-5",
+    "..12345678..5", "12345678.-.5", "1234-5678-5", "12.345.6785",
+    # Cuerpos de más de 8 dígitos
+    "123456789-2", "1234567890-K", "123.456.789-2", "99999999999999999999-1",
+    # Caracteres no ASCII
+    "12.345.678-5ñ", "１２３４５６７８-５", "12345678–5", "12345678 -5",
+    "K12345678-5", "12345ǩ678-5", "٣٤٥-6", "ü", "12345678-5\U0001F600",
+    # K en el cuerpo y otros caracteres
+    "1K345678-5", "KK", "12345678-A", "abc", "12 345 678 5", "\t12345678-5\n",
+    # RUT válidos de referencia
+    "12.345.678-5", "12345678-5", "76.086.428-5", "1-9", "5.126.663-3",
+]
+
+
+def _random_ruts(count: int, seed: int = 18):
+    """RUT aleatorios con ruido (válidos e inválidos)"""
+    generator = random.Random(seed)
+    alphabet = "0123456789kK.-  ñ١"
+    ruts = []
+    for _ in range(count):
+        if generator.random() < 0.5:
+            body = str(generator.randint(0, 10 ** generator.randint(1, 9)))
+            rut = body + "-" + rut_engine.check_digit(body)
+        else:
+            rut = "".join(generator.choice(alphabet) for _ in range(generator.randint(0, 14)))
+        ruts.append(rut)
+    return ruts
+
+
+@pytest.fixture(params=["bordes", "aleatorios"])
+def ruts(request):
+    """Casos de borde fijos o una muestra aleatoria reproducible"""
+    return EDGE_CASES if request.param == "bordes" else _random_ruts(3000)
+
+
+def test_clean_ruts_coincide_con_clean_rut(ruts):
+    assert rut_engine.clean_ruts(ruts) == [rut_engine.clean_rut(rut) for rut in ruts]
+
+
+@pytest.mark.parametrize("min_digits,max_digits", [(1, 8), (7, 8), (1, 9), (8, 8)])
+def test_validate_ruts_coincide_con_validate_rut(ruts, min_digits, max_digits):
+    batch = rut_engine.validate_ruts(ruts, min_digits=min_digits, max_digits=max_digits)
+    scalar = [rut_engine.validate_rut(rut, min_digits=min_digits, max_digits=max_digits) for rut in ruts]
+    assert batch.tolist() == scalar
+
+
+def test_format_ruts_coincide_con_format_rut(ruts):
+    assert rut_engine.format_ruts(ruts) == [rut_engine.format_rut(rut) for rut in ruts]
+
+
+@pytest.mark.parametrize("rut", EDGE_CASES)
+def test_un_solo_rut_por_lote(rut):
+    """Un lote de un elemento (ancho de matriz mínimo) coincide con el escalar"""
+    assert rut_engine.clean_ruts([rut]) == [rut_engine.clean_rut(rut)]
+    assert rut_engine.validate_ruts([rut]).tolist() == [rut_engine.validate_rut(rut)]
+    assert rut_engine.format_ruts([rut]) == [rut_engine.format_rut(rut)]
+
+
+def test_lotes_vacios():
+    assert rut_engine.clean_ruts([]) == []
+    assert rut_engine.format_ruts([]) == []
+    assert rut_engine.validate_ruts([]).tolist() == []
+    assert rut_engine.check_digits([]).tolist() == []
+
+
+def test_casos_conocidos():
+    assert rut_engine.validate_ruts(["12.345.678-5", "10000013-k", "123456789-2", ""]).tolist() == [
+        True, True, False, False
+    ]
+    assert rut_engine.format_ruts(["0000001-9", "1k"]) == ["0.000.001-9", "1-K"]
+
+
+def test_check_digits_coincide_con_check_digit():
+    numbers = [0, 1, 9, 10, 1000001, 10000013, 12345678, 99999999] + list(range(0, 10 ** 8, 7_654_321))
+    expected = [rut_engine.check_digit(str(number)) for number in numbers]
+    assert rut_engine.check_digits(numbers).tolist() == expected
+    # Los ceros a la izquierda no cambian el dígito verificador
+    assert [rut_engine.check_digit(str(number).zfill(8)) for number in numbers] == expected
+
+
+@pytest.mark.parametrize("numbers", [[10 ** 8], [-1], [5, 123456789]])
+def test_check_digits_rechaza_cuerpos_fuera_de_rango(numbers):
+    with pytest.raises(ValueError):
+        rut_engine.check_digits(numbers)
+
+
+def test_generate_ruts_son_validos():
+    numbers = [1, 1000001, 12345678, 99999999]
+    assert rut_engine.validate_ruts(rut_engine.generate_ruts(numbers)).all()
+    formatted = rut_engine.generate_ruts(numbers, formatted=True)
+    assert formatted == [rut_engine.format_rut(rut) for rut in rut_engine.generate_ruts(numbers)]
@@ -0,0 +1,138 @@
+"""
+Pruebas de la caché de tokens JWT verificados: vencimiento por exp, revocación
+sobre aciertos de caché y verificación de firma una sola vez por token.
+"""
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security_utils, token_cache, token_revocation as revocation_module
+from app.core.config import settings
+from app.core.security_utils import SecurityUtils
+from app.core.token_revocation import MemoryRevocationStore, TokenRevocation
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    """Caché activa y vacía, con revocaciones en memoria para cada prueba"""
+    monkeypatch.setattr(settings, "TOKEN_CACHE_ENABLED", True)
+    token_cache.token_cache.clear()
+    revocation = TokenRevocation(MemoryRevocationStore(), 1000, 0.01, "test")
+    monkeypatch.setattr(revocation_module, "token_revocation", revocation)
+    yield revocation
+    token_cache.token_cache.clear()
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    """Contar las llamadas a jwt.decode de verify_token"""
+    calls = []
+    decode = security_utils.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(security_utils.jwt, "decode", counting_decode)
+    return calls
+
+
+def _advance_clock(monkeypatch, seconds: float):
+    """Adelantar el reloj que usa token_cache para comparar con exp"""
+    now = time.time() + seconds
+    monkeypatch.setattr(token_cache, "time", SimpleNamespace(time=lambda: now))
+
+
+def test_token_repetido_no_vuelve_a_decodificarse(decode_calls):
+    token = SecurityUtils.create_access_token({"sub": "admin@auditoria.com"})
+
+    first = SecurityUtils.verify_token(token)
+    second = SecurityUtils.verify_token(token)
+    third = SecurityUtils.verify_token(token)
+
+    assert decode_calls == [token]
+    assert first == second == third
+    # Cada acierto retorna una copia: modificarla no altera la caché
+    second["sub"] = "otro@auditoria.com"
+    assert SecurityUtils.verify_token(token)["sub"] == "admin@auditoria.com"
+
+
+def test_tokens_distintos_se_decodifican_por_separado(decode_calls):
+    tokens = [SecurityUtils.create_access_token({"sub": f"user{i}@auditoria.com"}) for i in range(3)]
+    for token in tokens + tokens:
+        SecurityUtils.verify_token(token)
+    assert decode_calls == tokens
+
+
+def test_entrada_no_se_sirve_despues_de_exp(monkeypatch):
+    digest = token_cache.token_digest("token")
+    exp = time.time() + 60
+    token_cache.put_claims(digest, {"sub": "a", "exp": exp})
+    assert token_cache.get_claims(digest) == {"sub": "a", "exp": exp}
+
+    # El TTL de la caché (TOKEN_CACHE_TTL) aún no vence, pero exp sí
+    _advance_clock(monkeypatch, 61)
+    assert token_cache.get_claims(digest) is None
+    # La entrada vencida se descarta
+    assert token_cache.token_cache.get(digest) is None
+
+
+def test_ttl_de_la_entrada_acotado_por_exp(monkeypatch):
+    digest = token_cache.token_digest("token")
+    monkeypatch.setattr(settings, "TOKEN_CACHE_TTL", 3600)
+    token_cache.put_claims(digest, {"sub": "a", "exp": time.time() + 0.05})
+    time.sleep(0.1)
+    assert token_cache.token_cache.get(digest) is None
+
+
+def test_token_vencido_no_se_guarda():
+    digest = token_cache.token_digest("token")
+    token_cache.put_claims(digest, {"sub": "a", "exp": time.time() - 1})
+    assert token_cache.token_cache.get(digest) is None
+
+
+def test_verify_token_vencido_en_cache_vuelve_a_verificar_firma(monkeypatch, decode_calls):
+    token = SecurityUtils.create_access_token({"sub": "a"}, expires_delta=timedelta(minutes=5))
+    SecurityUtils.verify_token(token)
+
+    _advance_clock(monkeypatch, 301)
+    SecurityUtils.verify_token(token)
+    # Sin acierto de caché: la firma (y el exp real) se verifican de nuevo
+    assert decode_calls == [token, token]
+
+
+def test_token_revocado_despues_de_guardarse_en_cache(empty_cache, decode_calls):
+    token = SecurityUtils.create_access_token({"sub": "a"})
+    payload = SecurityUtils.verify_token(token)
+
+    # Revocar sin descartar la entrada: la revocación se comprueba también en los aciertos
+    empty_cache.revoke(payload["jti"], float(payload["exp"]))
+    assert token_cache.get_claims(token_cache.token_digest(token)) is not None
+
+    with pytest.raises(HTTPException) as error:
+        SecurityUtils.verify_token(token)
+    assert error.value.status_code == 401
+    assert error.value.detail == "Token revocado"
+    assert decode_calls == [token]
+
+
+@pytest.mark.asyncio
+async def test_revoke_token_descarta_la_entrada(empty_cache):
+    token = SecurityUtils.create_access_token({"sub": "a"})
+    SecurityUtils.verify_token(token)
+
+    assert await revocation_module.revoke_token(token) is True
+    assert token_cache.token_cache.get(token_cache.token_digest(token)) is None
+    with pytest.raises(HTTPException) as error:
+        SecurityUtils.verify_token(token)
+    assert error.value.detail == "Token revocado"
+
+
+def test_token_invalido_no_se_guarda():
+    with pytest.raises(HTTPException) as error:
+        SecurityUtils.verify_token("no.es.un-token")
+    assert error.value.detail == "Token inválido"
+    assert len(token_cache.token_cache) == 0
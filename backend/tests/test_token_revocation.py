@@ -0,0 +1,188 @@
+"""
+Pruebas de la revocación de tokens: filtro de Bloom delante del almacén,
+reconstrucción del filtro sin perder revocaciones concurrentes, fallo cerrado
+ante errores del almacén y validación de backends con varios workers.
+"""
+import logging
+import threading
+import time
+
+import pytest
+
+from app.core import token_revocation as revocation_module
+from app.core.config import settings
+from app.core.token_revocation import (
+    MemoryRevocationStore, TokenRevocation, check_revocation_backends, create_revocation_store
+)
+from app.utils.pubsub import InMemoryPubSub
+
+
+class PausedStore(MemoryRevocationStore):
+    """Almacén cuyo active() se detiene tras leer los jti, hasta que la prueba lo libera"""
+
+    def __init__(self):
+        super().__init__()
+        self.read = threading.Event()
+        self.resume = threading.Event()
+
+    def active(self):
+        snapshot = super().active()
+        self.read.set()
+        assert self.resume.wait(5)
+        return snapshot
+
+
+class FailingStore(MemoryRevocationStore):
+    """Almacén que falla al consultar y cuenta las consultas"""
+
+    def __init__(self):
+        super().__init__()
+        self.lookups = 0
+
+    def contains(self, jti: str) -> bool:
+        self.lookups += 1
+        raise ConnectionError("almacén no disponible")
+
+
+def _revocation(store) -> TokenRevocation:
+    return TokenRevocation(store, capacity=1000, false_positive_rate=0.001, channel="test")
+
+
+def _in_an_hour() -> float:
+    return time.time() + 3600
+
+
+def test_revocar_y_consultar():
+    revocation = _revocation(MemoryRevocationStore())
+    revocation.revoke("revocado", _in_an_hour())
+    assert revocation.is_revoked("revocado") is True
+    assert revocation.is_revoked("vigente") is False
+    assert revocation.is_revoked(None) is False
+
+
+def test_revocacion_vencida_se_ignora():
+    revocation = _revocation(MemoryRevocationStore())
+    revocation.revoke("viejo", time.time() - 1)
+    assert "viejo" not in revocation._filter
+    assert revocation.is_revoked("viejo") is False
+
+
+def test_revocacion_durante_reconstruccion_no_se_pierde():
+    store = PausedStore()
+    revocation = _revocation(store)
+    bus = InMemoryPubSub()
+    revocation.start(bus)
+    store.add("anterior", _in_an_hour())
+
+    rebuild = threading.Thread(target=revocation.rebuild_filter)
+    rebuild.start()
+    assert store.read.wait(5)
+    # Llegan revocaciones después de leer el almacén y antes de cambiar el filtro
+    revocation.revoke("local", _in_an_hour())
+    bus.publish("test", "remoto")
+    store.resume.set()
+    rebuild.join(5)
+
+    assert not rebuild.is_alive()
+    assert revocation._pending is None
+    for jti in ("anterior", "local", "remoto"):
+        assert jti in revocation._filter
+    assert revocation.is_revoked("anterior") is True
+    assert revocation.is_revoked("local") is True
+
+
+def test_error_de_reconstruccion_no_deja_pendientes():
+    class BrokenStore(MemoryRevocationStore):
+        def active(self):
+            raise ConnectionError("almacén no disponible")
+
+    revocation = _revocation(BrokenStore())
+    with pytest.raises(ConnectionError):
+        revocation.rebuild_filter()
+    assert revocation._pending is None
+
+
+def test_error_del_almacen_en_un_positivo_rechaza_el_token(caplog):
+    store = FailingStore()
+    revocation = _revocation(store)
+    revocation._add_to_filter("revocado")
+
+    with caplog.at_level(logging.ERROR, logger=revocation_module.__name__):
+        assert revocation.is_revoked("revocado") is True
+    assert store.lookups == 1
+    assert "Error consultando revocación de token" in caplog.text
+
+
+def test_negativo_del_filtro_no_consulta_el_almacen():
+    store = FailingStore()
+    revocation = _revocation(store)
+    assert revocation.is_revoked("vigente") is False
+    assert store.lookups == 0
+
+
+def test_antes_de_cargar_el_filtro_se_consulta_el_almacen():
+    store = MemoryRevocationStore()
+    store.add("de-otro-worker", _in_an_hour())
+    revocation = _revocation(store)
+    revocation.start(InMemoryPubSub())
+
+    # Filtro aún no cargado: un negativo no basta
+    assert revocation.is_revoked("de-otro-worker") is True
+    revocation.rebuild_filter()
+    assert revocation._filter_ready is True
+    assert revocation.is_revoked("de-otro-worker") is True
+
+
+def test_compactar_elimina_vencidos_y_reconstruye():
+    store = MemoryRevocationStore()
+    revocation = _revocation(store)
+    store.add("vencido", time.time() - 1)
+    revocation.revoke("vigente", _in_an_hour())
+
+    assert revocation.compact() == 1
+    assert list(store.active()) == ["vigente"]
+    assert "vigente" in revocation._filter
+
+
+def test_almacen_redis_fake():
+    store = create_revocation_store("redis-fake")
+    store.add("jti", _in_an_hour())
+    assert store.contains("jti") is True
+    assert store.contains("otro") is False
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis-fake"])
+def test_almacen_del_proceso_rechazado_con_varios_workers(monkeypatch, backend):
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", backend)
+    with pytest.raises(RuntimeError, match=f"TOKEN_REVOCATION_BACKEND={backend}"):
+        check_revocation_backends(2)
+    # Con un solo worker se admite
+    check_revocation_backends(1)
+
+
+@pytest.mark.parametrize("backend", ["sql", "redis"])
+def test_almacen_compartido_admitido_con_varios_workers(monkeypatch, caplog, backend):
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", backend)
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_PUBSUB_BACKEND", "redis")
+    with caplog.at_level(logging.WARNING, logger=revocation_module.__name__):
+        check_revocation_backends(4)
+    assert caplog.text == ""
+
+
+def test_pubsub_del_proceso_con_varios_workers_advierte(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", "sql")
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_PUBSUB_BACKEND", "memory")
+    with caplog.at_level(logging.WARNING, logger=revocation_module.__name__):
+        check_revocation_backends(4)
+    assert "TOKEN_REVOCATION_PUBSUB_BACKEND=memory con 4 workers" in caplog.text
+
+
+def test_el_almacen_por_defecto_es_sql():
+    assert type(settings).model_fields["TOKEN_REVOCATION_BACKEND"].default == "sql"
+
+
+def test_start_token_revocation_aplica_la_validacion(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", "memory")
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+    with pytest.raises(RuntimeError):
+        revocation_module.start_token_revocation()
@@ -125,10 +125,16 @@ const PersonsPage: React.FC = () => {
     setIsFormOpen(true);
   };
 
-  const handleEditPerson = (person: Person) => {
-    setSelectedPerson(person);
-    setIsEditing(true);
-    setIsFormOpen(true);
+  const handleEditPerson = async (person: Person) => {
+    try {
+      // El listado trae el RUT ofuscado; el formulario necesita el RUT completo del detalle
+      const response = await personService.getPerson(person.id);
+      setSelectedPerson(response);
+      setIsEditing(true);
+      setIsFormOpen(true);
+    } catch (err: any) {
+      setError(err.message || 'Error al cargar los detalles');
+    }
   };
 
   const handleDeletePerson = (person: Person) => {
@@ -1,7 +1,7 @@
 // Tipos específicos para el sistema de Personas con datos sensibles
 export interface Person {
   id: number;
-  rut: string; // RUT completo retornado por la API
+  rut: string | null; // RUT completo (null en listados con RUT ofuscado, ver rut_mode)
   rut_masked: string; // RUT ofuscado para mostrar en la UI
   nombre: string;
   apellido: string;